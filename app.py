@@ -2,19 +2,19 @@
 # -*- coding: utf-8 -*-
 import os
 import json
-from flask import Flask, render_template, request, send_file, jsonify, session
-from docxtpl import DocxTemplate
+import time
+from flask import Flask, Response, render_template, request, send_file, jsonify, session, stream_with_context
 from datetime import datetime
-from graph1 import run_graph, llm  # type: ignore
-from docx import Document
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.shared import Pt
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-from typing import Optional
-from workflow.rfp_workflow import build_rfp_graph
-from evaluation_engine.evaluator import evaluate_proposal
 from routes.compare_routes import compare_bp
+from routes.metrics_routes import metrics_bp
+from workflow.graph_registry import warm_up
+from workflow.workspaces import start_janitor
+from workflow.comparison_jobs import recover_jobs
+from utils.metrics import timed_stage
+from nodes.section_dependencies import fingerprint_sections
+
+# ⚡ الوحدات الثقيلة (LangGraph/LangChain/OpenAI، docxtpl، python-docx) تُستورد داخل المسارات
+# عند أول استخدام، فيبقى استيراد app.py سريعاً لكل عامل gunicorn (انظر gunicorn.conf.py)
 
 # ============================================================
 # ⚙️ Flask configuration
@@ -25,7 +25,7 @@ app.secret_key = "smart-rfp-ai-key"
 from routes.table_routes import table_bp  # noqa: E402
 app.register_blueprint(table_bp)
 app.register_blueprint(compare_bp)
-
+app.register_blueprint(metrics_bp)
 
 
 def fix_rtl_bullets(text: str) -> str:
@@ -65,8 +65,8 @@ def rfp_input() -> str:
     return render_template('rfp_input.html')
 
 
-@app.route('/rfp_generate', methods=['POST'])
-def generate():
+def read_generation_form() -> dict:
+    """بيانات نموذج الإدخال (القوائم كنصوص مفصولة بفواصل) + حفظ الأقسام الاختيارية في الجلسة."""
     user_data = request.form.to_dict(flat=False)
     # تحويل القوائم إلى نصوص مفصولة بفواصل
     for key, value in user_data.items():
@@ -80,12 +80,11 @@ def generate():
         "Insurance": request.form.get("include_Insurance") is not None,
     }
     session["include_sections"] = include_sections
+    return user_data
 
-    result = run_graph(user_data)
-    decisions = result.get("decisions", {})
-    if not decisions:
-        return render_template("rfp_generate.html", decisions={}, user_data=user_data)
 
+def filter_decisions(decisions: dict) -> dict:
+    """القيم المعروضة في صفحة المراجعة: مفاتيح FIELD_MAP مع نوع كل حقل."""
     from nodes.field_map import FIELD_MAP  # type: ignore
     filtered_decisions = {}
     for key in FIELD_MAP:
@@ -107,30 +106,148 @@ def generate():
         "Commencement_of_Work",
     ]:
         filtered_decisions.setdefault(date_key, {"value": "", "type": "static"})
+    return filtered_decisions
+
+
+@app.route('/rfp_generate', methods=['POST'])
+def generate():
+    from graph1 import run_graph  # type: ignore
+    request_started = time.perf_counter()
+    user_data = read_generation_form()
+
+    result = run_graph(user_data, started=request_started)
+    decisions = result.get("decisions", {})
+    if not decisions:
+        return render_template("rfp_generate.html", decisions={}, user_data=user_data)
+
+    filtered_decisions = filter_decisions(decisions)
 
-    
     session["user_data"] = user_data
     session["decisions"] = {k: v["value"] for k, v in filtered_decisions.items()}
+    # 🔑 بصمة مدخلات كل قسم مولَّد — لإعادة توليد ما تغيّر فقط لاحقًا
+    # الأقسام التي انتهت مهلتها تُحفظ ببصمة فارغة فتُعاد عند "إعادة التوليد"
+    session["section_fingerprints"] = fingerprint_sections(result.get("sections", []), decisions,
+                                                           pending=result.get("timed_out_sections", []))
     return render_template("rfp_generate.html", decisions=filtered_decisions, user_data=user_data)
 
 
+@app.route('/rfp_generate_stream', methods=['POST'])
+def generate_stream_page():
+    """
+    نسخة البث من /rfp_generate: تعرض صفحة المراجعة فوراً (التواريخ والمدخلات جاهزة)
+    ثم تملأ الصفحة الأقسامَ أولاً بأول من /rfp_generate/events.
+    """
+    from nodes.orchestrator_graph import build_decisions
+    user_data = read_generation_form()
+    session["user_data"] = user_data
+    session.pop("section_fingerprints", None)
+    filtered_decisions = filter_decisions(build_decisions(user_data))
+    return render_template("rfp_generate.html", decisions=filtered_decisions, user_data=user_data,
+                           stream_url="/rfp_generate/events?tokens=1")
+
+
+@app.route('/rfp_generate/events')
+def generate_events():
+    """
+    Server-Sent Events: كل قسم عند اكتماله ("section")، وأجزاء النص عند ?tokens=1 ("delta")،
+    ثم "done" بالقرارات النهائية وبصماتها لتحفظها الصفحة في الجلسة عبر /rfp_generate/finish.
+    """
+    from graph1 import stream_graph  # type: ignore
+    request_started = time.perf_counter()
+    user_data = session.get("user_data")
+    if not user_data:
+        return jsonify({"error": "لا توجد بيانات إدخال في الجلسة."}), 400
+    stream_tokens = request.args.get("tokens") == "1"
+
+    def sse(event: dict) -> str:
+        return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    @stream_with_context
+    def events():
+        try:
+            for event in stream_graph(user_data, started=request_started, stream_tokens=stream_tokens):
+                if event["type"] != "result":
+                    yield sse(event)
+                    continue
+                result = event["result"]
+                decisions = result.get("decisions", {})
+                yield sse({
+                    "type": "done",
+                    "decisions": {k: v["value"] for k, v in filter_decisions(decisions).items()},
+                    "fingerprints": fingerprint_sections(result.get("sections", []), decisions,
+                                                         pending=result.get("timed_out_sections", [])),
+                    "timed_out": result.get("timed_out_sections", []),
+                })
+        except Exception as e:
+            print("❌ خطأ أثناء بث التوليد:", e)
+            yield sse({"type": "error", "error": str(e)})
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+    })
+
+
+@app.route('/rfp_generate/finish', methods=['POST'])
+def generate_finish():
+    """حفظ نتيجة البث في الجلسة (لا يمكن تعديل كوكي الجلسة داخل استجابة متدفقة)."""
+    payload = request.get_json(silent=True) or {}
+    session["decisions"] = payload.get("decisions", {})
+    session["section_fingerprints"] = payload.get("fingerprints", {})
+    return jsonify({"ok": True})
+
+
+@app.route('/rfp_regenerate', methods=['POST'])
+def regenerate():
+    """
+    Re-runs only the generated sections whose inputs changed on the generate page
+    (and the sections depending on them). Returns the new texts as JSON.
+    """
+    from nodes.field_map import FIELD_MAP  # type: ignore
+    from nodes.orchestrator_graph import build_decisions, regenerate_sections
+    from graph1 import get_llm  # type: ignore
+
+    fingerprints = session.get("section_fingerprints")
+    if not fingerprints:
+        return jsonify({"error": "لا توجد أقسام مولدة في الجلسة. يرجى التوليد أولاً."}), 400
+
+    posted = request.form.to_dict()
+    user_data = dict(session.get("user_data", {}))
+    for key, value in posted.items():
+        if key in user_data or FIELD_MAP.get(key) == "input":
+            user_data[key] = value
+
+    # النصوص المولدة الحالية (مع تعديلات المستخدم عليها في الصفحة)
+    generated = {k: v for k, v in session.get("decisions", {}).items() if FIELD_MAP.get(k) == "llm"}
+    generated.update({k: v for k, v in posted.items() if FIELD_MAP.get(k) == "llm"})
+    decisions = build_decisions(user_data, generated)
+
+    decisions, regenerated, fingerprints = regenerate_sections(get_llm(), decisions, fingerprints)
+
+    session["user_data"] = user_data
+    stored = session.get("decisions", {})
+    stored.update({k: v for k, v in user_data.items() if k in stored})
+    stored.update({k: decisions.get(k, "") for k in regenerated})
+    session["decisions"] = stored
+    session["section_fingerprints"] = fingerprints
+    return jsonify({
+        "regenerated": regenerated,
+        "sections": {k: decisions.get(k, "") for k in regenerated},
+    })
+
+
 @app.route('/save', methods=['POST'])
+@timed_stage("docx_render")
 def save():
+    from nodes.docx_renderer import TABLE_PLACEMENTS, render_rfp_docx
+
     session_user = session.get("user_data", {})
     session_llm = session.get("decisions", {})
     edited_data = request.form.to_dict()
     context = {**session_user, **session_llm, **edited_data}
 
-    tpl = DocxTemplate("templates/rfp_general.docx")
-    tpl.render(context)
-
-    TABLE_KEYS = {
-        "Bill_of_Quantities_and_Prices",
-        "Materials_Specifications_Table",
-        "Equipment_Specifications_Table",
-        "Workers_Table",
-    }
-    safe_context = {k: v for k, v in context.items() if k not in TABLE_KEYS}
+    # الجداول لا تُمرَّر للقالب، بل تُدرج كجداول Word بعد التعبئة
+    safe_context = {k: v for k, v in context.items() if k not in TABLE_PLACEMENTS}
 
     llm_fields = {
         "Competition_Definition",
@@ -158,123 +275,16 @@ def save():
         if key in llm_fields and isinstance(safe_context[key], str):
             safe_context[key] = fix_rtl_bullets(safe_context[key])
 
-    tpl.render(safe_context)
+    # تعبئة القالب مرة واحدة + إدراج كل الجداول في نفس المستند + حفظ واحد في الذاكرة
+    tables = {key: session[key] for key in TABLE_PLACEMENTS if key in session}
+    docx_bytes = render_rfp_docx(safe_context, tables)
+
     output_folder = os.path.join(os.path.expanduser("~"), "Documents", "RFP_outputs")
     os.makedirs(output_folder, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_path = os.path.join(output_folder, f"filled_{timestamp}.docx")
-    tpl.save(output_path)
-
-    def insert_table_if_exists(session_key: str,
-                               placeholder_text: str,
-                               heading_text: Optional[str] = None) -> None:
-        """إدراج جدول داخل المستند في موقع محدد.
-
-        إذا تم تمرير heading_text، سيُدرج الجدول مباشرة بعد فقرة تحتوي على العنوان.
-        إذا لم يوجد العنوان، سيبحث عن placeholder ويُدرج بعده. وإذا لم يُعثر على أي منهما، يتخطى الإدراج.
-        """
-        if session_key not in session:
-            return
-        table_text = session[session_key]
-        lines = [l.strip() for l in table_text.split("\n") if "|" in l]
-        if lines:
-            headers = [h.strip() for h in lines[0].split("|")]
-            rows = [l.split("|") for l in lines[1:]]
-        if not lines:
-            return
-        
-        headers = [h.strip() for h in lines[0].split("|")]
-        rows = [l.split("|") for l in lines[1:]]
-
-        doc = Document(output_path)
-
-        def find_paragraph_with_text(doc_: Document, text: str):
-            for p in doc_.paragraphs:
-                if text in p.text:
-                    return p
-            for table in doc_.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for p in cell.paragraphs:
-                            if text in p.text:
-                                return p
-            return None
-
-        # البحث عن العنوان أولاً إذا تم تمريره
-        target_paragraph = None
-        if heading_text:
-            for p in doc.paragraphs:
-                if p.text.strip() == heading_text.strip():
-                    target_paragraph = p
-                    break
-            if not target_paragraph:
-                target_paragraph = find_paragraph_with_text(doc, heading_text)
-        if not target_paragraph:
-            # البحث عن placeholder
-            target_paragraph = find_paragraph_with_text(doc, placeholder_text)
-        if not target_paragraph:
-            print(f"⚠️ لم يتم العثور على العنوان '{heading_text}' ولا على placeholder {placeholder_text} داخل القالب.")
-            return
-
-        # إذا وجد placeholder داخل الفقرة، امسح نصه
-        if placeholder_text and placeholder_text in target_paragraph.text:
-            target_paragraph.text = ""
-
-        # إنشاء الجدول وضبط اتجاهه RTL
-        table = doc.add_table(rows=1, cols=len(headers))
-        table.style = "Table Grid"
-        tbl = table._element
-        tbl.set(qn("w:tblDir"), "rtl")
-        tbl.set(qn("w:tblLayout"), "fixed")
-
-        # تنسيق صف العناوين
-        hdr_cells = table.rows[0].cells
-        for i, h in enumerate(headers):
-            p = hdr_cells[i].paragraphs[0]
-            run = p.add_run(h)
-            run.bold = True
-            run.font.size = Pt(12)
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            shading = OxmlElement("w:shd")
-            shading.set(qn("w:fill"), "D9D9D9")
-            hdr_cells[i]._tc.get_or_add_tcPr().append(shading)
-
-        # صفوف البيانات
-        for r in rows:
-            row_cells = table.add_row().cells
-            for i, c in enumerate(r):
-                p = row_cells[i].paragraphs[0]
-                run = p.add_run(c.strip())
-                run.font.size = Pt(11)
-                p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        # إدراج الجدول مباشرة بعد الفقرة الهدف
-        target_paragraph._element.addnext(table._element)
-        doc.save(output_path)
-        print(f"✅ تم إدراج الجدول: {session_key}")
-
-    insert_table_if_exists(
-        "Bill_of_Quantities_and_Prices",
-        "{{Bill_of_Quantities_and_Prices}}",
-        heading_text="جدول الكميات والأسعار",
-    )
-    insert_table_if_exists(
-        "Materials_Specifications_Table",
-        "{{Materials_Specifications_Table}}",
-        heading_text="جدول مواصفات المواد",
-    )
-    insert_table_if_exists(
-        "Equipment_Specifications_Table",
-        "{{Equipment_Specifications_Table}}",
-        heading_text="واصفات المعدات",
-    )
-
-    insert_table_if_exists(
-        "Workers_Table",
-        "{{Workers_Table}}",
-        heading_text="ثانياً: جدول مواصفات فريق العمل",
-    )
-
+    with open(output_path, "wb") as f:
+        f.write(docx_bytes.getbuffer())
 
     project_name = context.get("Competition_Name") or "مشروع بدون اسم"
     current_date = datetime.now().strftime("%Y-%m-%d")
@@ -324,4 +334,9 @@ def comparison_page():
 
 
 if __name__ == "__main__":
+    # 🔥 تجميع الـ graphs وتهيئة عملاء LLM قبل أول طلب (مع gunicorn: post_worker_init في gunicorn.conf.py)
+    warm_up()
+    recover_jobs()
+    # 🧹 حذف مساحات عمل المقارنات القديمة (WORKSPACE_TTL_HOURS) في الخلفية
+    start_janitor()
     app.run(debug=True) 
\ No newline at end of file
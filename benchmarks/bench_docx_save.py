@@ -0,0 +1,98 @@
+# benchmarks/bench_docx_save.py
+"""
+Benchmark: the Word pipeline of /save.
+
+- "before":   the previous /save body: render the template, render it again with
+              the table-free context, save to disk, then re-open / insert / re-save
+              the file once per table
+- "single":   one render, all tables inserted into the same in-memory document,
+              one serialization to a BytesIO + one write, with a freshly loaded
+              DocxTemplate (template parsing, XML patching and Jinja compilation
+              per document)
+- "cached":   the same with the pre-processed template of nodes.template_cache
+              (nodes.docx_renderer.render_rfp_docx, what /save runs)
+
+All get the same sample form, generated section texts and four tables, and
+write the .docx into a temporary folder. Reports the median over RUNS.
+
+Run from the project root:
+    python -m benchmarks.bench_docx_save
+"""
+import io
+import os
+import statistics
+import tempfile
+import time
+from docx import Document
+from docxtpl import DocxTemplate
+from config import RFP_TEMPLATE_PATH
+from nodes.docx_renderer import TABLE_PLACEMENTS, insert_table, render_rfp_docx
+from nodes.template_cache import prepared_template
+from nodes.field_map import FIELD_MAP
+from nodes.orchestrator_graph import build_decisions
+from tests.sample_form import SAMPLE_FORM, SAMPLE_SECTION_TEXT
+
+RUNS = 5
+
+SAMPLE_TABLE = "البند | الوصف | الكمية | الوحدة\n" + "\n".join(
+    f"{i} | توريد وتركيب وصيانة المعدات رقم {i} | {i * 3} | قطعة" for i in range(1, 21)
+)
+
+
+def sample_context():
+    context = build_decisions(dict(SAMPLE_FORM))
+    context.update({k: SAMPLE_SECTION_TEXT for k, v in FIELD_MAP.items() if v == "llm"})
+    tables = {key: SAMPLE_TABLE for key in TABLE_PLACEMENTS}
+    return {**context, **tables}, tables
+
+
+def before(context, tables, output_path):
+    tpl = DocxTemplate(RFP_TEMPLATE_PATH)
+    tpl.render(context)
+    safe_context = {k: v for k, v in context.items() if k not in TABLE_PLACEMENTS}
+    tpl.render(safe_context)
+    tpl.save(output_path)
+    from benchmarks.bench_table_insert import ScanLookup  # the previous full-scan lookup
+    for key, (placeholder_text, heading_text) in TABLE_PLACEMENTS.items():
+        doc = Document(output_path)
+        if insert_table(doc, tables[key], placeholder_text, heading_text, index=ScanLookup(doc)):
+            doc.save(output_path)
+
+
+def single(context, tables, output_path):
+    safe_context = {k: v for k, v in context.items() if k not in TABLE_PLACEMENTS}
+    tpl = DocxTemplate(RFP_TEMPLATE_PATH)
+    tpl.render(safe_context)
+    for key, (placeholder_text, heading_text) in TABLE_PLACEMENTS.items():
+        insert_table(tpl.docx, tables[key], placeholder_text, heading_text)
+    buffer = io.BytesIO()
+    tpl.save(buffer)
+    with open(output_path, "wb") as f:
+        f.write(buffer.getbuffer())
+
+
+def cached(context, tables, output_path):
+    safe_context = {k: v for k, v in context.items() if k not in TABLE_PLACEMENTS}
+    docx_bytes = render_rfp_docx(safe_context, tables)
+    with open(output_path, "wb") as f:
+        f.write(docx_bytes.getbuffer())
+
+
+def main():
+    context, tables = sample_context()
+    prepared_template()  # the process-level cache is filled once (at warm-up in the app)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'pipeline':>8} {'median ms':>10} {'min ms':>8} {'size KB':>8}")
+        for name, pipeline in [("before", before), ("single", single), ("cached", cached)]:
+            output_path = os.path.join(tmp, f"{name}.docx")
+            timings = []
+            for _ in range(RUNS):
+                started = time.perf_counter()
+                pipeline(context, tables, output_path)
+                timings.append((time.perf_counter() - started) * 1000.0)
+            print(f"{name:>8} {statistics.median(timings):>10.1f} {min(timings):>8.1f} "
+                  f"{os.path.getsize(output_path) / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_import_time.py
+"""
+Check: cold start of a web worker (python -X importtime -c "import app").
+
+Runs each scenario in a fresh interpreter and reports the cumulative import time
+of app.py, the wall time, and which heavy modules got loaded:
+- "import app":            what a gunicorn worker pays before serving requests
+- "import app + warm_up":  the previous behaviour (graphs compiled, LLM clients
+                           and heavy modules loaded while importing app.py);
+                           now done after boot by post_worker_init (gunicorn.conf.py)
+
+Fails if importing app.py loads any of HEAVY_MODULES.
+
+Run from the project root:
+    python -m benchmarks.bench_import_time
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("langgraph", "langchain_core", "langchain_openai", "openai", "pydantic", "docxtpl", "docx", "pdfplumber",
+                 "numpy", "graph1")
+RUNS = 3
+
+SCENARIOS = [
+    ("import app", "import app"),
+    ("import app + warm_up", "import app; from workflow.graph_registry import warm_up; warm_up()"),
+]
+
+REPORT = "import sys; print('LOADED=' + ','.join(m for m in {modules!r} if m in sys.modules))"
+
+
+def run(code: str):
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-bench")}
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"{code}; {REPORT.format(modules=HEAVY_MODULES)}"],
+                          capture_output=True, text=True, env=env, check=True)
+    wall = time.perf_counter() - started
+    app_us = 0
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| app$", line)
+        if match:
+            app_us = int(match.group(1))
+    loaded = next((l[7:] for l in proc.stdout.splitlines() if l.startswith("LOADED=")), "")
+    return app_us / 1000.0, wall * 1000.0, [m for m in loaded.split(",") if m]
+
+
+def main():
+    print(f"{'scenario':>22} {'import app ms':>14} {'wall ms':>9}  heavy modules loaded")
+    results = {}
+    for name, code in SCENARIOS:
+        samples = [run(code) for _ in range(RUNS)]
+        app_ms = min(s[0] for s in samples)
+        wall_ms = min(s[1] for s in samples)
+        loaded = samples[-1][2]
+        results[name] = loaded
+        print(f"{name:>22} {app_ms:>14.1f} {wall_ms:>9.1f}  {', '.join(loaded) or '-'}")
+
+    assert not results["import app"], f"importing app.py loads heavy modules: {results['import app']}"
+
+
+if __name__ == "__main__":
+    main()
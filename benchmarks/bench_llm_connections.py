@@ -0,0 +1,72 @@
+# benchmarks/bench_llm_connections.py
+"""
+Check: connection reuse of the shared async LLM client across generation requests.
+
+Starts a local OpenAI-compatible mock server, then simulates generation requests
+(each one a batch of parallel section calls through _call_llm_async), either
+- "per-request loop": a new event loop per request (the previous behaviour), or
+- "shared loop":      nodes.llm_runtime.run_coroutine (the background loop),
+and reports how many TCP connections the server accepted and how many async
+calls failed (rfp_stage_errors_total; a failed call is not retried).
+
+Run from the project root:
+    python -m benchmarks.bench_llm_connections
+"""
+import asyncio
+import time
+from langchain_openai import ChatOpenAI
+from nodes.llm_runtime import run_coroutine
+from nodes.orchestrator_graph import _call_llm_async
+from tests.mock_openai import MockOpenAI, start_mock_server
+from utils.metrics import STAGE_ERRORS
+
+REQUESTS = 5
+SECTIONS_PER_REQUEST = 6
+
+
+async def one_request(llm):
+    return await asyncio.gather(*[_call_llm_async(llm, f"section {i}") for i in range(SECTIONS_PER_REQUEST)])
+
+
+def per_request_loop(llm):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(one_request(llm))
+    finally:
+        loop.close()
+
+
+def shared_loop(llm):
+    return run_coroutine(one_request(llm))
+
+
+def measure(run):
+    """(connections, errors, ms/request) of REQUESTS requests run with `run`."""
+    # A server (base_url) per mode: langchain_openai caches its default httpx client per base_url
+    server, base_url = start_mock_server()
+    try:
+        # One client per mode, reused across its requests (as utils.llm_clients does)
+        llm = ChatOpenAI(model="mock-model", api_key="sk-mock", base_url=base_url, max_retries=0)
+
+        MockOpenAI.reset()
+        errors_before = STAGE_ERRORS.value("generate_section")
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            run(llm)
+        elapsed = (time.perf_counter() - start) * 1000.0 / REQUESTS
+        errors = int(STAGE_ERRORS.value("generate_section") - errors_before)
+        return MockOpenAI.connections, errors, elapsed
+    finally:
+        server.shutdown()
+
+
+def main():
+    print(f"{'mode':>18} {'requests':>9} {'calls':>6} {'connections':>12} {'errors':>10} {'ms/request':>11}")
+    for name, run in [("per-request loop", per_request_loop), ("shared loop", shared_loop)]:
+        connections, errors, elapsed = measure(run)
+        print(f"{name:>18} {REQUESTS:>9} {REQUESTS * SECTIONS_PER_REQUEST:>6} {connections:>12} "
+              f"{errors:>10} {elapsed:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
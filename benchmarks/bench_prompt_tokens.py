@@ -0,0 +1,57 @@
+# benchmarks/bench_prompt_tokens.py
+"""
+Regression check: input tokens per generation run, whole-form {raw_input} vs.
+per-section field projection ({section_context} + SECTION_CONTEXT).
+
+Builds every section prompt for a full sample form, once with the previous
+behaviour (the whole form dict interpolated) and once with build_prompt, and
+fails if the projected prompts are not smaller.
+
+Tokens are counted with tiktoken (o200k_base) when its encoding is available,
+otherwise estimated from words and punctuation (the header then says "~tokens").
+
+Run from the project root:
+    python -m benchmarks.bench_prompt_tokens
+"""
+import re
+from nodes.prompts import PROMPTS, SECTION_CONTEXT
+from nodes.section_dependencies import CONTEXT_PLACEHOLDER, build_prompt
+from tests.sample_form import SAMPLE_FORM, sample_values
+
+
+def token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return (lambda text: len(encoding.encode(text))), ""
+    except Exception:
+        return (lambda text: len(re.findall(r"\w+|[^\w\s]", text))), "~"
+
+
+def section_token_counts(count) -> dict:
+    """section -> (tokens with the whole form, tokens with build_prompt)."""
+    values = sample_values()
+    legacy_values = {**values, CONTEXT_PLACEHOLDER: str(SAMPLE_FORM)}  # the old {raw_input}
+    return {
+        section: (count(template.format(**legacy_values)), count(build_prompt(section, values)))
+        for section, template in PROMPTS.items()
+    }
+
+
+def main():
+    count, approx = token_counter()
+    print(f"{approx + 'tokens':>40} {'before':>8} {'after':>8}")
+    before_total = after_total = 0
+    for section, (before, after) in section_token_counts(count).items():
+        before_total += before
+        after_total += after
+        if section in SECTION_CONTEXT:
+            print(f"{section:>40} {before:>8} {after:>8}")
+    print(f"{'all sections (one generation run)':>40} {before_total:>8} {after_total:>8}"
+          f"   -{100.0 * (before_total - after_total) / before_total:.1f}%")
+
+    assert after_total < before_total, "projected prompts must be smaller than whole-form prompts"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_ranker.py
+"""
+Benchmark: vectorized rank_score_matrix vs. the previous per-proposal loop.
+
+"matrix build" (build_score_matrix) and "rank_proposals" (the whole call: build,
+rank and result list, console output discarded) show what a ranking costs end
+to end; "vector rank" is the NumPy core alone.
+
+Run from the project root:
+    python -m benchmarks.bench_ranker
+"""
+import contextlib
+import io
+import random
+import time
+from evaluation_engine.ranker import (
+    calculate_weighted_score,
+    build_score_matrix,
+    normalized_weight_vector,
+    rank_proposals,
+    rank_score_matrix,
+)
+
+
+def reference_rank(scored_proposals: dict, criteria_with_weights: list) -> list:
+    """The previous pure-Python ranking (calculate_weighted_score per proposal, twice)."""
+    all_proposals = []
+    for pid, data in scored_proposals.items():
+        scores = data.get("scores", {})
+        calculate_weighted_score(scores, criteria_with_weights)  # first pass (qualified list)
+        weighted_score = calculate_weighted_score(scores, criteria_with_weights)
+        all_proposals.append({"proposal_id": pid, "total_score": weighted_score,
+                              "is_qualified": weighted_score >= 70.0})
+    all_proposals.sort(key=lambda x: (x["is_qualified"], x["total_score"]), reverse=True)
+    return all_proposals
+
+
+def make_data(n_proposals: int, n_criteria: int, seed: int = 7):
+    rng = random.Random(seed)
+    criteria = [{"name": f"criterion_{j}", "weight": 100.0 / n_criteria} for j in range(n_criteria)]
+    scored = {
+        f"proposal_{i}.pdf": {
+            "name": f"Proposal {i}",
+            "scores": {c["name"]: float(rng.randint(40, 100)) for c in criteria},
+            "overall_comment": "",
+        }
+        for i in range(n_proposals)
+    }
+    return scored, criteria
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000.0
+
+
+def main():
+    print(f"{'proposals':>10} {'criteria':>9} {'reference ms':>13} {'matrix build ms':>16} {'vector rank ms':>15} "
+          f"{'rank_proposals ms':>18} {'same order':>11}")
+    for n_proposals, n_criteria in [(10, 5), (1_000, 10), (5_000, 20), (20_000, 40)]:
+        scored, criteria = make_data(n_proposals, n_criteria)
+        weights = normalized_weight_vector(criteria)
+        ids, matrix = build_score_matrix(scored, criteria)
+
+        ref_ms = best_of(lambda: reference_rank(scored, criteria))
+        build_ms = best_of(lambda: build_score_matrix(scored, criteria))
+        rank_ms = best_of(lambda: rank_score_matrix(matrix, weights))
+        with contextlib.redirect_stdout(io.StringIO()):
+            total_ms = best_of(lambda: rank_proposals(scored, criteria))
+
+        _, _, order = rank_score_matrix(matrix, weights)
+        same = [ids[i] for i in order] == [p["proposal_id"] for p in reference_rank(scored, criteria)]
+        print(f"{n_proposals:>10} {n_criteria:>9} {ref_ms:>13.3f} {build_ms:>16.3f} {rank_ms:>15.3f} {total_ms:>18.3f} "
+              f"{str(same):>11}")
+
+
+if __name__ == "__main__":
+    main()
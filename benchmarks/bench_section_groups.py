@@ -0,0 +1,51 @@
+# benchmarks/bench_section_groups.py
+"""
+Benchmark: LLM calls per generation run with and without grouped boilerplate
+sections, against a local OpenAI-compatible mock. The groups are
+GENERATION_SECTION_GROUPS if set, otherwise BOILERPLATE_GROUPS.
+
+Run from the project root:
+    python -m benchmarks.bench_section_groups
+"""
+import contextlib
+import io
+import time
+from langchain_openai import ChatOpenAI
+from config import GENERATION_SECTION_GROUPS
+from nodes.llm_runtime import run_coroutine
+from nodes.orchestrator_graph import build_decisions, generate_sections_async
+from nodes.prompts import PROMPTS
+from tests.mock_openai import MockOpenAI, start_mock_server
+from tests.sample_form import SAMPLE_FORM
+
+BOILERPLATE_GROUPS = [
+    ["Text_of_Costs_of_Competition_Documents", "Alternative_Offers", "Offer_Formatting_Requirements", "Joint_Venture"],
+]
+
+
+def run(llm, groups):
+    decisions = build_decisions(dict(SAMPLE_FORM))
+    MockOpenAI.reset()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        decisions = run_coroutine(generate_sections_async(llm, PROMPTS, list(PROMPTS), decisions, groups=groups))
+    elapsed = (time.perf_counter() - start) * 1000.0
+    filled = sum(1 for s in PROMPTS if decisions.get(s) and decisions[s] != "تعذر توليد النص.")
+    return MockOpenAI.requests, MockOpenAI.prompt_chars, elapsed, filled
+
+
+def main():
+    server, base_url = start_mock_server()
+    llm = ChatOpenAI(model="mock-model", api_key="sk-mock", base_url=base_url, max_retries=0)
+    section_groups = GENERATION_SECTION_GROUPS or BOILERPLATE_GROUPS
+    print(f"groups: {section_groups}")
+    print(f"{'mode':>10} {'sections':>9} {'calls':>6} {'prompt chars':>13} {'ms':>8}")
+    run(llm, [])  # warm the connection pool
+    for name, groups in [("single", []), ("grouped", section_groups)]:
+        calls, chars, elapsed, filled = run(llm, groups)
+        print(f"{name:>10} {filled:>9} {calls:>6} {chars:>13} {elapsed:>8.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_table_insert.py
+"""
+Benchmark: table insertion into the rendered RFP document, by number of tables.
+
+- "scan":  the previous lookup: every heading / placeholder lookup walks all body
+           paragraphs, then every table -> row.cells -> cell paragraphs
+- "index": one nodes.docx_renderer.table_index traversal per document, shared by
+           all insertions
+
+The template is rendered once per run (cached template); only the insertions are
+timed. Tables cycle through TABLE_PLACEMENTS. Fails if both lookups do not pick
+the same target paragraph for every placement.
+
+Run from the project root:
+    python -m benchmarks.bench_table_insert
+"""
+import statistics
+import time
+from docx.text.paragraph import Paragraph
+from nodes.docx_renderer import TABLE_PLACEMENTS, find_table_target, insert_table, table_index
+from nodes.template_cache import template_for_render
+from benchmarks.bench_docx_save import SAMPLE_TABLE, sample_context
+
+TABLE_COUNTS = (1, 4, 8, 16)
+RUNS = 3
+
+
+class ScanLookup:
+    """The previous lookup (full document scan per call), with ParagraphIndex's interface."""
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def exact(self, text: str):
+        for p in self.doc.paragraphs:
+            if p.text.strip() == text.strip():
+                return p
+        return None
+
+    def containing(self, text: str):
+        for p in self.doc.paragraphs:
+            if text in p.text:
+                return p
+        for table in self.doc.tables:
+            for row in table.rows:
+                for cell in row.cells:
+                    for p in cell.paragraphs:
+                        if text in p.text:
+                            return p
+        return None
+
+
+def rendered_document():
+    context, _ = sample_context()
+    tpl = template_for_render()
+    tpl.render({k: v for k, v in context.items() if k not in TABLE_PLACEMENTS})
+    return tpl.docx
+
+
+def insert_tables(doc, count: int, shared_index: bool) -> float:
+    placements = list(TABLE_PLACEMENTS.values())
+    started = time.perf_counter()
+    index = table_index(doc) if shared_index else None
+    for i in range(count):
+        placeholder_text, heading_text = placements[i % len(placements)]
+        insert_table(doc, SAMPLE_TABLE, placeholder_text, heading_text,
+                     index=index if shared_index else ScanLookup(doc))
+    return (time.perf_counter() - started) * 1000.0
+
+
+def check_same_targets():
+    doc = rendered_document()
+    index, scan = table_index(doc), ScanLookup(doc)
+    for key, (placeholder_text, heading_text) in TABLE_PLACEMENTS.items():
+        a = find_table_target(index, placeholder_text, heading_text)
+        b = find_table_target(scan, placeholder_text, heading_text)
+        element = (lambda p: p._element if isinstance(p, Paragraph) else None)
+        assert element(a) is element(b), f"different target for {key}"
+
+
+def main():
+    check_same_targets()
+    print(f"{'tables':>7} {'scan ms':>9} {'index ms':>9}")
+    for count in TABLE_COUNTS:
+        results = {}
+        for shared_index in (False, True):
+            results[shared_index] = statistics.median(
+                insert_tables(rendered_document(), count, shared_index) for _ in range(RUNS)
+            )
+        print(f"{count:>7} {results[False]:>9.1f} {results[True]:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
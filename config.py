@@ -4,4 +4,95 @@ from dotenv import load_dotenv
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-MODEL_NAME = "gpt-4o" 
\ No newline at end of file
+MODEL_NAME = "gpt-4o" 
+
+# Maximum number of proposals evaluated in parallel by the comparison workflow
+EVALUATION_MAX_CONCURRENCY = int(os.getenv("EVALUATION_MAX_CONCURRENCY", "4"))
+
+# SQLite database holding LangGraph checkpoints of comparison runs (for resume)
+COMPARISON_CHECKPOINT_DB = os.getenv("COMPARISON_CHECKPOINT_DB", os.path.join("comparison_runs", "checkpoints.sqlite"))
+
+# Background comparison jobs: worker threads per process, and where they run
+# ("thread": inside the web process, "process": only `python -m workflow.comparison_jobs`)
+COMPARISON_WORKERS = int(os.getenv("COMPARISON_WORKERS", "2"))
+COMPARISON_WORKER_MODE = os.getenv("COMPARISON_WORKER_MODE", "thread")
+COMPARISON_JOBS_DB = os.getenv("COMPARISON_JOBS_DB", os.path.join("comparison_runs", "jobs.sqlite"))
+# A running job refreshes its heartbeat every COMPARISON_JOB_HEARTBEAT_SECONDS; one not refreshed for
+# COMPARISON_JOB_STALE_SECONDS (its worker died) is queued again and resumes from its last checkpoint
+COMPARISON_JOB_HEARTBEAT_SECONDS = float(os.getenv("COMPARISON_JOB_HEARTBEAT_SECONDS", "30"))
+COMPARISON_JOB_STALE_SECONDS = float(os.getenv("COMPARISON_JOB_STALE_SECONDS", "300"))
+# An open /compare_jobs/<id>/events stream holds a server thread; it is closed after
+# COMPARISON_SSE_MAX_SECONDS and the client's EventSource reconnects with Last-Event-ID
+COMPARISON_SSE_MAX_SECONDS = float(os.getenv("COMPARISON_SSE_MAX_SECONDS", "120"))
+
+# Per-run comparison workspaces (uploads + artifacts) and their cleanup
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "comparison_runs")
+WORKSPACE_TTL_HOURS = float(os.getenv("WORKSPACE_TTL_HOURS", "72"))
+WORKSPACE_JANITOR_INTERVAL_MINUTES = float(os.getenv("WORKSPACE_JANITOR_INTERVAL_MINUTES", "30"))
+
+# Section generation: shared LLM budget (in-flight calls per model, all requests together)
+# and the fixed thread pool used for blocking LLM calls
+LLM_MAX_IN_FLIGHT_PER_MODEL = int(os.getenv("LLM_MAX_IN_FLIGHT_PER_MODEL", "8"))
+LLM_EXECUTOR_WORKERS = int(os.getenv("LLM_EXECUTOR_WORKERS", "8"))
+
+# Word template rendered by /save; its placeholders decide which LLM sections are generated
+RFP_TEMPLATE_PATH = os.getenv("RFP_TEMPLATE_PATH", os.path.join("templates", "rfp_general.docx"))
+
+# Short boilerplate sections generated together in one structured-output call per group
+# ("A,B,C;D,E" = two groups). A failed group falls back to per-section calls.
+# Opt-in (empty by default): in benchmarks/bench_section_groups.py grouping
+# Text_of_Costs_of_Competition_Documents,Alternative_Offers,Offer_Formatting_Requirements,Joint_Venture
+# saved 3 of 16 calls but the run took longer (127.9 ms vs 102.8 ms): the grouped call
+# returns only once all of its sections are written, and streams nothing before that.
+GENERATION_SECTION_GROUPS = [
+    [s.strip() for s in group.split(",") if s.strip()]
+    for group in os.getenv("GENERATION_SECTION_GROUPS", "").split(";")
+    if group.strip()
+]
+
+# Model used for every RFP section (and generated tables) unless tiering is enabled
+GENERATION_MODEL_NAME = os.getenv("GENERATION_MODEL_NAME", "gpt-5-mini")
+# Per-task model tiers (opt-in: LLM_TIERING_ENABLED=1). Off, every task uses one
+# "default" tier on GENERATION_MODEL_NAME without an output cap or client timeout.
+LLM_TIERING_ENABLED = os.getenv("LLM_TIERING_ENABLED", "0") == "1"
+
+# Model tiers for RFP generation: model, temperature, max output tokens and latency budget
+# (seconds; the client timeout, calls over it are counted in rfp_llm_budget_exceeded_total).
+# The first tier is the strongest: a weaker tier's empty completion is retried on it.
+# gpt-5 reasoning models (not gpt-5-chat) accept only their default temperature: langchain_openai
+# drops any other value, so "temperature" applies only to models that support it. Their
+# reasoning tokens count towards max_tokens, so a low cap can leave the visible text empty.
+LLM_TIERS = {
+    "strong": {
+        "model": os.getenv("LLM_STRONG_MODEL", GENERATION_MODEL_NAME),
+        "temperature": 0.3,
+        "max_tokens": int(os.getenv("LLM_STRONG_MAX_TOKENS", "6000")),
+        "latency_budget": float(os.getenv("LLM_STRONG_LATENCY_BUDGET", "120")),
+    },
+    "fast": {
+        "model": os.getenv("LLM_FAST_MODEL", "gpt-5-nano"),
+        "temperature": 0.3,
+        "max_tokens": int(os.getenv("LLM_FAST_MAX_TOKENS", "2500")),
+        "latency_budget": float(os.getenv("LLM_FAST_LATENCY_BUDGET", "45")),
+    },
+} if LLM_TIERING_ENABLED else {
+    "default": {"model": GENERATION_MODEL_NAME, "temperature": 0.3},
+}
+# Task (section name or "generate_table") -> tier; other tasks use DEFAULT_LLM_TIER
+LLM_TASK_TIERS = {
+    "Project_Scope_of_Work": "strong",
+    "Technical_Proposal_Documents": "strong",
+    "Financial_Proposal_Documents": "strong",
+    "Bid_Evaluation_Criteria": "strong",
+    "Service_Execution_Method": "strong",
+    "Service_Delivery_Plan": "strong",
+    "generate_table": "strong",
+}
+DEFAULT_LLM_TIER = os.getenv("DEFAULT_LLM_TIER", "fast") if LLM_TIERING_ENABLED else "default"
+
+# Whole-request deadline (seconds) for generating the RFP sections; sections still
+# running when it expires are cancelled and left for /rfp_regenerate
+GENERATION_DEADLINE_SECONDS = float(os.getenv("GENERATION_DEADLINE_SECONDS", "180"))
+# Time kept back, per level of dependent sections, from the calls they wait for
+# (e.g. Bid_Evaluation_Criteria after the technical / financial sections); at most half the remaining time
+GENERATION_DEPENDENT_RESERVE_SECONDS = float(os.getenv("GENERATION_DEPENDENT_RESERVE_SECONDS", "45"))
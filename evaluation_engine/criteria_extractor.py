@@ -5,6 +5,8 @@ from utils.helpers import normalize_arabic_text
 from utils.prompts import FOCUS_WINDOW_PROMPT
 from langchain_openai import ChatOpenAI
 from config import OPENAI_API_KEY, MODEL_NAME
+from utils.llm_clients import get_chat_model
+from utils.metrics import timed_stage
 import json
 
 # Keywords to identify evaluation sections
@@ -60,12 +62,12 @@ def chunk_text_by_tokens(text: str, max_tokens: int = 4500) -> List[str]:
     
     return chunks
 
-def extract_criteria_with_llm(focused_chunks: List[str]) -> List[Dict]:
+def extract_criteria_with_llm(focused_chunks: List[str], llm: Optional[ChatOpenAI] = None) -> List[Dict]:
     """Extract criteria using LLM on focused chunks"""
     if not focused_chunks:
         return []
     
-    llm = ChatOpenAI(model=MODEL_NAME, temperature=0.0, api_key=OPENAI_API_KEY)
+    llm = llm or get_chat_model(MODEL_NAME, 0.0)
     
     all_extracted_criteria = []
     
@@ -252,7 +254,8 @@ def enforce_financial_rule_and_mix(extracted: Dict, full_text: str) -> Dict:
         extracted["financial_rule"] = "بعد اجتياز التقييم الفني (≥ 70%) يتم تقييم العروض المالية واختيار صاحب العرض المالي الأعلى"
     return extracted
 
-def extract_criteria_from_rfp_summary(rfp_summary: RFPSummary, full_rfp_text: str = "") -> list: 
+@timed_stage("extract_criteria")
+def extract_criteria_from_rfp_summary(rfp_summary: RFPSummary, full_rfp_text: str = "", llm: Optional[ChatOpenAI] = None) -> list: 
     """
     Extracts criteria names and weights from RFP summary Pydantic object.
     Uses the new 'evaluation_criteria_details' structure based on the provided text.
@@ -275,7 +278,7 @@ def extract_criteria_from_rfp_summary(rfp_summary: RFPSummary, full_rfp_text: st
             
             if chunks:
                 # Extract criteria using LLM
-                extracted_criteria = extract_criteria_with_llm(chunks)
+                extracted_criteria = extract_criteria_with_llm(chunks, llm)
                 if extracted_criteria:
                     # Merge and process extracted criteria
                     merged = merge_extracted_criteria(extracted_criteria)
@@ -1,14 +1,26 @@
 # evaluation_engine/evaluator.py
+import ast
+import difflib
 import json
 import re
+import threading
 from typing import Dict, List, Optional, Any # Add Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI # Import ChatOpenAI instead of ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
-from utils.prompts import EVALUATION_PROMPT
+from utils.prompts import EVALUATION_PROMPT, EVALUATION_REASK_PROMPT
+from utils.helpers import normalize_arabic_text
+from utils.llm_clients import get_chat_model
+from utils.metrics import timed_stage
 # Import OpenAI API key and model name (changed variable name)
 from config import OPENAI_API_KEY, MODEL_NAME
 
+# Maximum number of targeted re-asks for criteria missing from the first reply
+MAX_REASKS = 1
+# A re-ask sends a bounded excerpt of the proposal and of the RFP summary, not the full texts
+REASK_EXCERPT_CHARS = 6000
+REASK_SUMMARY_CHARS = 2000
+
 # --- Pydantic Models for Structured Output ---
 class EvaluationScore(BaseModel):
     """Represents a single criterion's score."""
@@ -21,6 +33,11 @@ class EvaluationResult(BaseModel):
     overall_comment: str
     raw_response: Optional[str] = None
 
+class LLMEvaluationOutput(BaseModel):
+    """Shape the LLM is asked to return in JSON mode (scores keyed by criterion name)."""
+    scores: Dict[str, float] = Field(default_factory=dict)
+    overall_comment: str = ""
+
 # --- Pydantic Model for Comparison Log Entry ---
 class ComparisonLogEntry(BaseModel):
     """Represents a single comparison log entry."""
@@ -44,106 +61,249 @@ def extract_json_from_llm_output(text: str) -> str:
         return match.group(0)
     return text.strip() # Return as is if no match
 
-def evaluate_proposal(proposal_text: str, rfp_summary: dict, criteria_list: list) -> EvaluationResult:
-    # Use ChatOpenAI instead of ChatGoogleGenerativeAI
-    # Use OPENAI_API_KEY instead of google_api_key
-    llm = ChatOpenAI(model=MODEL_NAME, temperature=0.0, api_key=OPENAI_API_KEY)
-    prompt = PromptTemplate.from_template(EVALUATION_PROMPT)
-    chain = prompt | llm
+# --- Local repair helpers ---
 
-    # Add a safety check if criteria_list is empty
-    if not criteria_list:
-        print("⚠️ تحذير: قائمة المعايير فارغة.")
-        criteria_list = ["السعر", "الجودة", "الجدول الزمني"] # Default fallback
+def loads_tolerant(text: str) -> Optional[dict]:
+    """
+    Parse a JSON object from an LLM reply, repairing the usual defects locally:
+    Markdown fences, smart quotes, trailing commas, Arabic digits and
+    Python-style dict literals. Returns None if nothing usable is found.
+    """
+    if not text:
+        return None
+    candidate = extract_json_from_llm_output(text)
+    attempts = [candidate]
 
-    criteria_str = ", ".join(criteria_list)
-    # Use json.dumps for better formatting of the rfp_summary dict
-    rfp_summary_str = json.dumps(rfp_summary, indent=2) # Remove ensure_ascii=False
-    response = chain.invoke({
-        "rfp_summary": rfp_summary_str, # Pass the formatted JSON string
-        "proposal_text": proposal_text,
-        "criteria_list": criteria_str
-    })
+    repaired = candidate.replace("“", '"').replace("”", '"').replace("’", "'").replace("‘", "'")
+    repaired = repaired.replace("٫", ".").replace("٪", "%")
+    repaired = normalize_arabic_text(repaired) if re.search(r'[٠-٩]', repaired) else repaired
+    repaired = re.sub(r',\s*([}\]])', r'\1', repaired)
+    attempts.append(repaired)
+
+    for attempt in attempts:
+        try:
+            parsed = json.loads(attempt)
+            if isinstance(parsed, dict):
+                return parsed
+        except (json.JSONDecodeError, ValueError):
+            pass
+    try:
+        parsed = ast.literal_eval(repaired)
+        if isinstance(parsed, dict):
+            return parsed
+    except (ValueError, SyntaxError):
+        pass
+    return None
+
+def _coerce_score(value: Any) -> Optional[float]:
+    """
+    Turn 85, "85", "85%", "85/100" or {"score": 85} into a float.
+    Scores outside 0-100 (e.g. "-3") are rejected (None), so the criterion is asked again.
+    """
+    if isinstance(value, dict):
+        value = value.get("score", value.get("value"))
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        score = float(value)
+    else:
+        match = re.search(r'([-−]?\d+(?:\.\d+)?)\s*(?:/\s*(\d+(?:\.\d+)?))?', str(value))
+        if not match:
+            return None
+        score = float(match.group(1).replace("−", "-"))
+        if match.group(2) and float(match.group(2)) > 0:
+            score = score / float(match.group(2)) * 100.0
+    return score if 0.0 <= score <= 100.0 else None
+
+def _coerce_scores(raw_scores: Any) -> Dict[str, float]:
+    """Accept scores as a {criterion: score} dict or a [{"criterion", "score"}] list."""
+    if isinstance(raw_scores, list):
+        raw_scores = {
+            item.get("criterion") or item.get("name"): item.get("score")
+            for item in raw_scores if isinstance(item, dict)
+        }
+    if not isinstance(raw_scores, dict):
+        return {}
+    scores = {}
+    for criterion, value in raw_scores.items():
+        score = _coerce_score(value)
+        if criterion and score is not None:
+            scores[str(criterion)] = score
+    return scores
+
+def _criterion_key(name: str) -> str:
+    """Normalized form of a criterion name used for matching."""
+    key = normalize_arabic_text(name or "")
+    key = re.sub(r'[أإآ]', 'ا', key).replace('ة', 'ه').replace('ى', 'ي')
+    key = re.sub(r'[^\w]+', ' ', key)
+    return re.sub(r'\s+', ' ', key).strip().lower()
+
+def reconcile_criteria(scores: Dict[str, float], criteria_list: list) -> tuple[Dict[str, float], List[str]]:
+    """
+    Map the criterion names returned by the LLM back to the requested names.
+    Returns (scores keyed by the requested names, requested criteria still missing).
+    """
+    wanted = {_criterion_key(c): c for c in criteria_list}
+    reconciled: Dict[str, float] = {}
+    for returned_name, score in scores.items():
+        if returned_name in criteria_list:
+            reconciled.setdefault(returned_name, score)
+            continue
+        key = _criterion_key(returned_name)
+        match = wanted.get(key)
+        if match is None:
+            # A shortened or extended name contained in exactly one requested name; ambiguous
+            # containment is left to the fuzzy match
+            contained = [k for k in wanted if k and (k in key or key in k)]
+            if len(contained) == 1:
+                match = wanted[contained[0]]
+        if match is None:
+            close = difflib.get_close_matches(key, list(wanted), n=1, cutoff=0.75)
+            if close:
+                match = wanted[close[0]]
+        if match is None:
+            print(f"⚠️ تحذير: معيار غير معروف في استجابة التقييم '{returned_name}'. تم تجاهله.")
+            continue
+        reconciled.setdefault(match, score)
+
+    missing = [c for c in criteria_list if c not in reconciled]
+    return reconciled, missing
+
+def reask_excerpt(proposal_text: str, criteria: list, limit: int = REASK_EXCERPT_CHARS) -> str:
+    """
+    The proposal paragraphs sharing the most words with the criteria, in their
+    original order, up to `limit` characters (the start of the text if none match).
+    """
+    words = {w for c in criteria for w in _criterion_key(c).split() if len(w) > 2}
+    paragraphs = [p.strip() for p in (proposal_text or "").split("\n") if p.strip()]
+    overlap = [len(words & set(_criterion_key(p).split())) for p in paragraphs]
+    chosen, size = [], 0
+    for i in sorted(range(len(paragraphs)), key=lambda i: -overlap[i]):
+        if overlap[i] and size + len(paragraphs[i]) <= limit:
+            chosen.append(i)
+            size += len(paragraphs[i]) + 1
+    if not chosen:
+        return (proposal_text or "")[:limit]
+    return "\n".join(paragraphs[i] for i in sorted(chosen))
+
+# --- End local repair helpers ---
+
+def _parse_structured_reply(reply: dict) -> tuple[Dict[str, Any], str]:
+    """Return (parsed payload, raw text) from a with_structured_output(include_raw=True) reply."""
+    raw_message = reply.get("raw")
+    raw_text = getattr(raw_message, "content", "") or ""
+    parsed = reply.get("parsed")
+    if isinstance(parsed, LLMEvaluationOutput):
+        return parsed.model_dump(), raw_text
+    if reply.get("parsing_error") is not None:
+        print(f"⚠️ استجابة التقييم لم تطابق المخطط، محاولة الإصلاح محليًا: {str(reply['parsing_error']).splitlines()[0]}")
+    return loads_tolerant(raw_text) or {}, raw_text
+
+# Parallel evaluations of the same run append to the same log file
+_log_lock = threading.Lock()
 
-    # --- NEW LOGIC: Save the comparison details as structured JSON ---
+def _log_comparison(criteria_str: str, rfp_summary_str: str, proposal_text: str, llm_response: str,
+                    log_path: Optional[str] = None) -> None:
+    """
+    Append the raw evaluation exchange to the run's comparison log (in its workspace).
+    Without a log path nothing is written: runs never share a global log.
+    """
+    if not log_path:
+        return
     # Create a log entry object
     log_entry = ComparisonLogEntry(
         proposal_id="N/A", # This will be set later when the proposal ID is known
         criteria_list=criteria_str,
         rfp_summary_preview=rfp_summary_str[:500] + "...", # Truncate for preview
         proposal_text_preview=proposal_text[:1000] + "...", # Truncate for preview
-        llm_response=response.content
+        llm_response=llm_response
     )
     # Create a log file for comparisons (append mode) - Save as JSON
-    comparison_log_path = "./evaluation_comparisons.json" # Change extension to .json
+    comparison_log_path = log_path
     try:
-        # Read existing log file if it exists
-        existing_entries = []
-        try:
-            with open(comparison_log_path, 'r', encoding='utf-8') as log_file:
-                content = log_file.read()
-                if content: # Check if file is not empty
-                    existing_entries = json.loads(content)
-        except FileNotFoundError:
-            pass # It's okay if the file doesn't exist yet
-
-        # Append the new entry
-        existing_entries.append(log_entry.model_dump())
-
-        # Write the updated list back to the file
-        with open(comparison_log_path, 'w', encoding='utf-8') as log_file:
-            json.dump(existing_entries, log_file, indent=2, ensure_ascii=False) # Add ensure_ascii=False for writing JSON file
-        print(f"📝 تفاصيل المقارنة لعرض تم حفظها في '{comparison_log_path}'")
+        with _log_lock:
+            # Read existing log file if it exists
+            existing_entries = []
+            try:
+                with open(comparison_log_path, 'r', encoding='utf-8') as log_file:
+                    content = log_file.read()
+                    if content: # Check if file is not empty
+                        existing_entries = json.loads(content)
+            except FileNotFoundError:
+                pass # It's okay if the file doesn't exist yet
+
+            # Append the new entry
+            existing_entries.append(log_entry.model_dump())
+
+            # Write the updated list back to the file
+            with open(comparison_log_path, 'w', encoding='utf-8') as log_file:
+                json.dump(existing_entries, log_file, indent=2, ensure_ascii=False) # Add ensure_ascii=False for writing JSON file
+            print(f"📝 تفاصيل المقارنة لعرض تم حفظها في '{comparison_log_path}'")
     except Exception as e:
         print(f"❌ خطأ في حفظ تفاصيل المقارنة: {str(e)}")
-    # --- END NEW LOGIC ---
 
-    # DEBUG: Print the raw response from the LLM
-    print(f"--- DEBUG: Raw LLM Response for a Proposal ---\n{response.content}\n--- END DEBUG ---")
+@timed_stage("evaluate_proposal")
+def evaluate_proposal(proposal_text: str, rfp_summary: dict, criteria_list: list, llm: Optional[ChatOpenAI] = None,
+                      log_path: Optional[str] = None) -> EvaluationResult:
+    """
+    Evaluate one proposal against the criteria using JSON-mode output.
 
-    try:
-        # Clean the response before parsing
-        clean_response = extract_json_from_llm_output(response.content)
-        parsed_data = json.loads(clean_response)
-
-        # --- NEW LOGIC: Convert to Pydantic Model ---
-        # Assuming the LLM returns JSON like {"scores": {"criterion1": 80, "criterion2": 90}, "overall_comment": "..."}
-        raw_scores = parsed_data.get("scores", {})
-        overall_comment = parsed_data.get("overall_comment", "No comment provided.")
-
-        # Convert raw scores dict to list of EvaluationScore models
-        score_objects = []
-        for criterion, score_value in raw_scores.items():
-            # Validate score is within expected range if necessary
-            if not (0 <= score_value <= 100):
-                 print(f"⚠️ تحذير: درجة غير صحيحة {score_value} ل criterion '{criterion}'. استخدام 0.")
-                 score_value = 0.0
-            score_obj = EvaluationScore(criterion=criterion, score=score_value)
-            score_objects.append(score_obj)
-
-        result = EvaluationResult(
-            scores=score_objects,
-            overall_comment=overall_comment,
-            raw_response=response.content # Optionally store raw response
-        )
-        # --- END NEW LOGIC ---
-
-        return result
-    except json.JSONDecodeError as e:
-        print(f"❌ خطأ في تحليل JSON من التقييم: {e}")
-        print(f"❌ محتوى الاستجابة: {response.content}")
-        # Return a default failure structure as a Pydantic model
-        score_objects = [EvaluationScore(criterion=c, score=0.0) for c in criteria_list]
-        return EvaluationResult(
-            scores=score_objects,
-            overall_comment="فشل التقييم بسبب خطأ في تنسيق الاستجابة.",
-            raw_response=response.content
-        )
-    except Exception as e:
-        print(f"❌ خطأ غير متوقع أثناء معالجة التقييم: {e}")
-        score_objects = [EvaluationScore(criterion=c, score=0.0) for c in criteria_list]
-        return EvaluationResult(
-            scores=score_objects,
-            overall_comment="فشل التقييم بسبب خطأ غير معروف.",
-            raw_response=response.content
-        )
+    Malformed replies are repaired locally (tolerant JSON parsing and
+    criterion-name reconciliation). Criteria still missing after repair are
+    re-asked in one small targeted call instead of re-running the evaluation.
+    The LLM client is injected by the workflow; the shared evaluation client is used otherwise.
+    """
+    llm = llm or get_chat_model(MODEL_NAME, 0.0)
+    structured_llm = llm.with_structured_output(LLMEvaluationOutput, method="json_mode", include_raw=True)
+    chain = PromptTemplate.from_template(EVALUATION_PROMPT) | structured_llm
+
+    # Add a safety check if criteria_list is empty
+    if not criteria_list:
+        print("⚠️ تحذير: قائمة المعايير فارغة.")
+        criteria_list = ["السعر", "الجودة", "الجدول الزمني"] # Default fallback
+
+    criteria_str = ", ".join(criteria_list)
+    # Use json.dumps for better formatting of the rfp_summary dict
+    rfp_summary_str = json.dumps(rfp_summary, indent=2) # Remove ensure_ascii=False
+    reply = chain.invoke({
+        "rfp_summary": rfp_summary_str, # Pass the formatted JSON string
+        "proposal_text": proposal_text,
+        "criteria_list": criteria_str
+    })
+    parsed_data, raw_text = _parse_structured_reply(reply)
+
+    _log_comparison(criteria_str, rfp_summary_str, proposal_text, raw_text, log_path)
+
+    scores, missing = reconcile_criteria(_coerce_scores(parsed_data.get("scores")), criteria_list)
+    overall_comment = parsed_data.get("overall_comment") or "No comment provided."
+
+    # Targeted re-ask: only the criteria the first reply did not cover, with bounded excerpts
+    if missing:
+        reask_chain = PromptTemplate.from_template(EVALUATION_REASK_PROMPT) | structured_llm
+        rfp_summary_excerpt = json.dumps(rfp_summary, ensure_ascii=False)[:REASK_SUMMARY_CHARS]
+    for _ in range(MAX_REASKS):
+        if not missing:
+            break
+        print(f"🔁 إعادة طلب تقييم المعايير الناقصة فقط ({len(missing)}): {missing}")
+        reask_reply = reask_chain.invoke({
+            "rfp_summary": rfp_summary_excerpt,
+            "proposal_text": reask_excerpt(proposal_text, missing),
+            "criteria_list": ", ".join(missing)
+        })
+        reask_data, reask_raw = _parse_structured_reply(reask_reply)
+        recovered, missing = reconcile_criteria(_coerce_scores(reask_data.get("scores")), missing)
+        scores.update(recovered)
+        raw_text = f"{raw_text}\n--- REASK ---\n{reask_raw}"
+
+    if missing:
+        print(f"❌ تعذر الحصول على درجات المعايير: {missing}. استخدام 0.")
+        overall_comment += f"\n⚠️ لم يتم تقييم المعايير التالية بسبب خطأ في تنسيق الاستجابة: {', '.join(missing)}"
+
+    # _coerce_score already rejected scores outside 0-100
+    score_objects = [EvaluationScore(criterion=c, score=scores.get(c, 0.0)) for c in criteria_list]
+
+    return EvaluationResult.model_validate({
+        "scores": [s.model_dump() for s in score_objects],
+        "overall_comment": overall_comment,
+        "raw_response": raw_text # Optionally store raw response
+    })
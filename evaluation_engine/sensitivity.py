@@ -0,0 +1,138 @@
+# evaluation_engine/sensitivity.py
+"""
+Weight-sensitivity analysis of a finished comparison (POST /compare_llm/sensitivity).
+
+Every sampled weight vector is scored and ordered by ranker.rank_score_matrix,
+the same accumulation, rounding and tie order as the ranking itself, so a
+"winner change" is never floating-point noise between two scoring paths.
+"""
+from typing import Dict, List, Optional
+import time
+import numpy as np
+from evaluation_engine.ranker import normalized_weight_vector, rank_score_matrix
+
+DEFAULT_SAMPLES = 2000
+DEFAULT_DELTA = 5.0  # weight points added/removed around each criterion
+
+
+def matrix_from_results(results: List[dict], criteria_with_weights: list) -> tuple[list, np.ndarray]:
+    """
+    Build the proposals × criteria matrix from the /compare_llm results payload
+    ({"proposal_name", "scores": [{"criterion", "score"}]}). Missing criteria score 0.
+    """
+    column = {c["name"]: j for j, c in enumerate(criteria_with_weights)}
+    names = []
+    matrix = np.zeros((len(results), len(criteria_with_weights)), dtype=np.float64)
+    for i, item in enumerate(results):
+        names.append(item.get("proposal_name") or item.get("name") or f"proposal_{i + 1}")
+        scores = item.get("scores") or []
+        if isinstance(scores, dict):
+            scores = [{"criterion": k, "score": v} for k, v in scores.items()]
+        for s in scores:
+            j = column.get(s.get("criterion"))
+            if j is not None:
+                matrix[i, j] = float(s.get("score") or 0.0)
+    return names, matrix
+
+
+def _ranks_for_weights(matrix: np.ndarray, weight_batch: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rank all proposals under every weight vector at once.
+    weight_batch has shape (n_samples, n_criteria) in percent.
+    Returns (ranks, qualified), both of shape (n_proposals, n_samples); rank 0 is the winner.
+    """
+    _, qualified, order = rank_score_matrix(matrix, weight_batch.T)
+    ranks = np.empty_like(order)
+    positions = np.broadcast_to(np.arange(matrix.shape[0])[:, None], order.shape)
+    np.put_along_axis(ranks, order, positions, axis=0)
+    return ranks, qualified
+
+
+def _renormalize(weight_batch: np.ndarray) -> np.ndarray:
+    """Clip negative weights and rescale each vector to sum to 100, as the ranker does."""
+    weight_batch = np.clip(weight_batch, 0.0, None)
+    sums = weight_batch.sum(axis=1, keepdims=True)
+    sums[sums == 0] = 1.0
+    return weight_batch / sums * 100.0
+
+
+def analyze_weight_sensitivity(matrix: np.ndarray,
+                               criteria_with_weights: list,
+                               proposal_names: list,
+                               n_samples: int = DEFAULT_SAMPLES,
+                               delta: float = DEFAULT_DELTA,
+                               seed: Optional[int] = None) -> Dict:
+    """
+    Weight-sensitivity and rank-stability analysis over an existing score matrix.
+
+    - Monte Carlo: samples n_samples weight vectors, each criterion moved uniformly
+      within ±delta points of its weight, and ranks every proposal under all of them
+      in one batched pass.
+    - Sweep: moves each criterion by exactly +delta and -delta and reports whether
+      the winner changes ("would the winner change if X weighed 5 points more?").
+
+    Returns per-proposal win probability, rank-flip probability (rank differs from
+    the base ranking) and stability score (1 - flip probability).
+    """
+    started = time.perf_counter()
+    weights = normalized_weight_vector(criteria_with_weights)
+    n_proposals, n_criteria = matrix.shape
+    if n_proposals == 0 or n_criteria == 0:
+        return {"proposals": [], "winner_stability": None, "sweep": [], "samples": 0, "elapsed_ms": 0.0}
+
+    base_totals, base_qualified, base_order = rank_score_matrix(matrix, weights)
+    base_ranks = np.empty(n_proposals, dtype=np.int64)
+    base_ranks[base_order] = np.arange(n_proposals)
+    winner = int(base_order[0])
+
+    rng = np.random.default_rng(seed)
+    noise = rng.uniform(-delta, delta, size=(n_samples, n_criteria))
+    sampled = _renormalize(weights[None, :] + noise)
+    ranks, qualified = _ranks_for_weights(matrix, sampled)
+
+    flipped = ranks != base_ranks[:, None]
+    flip_probability = flipped.mean(axis=1)
+    win_probability = (ranks == 0).mean(axis=1)
+    qualification_probability = qualified.mean(axis=1)
+
+    # One-at-a-time sweep: +delta and -delta for each criterion
+    steps = np.concatenate([np.eye(n_criteria) * delta, np.eye(n_criteria) * -delta])
+    swept = _renormalize(weights[None, :] + steps)
+    sweep_ranks, _ = _ranks_for_weights(matrix, swept)
+    sweep_winners = np.argmin(sweep_ranks, axis=0)
+
+    sweep = []
+    for j, criterion in enumerate(criteria_with_weights):
+        for direction, col in (("+", j), ("-", n_criteria + j)):
+            new_winner = int(sweep_winners[col])
+            sweep.append({
+                "criterion": criterion["name"],
+                "change": float(delta if direction == "+" else -delta),
+                "winner": proposal_names[new_winner],
+                "winner_changed": new_winner != winner,
+            })
+
+    proposals = []
+    for i in base_order.tolist():
+        proposals.append({
+            "proposal_name": proposal_names[i],
+            "base_rank": int(base_ranks[i]) + 1,
+            "total_score": float(base_totals[i]),
+            "is_qualified": bool(base_qualified[i]),
+            "win_probability": round(float(win_probability[i]), 4),
+            "rank_flip_probability": round(float(flip_probability[i]), 4),
+            "stability_score": round(1.0 - float(flip_probability[i]), 4),
+            "qualification_probability": round(float(qualification_probability[i]), 4),
+            "best_rank": int(ranks[i].min()) + 1,
+            "worst_rank": int(ranks[i].max()) + 1,
+        })
+
+    return {
+        "proposals": proposals,
+        "winner": proposal_names[winner],
+        "winner_stability": round(float(win_probability[winner]), 4),
+        "sweep": sweep,
+        "samples": int(n_samples),
+        "delta": float(delta),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 2),
+    }
@@ -2,11 +2,11 @@
 from nodes.orchestrator_graph import build_orchestrator_graph
 # from nodes.render_node import render_node
 from langgraph.graph import StateGraph,START, END
-from typing import TypedDict
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
-import os
-import json
+from utils.llm_clients import ModelRouter
+from utils.llm_callbacks import FirstLLMCallTimer
+from config import GENERATION_DEADLINE_SECONDS
+import time
 
 # ============================================================
 # 🧠 تحميل المتغيرات البيئية (API Keys)
@@ -16,17 +16,22 @@ load_dotenv()
 # ============================================================
 # 🤖 إعداد النموذج
 # ============================================================
-llm = ChatOpenAI(
-    model="gpt-5-mini",
-    temperature=0.3
-)
+# نموذج لكل قسم حسب فئته (LLM_TIERS / LLM_TASK_TIERS في config.py)، يُنشأ عند أول استخدام
+_llm = None
 
 def get_llm():
-    return llm
+    global _llm
+    if _llm is None:
+        _llm = ModelRouter()
+    return _llm
 
-orchestrator_graph = build_orchestrator_graph(llm)
-
-def build_main_app():
+def build_main_app(llm=None):
+    """
+    Builds the generation graph. The LLM client is injected into the orchestrator
+    sub-graph; use workflow.graph_registry.get_graph("rfp_generation") to get the
+    compiled instance shared by all requests.
+    """
+    orchestrator_graph = build_orchestrator_graph(llm or get_llm())
     g = StateGraph(dict)
 
     # ✅ return the WHOLE dict from orchestrator_graph, not just decisions
@@ -48,26 +53,33 @@ def build_main_app():
 
     return g.compile()
 
-app = build_main_app()
+def generation_deadline(started: float = None) -> float:
+    """مهلة الطلب كاملاً (time.perf_counter) تُمرَّر إلى كل استدعاءات الأقسام"""
+    return (time.perf_counter() if started is None else started) + GENERATION_DEADLINE_SECONDS
 
-def run_graph(user_data: dict):
+def run_graph(user_data: dict, started: float = None):
     """
     ✅ استدعاء LangGraph بشكل صحيح وتمرير الـ user input في raw_input
+    الأقسام التي لم تكتمل قبل المهلة تُرجع في result["timed_out_sections"]
     """
     print("⚙️ تشغيل LangGraph...")
-    print("🔥 USER DATA RECEIVED BY GRAPH:", user_data)
 
     initial_state = {
         "raw_input": user_data,    # ← هنا ندخل بيانات المستخدم
         "decisions": {},           # ← يملؤها orchestrator
         "sections": [],            # ← ليتم تعبئتها بناءً على الـ FIELD_MAP
-        "completed_sections": []   # ← مطلوب من StateGraph
+        "completed_sections": [],  # ← مطلوب من StateGraph
+        "deadline": generation_deadline(started),
     }
 
+    from workflow.graph_registry import get_graph
+    app = get_graph("rfp_generation")
+    config = {"callbacks": [FirstLLMCallTimer("rfp_generation", started)]}
+
     result = {}
 
     try:
-        for event in app.stream(initial_state):  # ✅ لا تمريّرس messages هنا
+        for event in app.stream(initial_state, config=config):  # ✅ لا تمريّرس messages هنا
             for value in event.values():
                 result.update(value)
     except Exception as e:
@@ -76,10 +88,34 @@ def run_graph(user_data: dict):
     return result
 
 
+def stream_graph(user_data: dict, started: float = None, stream_tokens: bool = False):
+    """
+    مثل run_graph لكن يُرجع الأقسام أولاً بأول: يولّد أحداث {"type": "section"}
+    (و {"type": "delta"} عند stream_tokens) ثم حدثاً أخيراً {"type": "result", "result": ...}.
+    """
+    print("⚙️ تشغيل LangGraph (بث الأقسام)...")
 
+    initial_state = {
+        "raw_input": user_data,
+        "decisions": {},
+        "sections": [],
+        "completed_sections": [],
+        "stream_tokens": stream_tokens,
+        "deadline": generation_deadline(started),
+    }
 
+    from workflow.graph_registry import get_graph
+    app = get_graph("rfp_generation")
+    config = {"callbacks": [FirstLLMCallTimer("rfp_generation", started)]}
 
+    result = {}
+    # subgraphs=True: أحداث الأقسام تُكتب داخل الـ orchestrator graph المتداخل
+    for namespace, mode, chunk in app.stream(initial_state, config=config,
+                                             stream_mode=["custom", "updates"], subgraphs=True):
+        if mode == "custom":
+            yield chunk
+        elif not namespace:
+            for value in chunk.values():
+                result.update(value)
 
-
-
-
+    yield {"type": "result", "result": result}
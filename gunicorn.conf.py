@@ -0,0 +1,36 @@
+# gunicorn.conf.py
+"""
+gunicorn -c gunicorn.conf.py app:app
+
+Importing app.py is cheap (LangGraph/LangChain/OpenAI, docxtpl and python-docx
+are imported on first use), so workers boot fast. Each worker then warms up in
+the background after it has loaded the app: graphs are compiled, LLM clients
+created and the Word template read before the first request needs them.
+
+Warm-up runs per worker, after the fork: the shared LLM event loop thread and
+HTTP connection pools do not survive fork(), so they must not be created in the
+master.
+"""
+import os
+import threading
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+# Each open /compare_jobs/<id>/events stream occupies one of these threads (polling
+# SQLite every 0.5 s) until the job finishes or COMPARISON_SSE_MAX_SECONDS elapses;
+# raise GUNICORN_THREADS with the number of clients expected to watch jobs at once
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))  # generation deadline is GENERATION_DEADLINE_SECONDS
+
+
+def post_worker_init(worker):
+    from workflow.graph_registry import warm_up
+    from workflow.comparison_jobs import recover_jobs
+    from workflow.workspaces import start_janitor
+
+    # A request arriving during warm-up waits for the graph being compiled (get_graph lock)
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    # Comparisons left queued / interrupted by a previous worker (thread mode)
+    recover_jobs()
+    # Expired comparison workspaces (WORKSPACE_TTL_HOURS) are removed in the background
+    start_janitor()
@@ -0,0 +1,182 @@
+# nodes/docx_renderer.py
+"""
+Word output of /save, built in memory in one pass.
+
+The template is rendered once with docxtpl, using the process-level cache of
+nodes.template_cache: the XML patching and Jinja compilation are shared, while
+each document still loads its own python-docx Document from the cached bytes. The tables produced by the table generator (pipe-separated text kept
+in the session) are inserted into the same rendered document, and the result is
+serialized once to a BytesIO, which the caller persists / serves.
+
+Table targets (headings and {{placeholder}} markers) are looked up in a
+ParagraphIndex built with one traversal of the document, shared by all the
+insertions, instead of scanning every paragraph and table cell per lookup.
+"""
+import io
+from typing import Dict, Iterable, List, Optional, Tuple
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt
+from docx.text.paragraph import Paragraph
+from config import RFP_TEMPLATE_PATH
+from nodes.template_cache import template_for_render
+
+# session key -> (placeholder in the template, heading the table is inserted after)
+TABLE_PLACEMENTS: Dict[str, Tuple[str, Optional[str]]] = {
+    "Bill_of_Quantities_and_Prices": ("{{Bill_of_Quantities_and_Prices}}", "جدول الكميات والأسعار"),
+    "Materials_Specifications_Table": ("{{Materials_Specifications_Table}}", "جدول مواصفات المواد"),
+    "Equipment_Specifications_Table": ("{{Equipment_Specifications_Table}}", "واصفات المعدات"),
+    "Workers_Table": ("{{Workers_Table}}", "ثانياً: جدول مواصفات فريق العمل"),
+}
+
+
+def parse_table_text(table_text: str) -> Optional[Tuple[List[str], List[List[str]]]]:
+    """(headers, rows) of a pipe-separated table, or None when it has no table lines."""
+    lines = [l.strip() for l in (table_text or "").split("\n") if "|" in l]
+    if not lines:
+        return None
+    headers = [h.strip() for h in lines[0].split("|")]
+    rows = [l.split("|") for l in lines[1:]]
+    return headers, rows
+
+
+class ParagraphIndex:
+    """
+    Paragraphs of a document indexed by the texts table insertion looks for, from a
+    single traversal: the body paragraphs, then the paragraphs of the body's table
+    cells (the same places and order as doc.paragraphs and doc.tables -> rows ->
+    cells -> paragraphs, without python-docx's costly row.cells grid resolution).
+
+    - exact(text): first body paragraph whose stripped text equals the text
+    - containing(text): first paragraph containing one of the indexed `needles`
+    """
+
+    def __init__(self, doc, needles: Iterable[str]):
+        self.doc = doc
+        needles = [n for n in dict.fromkeys(needles) if n]
+        self._exact: Dict[str, object] = {}
+        self._body: Dict[str, object] = {}
+        self._cells: Dict[str, object] = {}
+
+        body = doc.element.body
+        for p in body.iterchildren(qn("w:p")):
+            text = p.text
+            self._exact.setdefault(text.strip(), p)
+            self._match(p, text, needles, self._body)
+        for tbl in body.iterchildren(qn("w:tbl")):
+            for tr in tbl.tr_lst:
+                for tc in tr.tc_lst:
+                    for p in tc.p_lst:
+                        self._match(p, p.text, needles, self._cells)
+
+    @staticmethod
+    def _match(p, text: str, needles: List[str], found: Dict[str, object]) -> None:
+        for needle in needles:
+            if needle not in found and needle in text:
+                found[needle] = p
+
+    def _paragraph(self, p) -> Optional[Paragraph]:
+        return None if p is None else Paragraph(p, self.doc._body)
+
+    def exact(self, text: str) -> Optional[Paragraph]:
+        return self._paragraph(self._exact.get(text.strip()))
+
+    def containing(self, text: str) -> Optional[Paragraph]:
+        """The first paragraph containing the text; it must be one of the indexed needles."""
+        return self._paragraph(self._body.get(text, self._cells.get(text)))
+
+
+def table_index(doc) -> ParagraphIndex:
+    """Index of every heading and placeholder of TABLE_PLACEMENTS."""
+    needles = [text for placement in TABLE_PLACEMENTS.values() for text in placement]
+    return ParagraphIndex(doc, needles)
+
+
+def find_table_target(index: ParagraphIndex, placeholder_text: str, heading_text: Optional[str] = None):
+    """The paragraph a table goes after: the heading (exact, then contained), else the placeholder."""
+    target_paragraph = None
+    if heading_text:
+        target_paragraph = index.exact(heading_text) or index.containing(heading_text)
+    if not target_paragraph:
+        target_paragraph = index.containing(placeholder_text)
+    return target_paragraph
+
+
+def insert_table(doc, table_text: str, placeholder_text: str, heading_text: Optional[str] = None,
+                 index: Optional[ParagraphIndex] = None) -> bool:
+    """
+    إدراج جدول داخل المستند في موقع محدد.
+
+    إذا تم تمرير heading_text، سيُدرج الجدول مباشرة بعد فقرة تحتوي على العنوان.
+    إذا لم يوجد العنوان، سيبحث عن placeholder ويُدرج بعده. وإذا لم يُعثر على أي منهما، يتخطى الإدراج.
+    index: فهرس المستند (table_index) المشترك بين كل الإدراجات؛ يُبنى هنا إن لم يُمرَّر.
+    """
+    parsed = parse_table_text(table_text)
+    if parsed is None:
+        return False
+    headers, rows = parsed
+
+    if index is None:
+        index = ParagraphIndex(doc, [placeholder_text, heading_text])
+    target_paragraph = find_table_target(index, placeholder_text, heading_text)
+    if not target_paragraph:
+        print(f"⚠️ لم يتم العثور على العنوان '{heading_text}' ولا على placeholder {placeholder_text} داخل القالب.")
+        return False
+
+    # إذا وجد placeholder داخل الفقرة، امسح نصه
+    if placeholder_text and placeholder_text in target_paragraph.text:
+        target_paragraph.text = ""
+
+    # إنشاء الجدول وضبط اتجاهه RTL
+    table = doc.add_table(rows=1, cols=len(headers))
+    table.style = "Table Grid"
+    tbl = table._element
+    tbl.set(qn("w:tblDir"), "rtl")
+    tbl.set(qn("w:tblLayout"), "fixed")
+
+    # تنسيق صف العناوين
+    hdr_cells = table.rows[0].cells
+    for i, h in enumerate(headers):
+        p = hdr_cells[i].paragraphs[0]
+        run = p.add_run(h)
+        run.bold = True
+        run.font.size = Pt(12)
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        shading = OxmlElement("w:shd")
+        shading.set(qn("w:fill"), "D9D9D9")
+        hdr_cells[i]._tc.get_or_add_tcPr().append(shading)
+
+    # صفوف البيانات
+    for r in rows:
+        row_cells = table.add_row().cells
+        for i, c in enumerate(r):
+            p = row_cells[i].paragraphs[0]
+            run = p.add_run(c.strip())
+            run.font.size = Pt(11)
+            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # إدراج الجدول مباشرة بعد الفقرة الهدف
+    target_paragraph._element.addnext(table._element)
+    return True
+
+
+def render_rfp_docx(context: dict, tables: Dict[str, str], template_path: str = RFP_TEMPLATE_PATH) -> io.BytesIO:
+    """
+    Render the template once with `context`, insert `tables` (session key -> table
+    text, placed per TABLE_PLACEMENTS) into the rendered document and serialize it
+    once. Returns the .docx bytes, rewound.
+    """
+    tpl = template_for_render(template_path)
+    tpl.render(context)
+
+    doc = tpl.docx  # المستند المُعبأ في الذاكرة — تُدرج فيه كل الجداول قبل الحفظ مرة واحدة
+    index = table_index(doc) if any(key in tables for key in TABLE_PLACEMENTS) else None
+    for key, (placeholder_text, heading_text) in TABLE_PLACEMENTS.items():
+        if key in tables and insert_table(doc, tables[key], placeholder_text, heading_text, index=index):
+            print(f"✅ تم إدراج الجدول: {key}")
+
+    buffer = io.BytesIO()
+    tpl.save(buffer)
+    buffer.seek(0)
+    return buffer
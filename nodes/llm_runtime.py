@@ -0,0 +1,163 @@
+# nodes/llm_runtime.py
+"""
+Process-wide LLM execution layer for section generation.
+
+- One fixed-size thread pool for blocking llm.invoke fallbacks (instead of a new
+  executor per call).
+- One in-flight budget per model shared by every request: concurrent
+  /rfp_generate requests queue for the same LLM_MAX_IN_FLIGHT_PER_MODEL slots
+  instead of each firing all of their sections at once.
+- One long-lived event loop thread that runs every request's section
+  generation, so the shared async OpenAI client keeps its pooled (TLS)
+  connections between requests instead of losing them with a per-request loop.
+- Graceful shutdown at interpreter exit.
+
+The budget is awaited like an asyncio.Semaphore but is not bound to one event
+loop, so requests running on different loops/threads share it.
+"""
+import asyncio
+import atexit
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from config import LLM_EXECUTOR_WORKERS, LLM_MAX_IN_FLIGHT_PER_MODEL
+from utils.metrics import LLM_IN_FLIGHT, LLM_WAITING
+
+
+class ModelBudget:
+    """Cross-event-loop async semaphore: FIFO, a released slot is handed to the oldest waiter."""
+
+    def __init__(self, model: str, limit: int):
+        self.model = model
+        self.limit = limit
+        self._available = limit
+        self._waiters = collections.deque()  # (loop, future)
+        self._lock = threading.Lock()
+        self._in_flight = LLM_IN_FLIGHT.series(model)
+        self._waiting = LLM_WAITING.series(model)
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                self._in_flight[0] += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+            self._waiting[0] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    self._waiting[0] -= 1
+                    raise
+            # The slot was handed to us just before the cancellation: pass it on
+            self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight[0] -= 1
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                self._waiting[0] -= 1
+                if loop.is_closed():
+                    continue
+                # The slot moves to the waiter directly (available stays unchanged)
+                self._in_flight[0] += 1
+                loop.call_soon_threadsafe(_wake, future)
+                return
+            self._available += 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+    # A cancelled waiter that already got the slot releases it in acquire()
+
+
+_budgets: Dict[str, ModelBudget] = {}
+_budgets_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def model_key(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or "default"
+
+
+def get_budget(llm) -> ModelBudget:
+    """The shared in-flight budget of the llm's model."""
+    key = model_key(llm)
+    budget = _budgets.get(key)
+    if budget is None:
+        with _budgets_lock:
+            budget = _budgets.setdefault(key, ModelBudget(key, LLM_MAX_IN_FLIGHT_PER_MODEL))
+    return budget
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Fixed-size pool for blocking LLM calls, shared by all requests."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=LLM_EXECUTOR_WORKERS, thread_name_prefix="llm")
+    return _executor
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The background event loop shared by all generation requests (started on first use)."""
+    global _loop, _loop_thread
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True)
+                _loop_thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_coroutine(coro, timeout: Optional[float] = None):
+    """
+    Run a coroutine on the background loop and wait for its result from a sync
+    caller (Flask request thread, LangGraph node). The caller's context variables
+    (e.g. LangChain callbacks) are carried over to the task.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop accepting LLM work, let running calls finish, then stop the background loop."""
+    global _executor, _loop, _loop_thread
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+    with _loop_lock:
+        loop, thread, _loop, _loop_thread = _loop, _loop_thread, None, None
+    if loop is not None:
+        loop.call_soon_threadsafe(loop.stop)
+        if wait and thread is not None:
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+
+
+atexit.register(shutdown)
@@ -1,11 +1,31 @@
 # nodes/orchestrator_graph.py
 from langgraph.graph import StateGraph, START, END
+from langgraph.config import get_stream_writer
 from datetime import datetime, timedelta
 from typing import TypedDict, Annotated
 from nodes.field_map import FIELD_MAP
 import operator
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import time
+from openai import APITimeoutError
+from pydantic import create_model
+from config import GENERATION_DEADLINE_SECONDS, GENERATION_DEPENDENT_RESERVE_SECONDS, GENERATION_SECTION_GROUPS
+from nodes.llm_runtime import get_budget, get_executor, run_coroutine
+from nodes.section_dependencies import (
+    build_prompt, dependency_depth, fingerprint_sections, generation_order, plan_section_groups,
+    section_prerequisites, stale_sections,
+)
+from nodes.template_fields import prune_to_template
+from utils.llm_clients import ModelRouter, resolve_llm, track_tier_latency
+from utils.metrics import timed_stage, STAGE_ERRORS, SECTION_TIMEOUTS
+
+# مهلة القسم (wait_for) أو مهلة عميل النموذج (latency_budget) — لا يُعاد الاستدعاء بعدها
+TIMEOUT_ERRORS = (asyncio.TimeoutError, APITimeoutError)
+TIMED_OUT_TEXT = "لم يكتمل توليد هذا القسم ضمن المهلة المحددة، يمكن إعادة توليده."
+FAILED_TEXT = "تعذر توليد النص."
+LLM_ERROR_TEXT = "تعذر توليد الفقرة بسبب خطأ تقني."
+# نص قسم سابق لا يصلح أساساً لقسم يعتمد عليه
+UNUSABLE_TEXTS = (None, "", TIMED_OUT_TEXT, FAILED_TEXT, LLM_ERROR_TEXT)
 
 
 # -----------------------------------------------------
@@ -16,6 +36,9 @@ class State(TypedDict):
     decisions: dict
     sections: list[str]
     completed_sections: Annotated[list, operator.add]
+    stream_tokens: bool
+    deadline: float                  # time.perf_counter() الذي يجب أن ينتهي التوليد قبله
+    timed_out_sections: list[str]
 
 
 # -----------------------------------------------------
@@ -42,39 +65,82 @@ def generate_auto_dates(issue_date: str | None):
 # -----------------------------------------------------
 # ✅ استدعاء LLM (يدعم async/sync)
 # -----------------------------------------------------
-async def _call_llm_async(llm, prompt: str) -> str:
-    """يدعم llm.invoke و llm.ainvoke تلقائياً"""
-    # الطريقة الأولى: async مباشرة
-    if hasattr(llm, "ainvoke"):
+@timed_stage("generate_section")
+async def _call_llm_async(llm, prompt: str, on_token=None) -> str:
+    """
+    يدعم llm.invoke و llm.ainvoke تلقائياً — ضمن ميزانية الاستدعاءات المشتركة لكل نموذج.
+    استدعاء واحد فقط لكل قسم: انتهاء المهلة يُعاد رفعه، وأي خطأ آخر يُرجع LLM_ERROR_TEXT
+    دون إعادة المحاولة بطريقة أخرى (ولا يُعاد بث نص وصل جزء منه).
+    """
+    async with get_budget(llm):
         try:
-            res = await llm.ainvoke(prompt)
-            return getattr(res, "content", res).strip()
-        except Exception:
-            pass
-
-    # الطريقة الثانية: تشغيل invoke داخل ThreadPool
-    loop = asyncio.get_running_loop()
-
-    def sync():
+            # البث كلمة بكلمة (astream) عند الطلب
+            if on_token is not None and hasattr(llm, "astream"):
+                parts = []
+                async for chunk in llm.astream(prompt):
+                    text = getattr(chunk, "content", chunk)
+                    if text:
+                        parts.append(text)
+                        on_token(text)
+                return "".join(parts).strip()
+
+            # الطريقة الأولى: async مباشرة
+            if hasattr(llm, "ainvoke"):
+                res = await llm.ainvoke(prompt)
+                return getattr(res, "content", res).strip()
+        except TIMEOUT_ERRORS:
+            STAGE_ERRORS.inc("generate_section")
+            raise
+        except Exception as e:
+            STAGE_ERRORS.inc("generate_section")
+            print(f"⚠️ فشل استدعاء النموذج: {e}")
+            return LLM_ERROR_TEXT
+
+        # الطريقة الثانية (للعملاء بلا ainvoke فقط): تشغيل invoke داخل الـ ThreadPool المشترك
+        loop = asyncio.get_running_loop()
+
+        def sync():
+            try:
+                res = llm.invoke(prompt)
+                return getattr(res, "content", res).strip()
+            except Exception:
+                STAGE_ERRORS.inc("generate_section")
+                return LLM_ERROR_TEXT
+
+        return await loop.run_in_executor(get_executor(), sync)
+
+
+@timed_stage("generate_section_group")
+async def _call_llm_grouped(llm, prompts_by_section: dict) -> dict:
+    """
+    يولّد عدة أقسام في استدعاء واحد بمخرجات مهيكلة (JSON مفاتيحه أسماء الأقسام).
+    يُرجع {} عند الفشل ليتم التوليد المنفرد.
+    """
+    if not hasattr(llm, "with_structured_output"):
+        return {}
+    model = create_model("GroupedSections", **{sec: (str, ...) for sec in prompts_by_section})
+    parts = [
+        "ستكتب عدة أقسام مستقلة من كراسة الشروط في استجابة واحدة.",
+        "أعد كائن JSON فقط، مفاتيحه أسماء الأقسام التالية تماماً، وقيمة كل مفتاح نص القسم وفق تعليماته:",
+    ]
+    for sec, prompt in prompts_by_section.items():
+        parts.append(f"### {sec}\n{prompt.strip()}")
+    async with get_budget(llm):
         try:
-            res = llm.invoke(prompt)
-            return getattr(res, "content", res).strip()
-        except Exception:
-            return "تعذر توليد الفقرة بسبب خطأ تقني."
-
-    return await loop.run_in_executor(ThreadPoolExecutor(max_workers=6), sync)
+            structured = llm.with_structured_output(model, method="json_mode")
+            res = await structured.ainvoke("\n\n".join(parts))
+        except Exception as e:
+            STAGE_ERRORS.inc("generate_section_group")
+            print(f"⚠️ فشل توليد مجموعة الأقسام {list(prompts_by_section)}: {e}")
+            return {}
+    return {sec: text.strip() for sec, text in res.model_dump().items() if isinstance(text, str) and text.strip()}
 
 
 # -----------------------------------------------------
-# ✅ orchestrator — تجهيز البيانات وتحديد الأقسام المراد توليدها
+# ✅ تجهيز القرارات من مدخلات المستخدم (تُستخدم في التوليد وإعادة التوليد)
 # -----------------------------------------------------
-def orchestrator(state: State):
-    from flask import session
-
-    state.setdefault("decisions", {})
-    decisions = state["decisions"]
-
-    raw = state.get("raw_input")
+def build_decisions(raw, decisions: dict | None = None) -> dict:
+    decisions = {} if decisions is None else decisions
 
     if isinstance(raw, dict):
         decisions.update(raw)
@@ -92,6 +158,18 @@ def orchestrator(state: State):
     # إضافة التواريخ التلقائية
     decisions.update(generate_auto_dates(decisions.get("Issue_Date")))
 
+    return decisions
+
+
+# -----------------------------------------------------
+# ✅ orchestrator — تجهيز البيانات وتحديد الأقسام المراد توليدها
+# -----------------------------------------------------
+def orchestrator(state: State):
+    from flask import session
+
+    state.setdefault("decisions", {})
+    decisions = build_decisions(state.get("raw_input"), state["decisions"])
+
     # اختيار الـ sections وفق checkbox من المستخدم
     include = session.get("include_sections", {})
     sections = []
@@ -105,104 +183,209 @@ def orchestrator(state: State):
 
             sections.append(key)
 
-    decisions["raw_input"] = state.get("raw_input")
+    # الأقسام التي لا يستخدمها قالب الوورد (ولا يعتمد عليها قسم مستخدم) لا تُولَّد
+    sections = prune_to_template(sections)
 
     return {"sections": sections, "decisions": decisions}
 
 
 # -----------------------------------------------------
-# ✅ توليد الفقرات بالتوازي + Bid Evaluation يعتمد على الفني والمالي
+# ✅ توليد الفقرات وفق مخطط الاعتماديات (DAG): يبدأ كل قسم فور اكتمال الأقسام التي يعتمد عليها
 # -----------------------------------------------------
-async def generate_sections_async(llm, prompts, sections, d):
-    completed = {}
+async def generate_sections_async(llm, prompts, sections, d, on_event=None, stream_tokens=False, groups=None,
+                                  deadline=None, timed_out=None):
+    """
+    on_event (اختياري) يستقبل حدث {"type": "section"} عند اكتمال كل قسم،
+    وأحداث {"type": "delta"} بأجزاء النص عند stream_tokens.
+    groups: مجموعات الأقسام القصيرة المولَّدة معاً (الافتراضي GENERATION_SECTION_GROUPS، و [] للتعطيل).
+    llm: نموذج واحد لكل الأقسام، أو ModelRouter يختار نموذج كل قسم حسب LLM_TASK_TIERS.
+    deadline: لحظة (time.perf_counter) انتهاء مهلة الطلب كاملاً (الافتراضي الآن + GENERATION_DEADLINE_SECONDS).
+    كل استدعاء يأخذ الوقت المتبقي ناقصاً وقتاً محجوزاً للأقسام التي تنتظره، وعند انتهاء المهلة
+    تُلغى الأقسام الجارية وتُعاد الأقسام المكتملة.
+    timed_out: تُضاف إليه الأقسام التي لم تُولَّد (انتهت مهلتها، أو فشل توليدها، أو لم يكتمل قسم
+    تعتمد عليه فلم تُولَّد) لتُعاد عند /rfp_regenerate.
+    """
+    todo = [s for s in sections if s in prompts]
+    started_at = time.perf_counter()
+    deadline = started_at + GENERATION_DEADLINE_SECONDS if deadline is None else deadline
+    timed_out = [] if timed_out is None else timed_out
+    tasks = {}
+    recorded = set()
+
+    def _record(sec, res, start, expired=False):
+        recorded.add(sec)
+        if expired:
+            d[sec] = TIMED_OUT_TEXT
+            timed_out.append(sec)
+            SECTION_TIMEOUTS.inc(sec)
+        else:
+            # نص فارغ (مثلاً نفدت max_tokens في التفكير) يُعامل كفشل
+            d[sec] = res if isinstance(res, str) and res else FAILED_TEXT
+            if d[sec] in (FAILED_TEXT, LLM_ERROR_TEXT):
+                timed_out.append(sec)
+        end = time.perf_counter() - started_at
+        print(f"{'⌛' if expired else '⏱️'} {sec}: بدأ عند {start:.2f}ث وانتهى عند {end:.2f}ث"
+              + (" (انتهت المهلة)" if expired else ""))
+        if on_event is not None:
+            on_event({"type": "section", "section": sec, "text": d[sec],
+                      "started": round(start, 3), "ended": round(end, 3), "timed_out": expired})
+
+    def _sub_budget(secs):
+        # الوقت المتبقي ناقصاً ما يُحجز للأقسام التي تنتظر هذا الاستدعاء (معايير التقييم ← الفني والمالي):
+        # GENERATION_DEPENDENT_RESERVE_SECONDS لكل مستوى، ولا يتجاوز المحجوز نصف الوقت المتبقي
+        remaining = max(deadline - time.perf_counter(), 0.0)
+        levels = max(dependency_depth(sec, todo) for sec in secs) - 1
+        return remaining - min(levels * GENERATION_DEPENDENT_RESERVE_SECONDS, remaining / 2)
+
+    async def _generate_one(sec):
+        start = time.perf_counter() - started_at
+        def on_token(text):
+            on_event({"type": "delta", "section": sec, "text": text})
 
-    independent = [s for s in sections if s in prompts and s != "Bid_Evaluation_Criteria"]
-
-    async def _generate_parallel():
-        tasks = []
-        for sec in independent:
-            prompt = prompts[sec].format(**d)
+        try:
+            # خطأ في بناء الطلب يُسجَّل للقسم وحده ولا يُسقط بقية الأقسام
+            prompt = build_prompt(sec, d, prompts)
             print(f"\n🟦 Generating: {sec}")
             print("🔹 Final Prompt Sent:\n", prompt)
             print("---------------------------------------------------\n")
-            tasks.append(_call_llm_async(llm, prompt))
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for sec, res in zip(independent, results):
-            completed[sec] = res if isinstance(res, str) else "تعذر توليد النص."
-
-        d.update(completed)
-
-        # الآن نولّد Bid Evaluation Criteria بعد الفني والمالي
-        if "Bid_Evaluation_Criteria" in sections:
-            tech = d.get("Technical_Proposal_Documents", "")
-            fin = d.get("Financial_Proposal_Documents", "")
-
-            eval_prompt = f"""
-تحليل المحتوى التالي لاستخراج عناصر التقييم:
-
-العرض الفني:
-{tech}
-
-العرض المالي:
-{fin}
-
-المطلوب:
-
-إنشاء نموذج "معايير تقييم العروض" جاهز للإدراج في كراسة الشروط.
-
-التوجيهات:
-
-أولا تقسيم المعايير إلى مستويين فقط:
-- المستوى الأول: تقييم فني
-- المستوى الثاني: تقييم مالي
-
-ثانيا استخراج عناصر التقييم من محتوى العرض الفني والمالي أعلاه، وليس من خيالك.
-لا تتجاوز خمسة عناصر فنية وعنصرين ماليين.
-
-ثالثا توزيع النقاط يتم حسب طريقة الترسية الموضحة في الإدخال Award_Method:{d.get("Award_Method")}
-
-
-- إذا كانت الترسية تعتمد على أفضل عرض فني فقط Best Technical Offer فليكن التركيز الأكبر للنقاط في الجانب الفني مع حصة بسيطة للمالي
-- إذا كانت Best Value فيجب توزيع النقاط بشكل متوازن بين الفني والمالي
-- إذا كانت Lowest Price فيكون الجانب المالي هو الأعلى وزنا ويكون الفني داعما
-
-رابعا إخراج النتيجة في جدول فقط يحتوي الأعمدة:
-المستوى الأول | المستوى الثاني | الوزن | النقاط
-
-خامسا يمنع كتابة شرح أو فقرات أو تعريفات. الجدول فقط.
-
-ثامنا مهم جدا:
-يمنع استخدام الأقواس بجميع أنواعها سواء كانت دائرية أو مربعة أو معقوفة.
-اكتب النص بدون أي أقواس.
-
-أخيرا اختم بجملة رسمية:
-يتم ترسية المنافسة على العرض الحاصل على أعلى مجموع نقاط بعد التقييم الفني والمالي.
-"""
-
+            section_llm, tier = resolve_llm(llm, sec)
+        except Exception as e:
+            print(f"⚠️ تعذر بناء طلب القسم {sec}: {e}")
+            _record(sec, None, start, expired=True)
+            return
+        stream = on_token if on_event and stream_tokens else None
+        try:
+            with track_tier_latency(llm, tier):
+                res = await asyncio.wait_for(_call_llm_async(section_llm, prompt, on_token=stream), _sub_budget([sec]))
+            # استجابة فارغة من فئة أضعف تُعاد مرة واحدة على الفئة الأقوى (لم يُبث منها شيء)
+            stronger = llm.escalation_tier(tier) if isinstance(llm, ModelRouter) else None
+            if res == "" and stronger:
+                print(f"⚠️ {sec}: استجابة فارغة من الفئة {tier}، إعادة المحاولة على {stronger}")
+                with track_tier_latency(llm, stronger):
+                    res = await asyncio.wait_for(_call_llm_async(llm.clients[stronger], prompt, on_token=stream),
+                                                 _sub_budget([sec]))
+        except TIMEOUT_ERRORS:
+            _record(sec, None, start, expired=True)
+            return
+        except Exception:
+            res = None
+        _record(sec, res, start)
+
+    async def _generate(sec):
+        # انتظار الأقسام المطلوبة فقط (مثلاً معايير التقييم ← الفني والمالي)
+        prerequisites = section_prerequisites(sec)
+        scheduled = [p for p in prerequisites if p in tasks]
+        if scheduled:
+            await asyncio.gather(*{tasks[p] for p in scheduled})
+        # قسم سابق لم يُولَّد (انتهت مهلته، أو فشل، أو لم يُجدوَل وليس له نص سابق):
+        # لا يُبنى الطلب على نص المهلة/الخطأ، ويُترك القسم لإعادة التوليد
+        missing = sorted(p for p in prerequisites
+                         if p in timed_out or (p not in tasks and d.get(p) in UNUSABLE_TEXTS))
+        if missing:
+            print(f"⏭️ {sec}: لم يُولَّد لأن الأقسام التي يعتمد عليها لم تكتمل: {missing}")
+            _record(sec, None, time.perf_counter() - started_at, expired=True)
+            return
+        await _generate_one(sec)
+
+    async def _generate_group(group):
+        # أقسام قصيرة في استدعاء واحد؛ ما لم يرجع صالحاً يُولَّد منفرداً
+        start = time.perf_counter() - started_at
+        print(f"\n🟪 Generating group: {group}")
+        if isinstance(llm, ModelRouter):
+            tier = llm.tier_for_group(group)
+            group_llm = llm.clients[tier]
+        else:
+            group_llm, tier = llm, "default"
+        try:
+            with track_tier_latency(llm, tier):
+                texts = await asyncio.wait_for(
+                    _call_llm_grouped(group_llm, {sec: build_prompt(sec, d, prompts) for sec in group}),
+                    _sub_budget(group))
+        except TIMEOUT_ERRORS:
+            for sec in group:
+                _record(sec, None, start, expired=True)
+            return
+        except Exception as e:
+            print(f"⚠️ فشل توليد مجموعة الأقسام {group}: {e}")
+            texts = {}
+        missing = []
+        for sec in group:
+            if texts.get(sec):
+                _record(sec, texts[sec], start)
+            else:
+                missing.append(sec)
+        if missing:
+            print(f"↩️ توليد منفرد للأقسام التي لم تُرجعها المجموعة: {missing}")
+            await asyncio.gather(*(_generate_one(sec) for sec in missing))
+
+    groups = plan_section_groups(todo, GENERATION_SECTION_GROUPS if groups is None else groups)
+    for group in groups:
+        task = asyncio.create_task(_generate_group(group))
+        for sec in group:
+            tasks[sec] = task
+    grouped = {sec for group in groups for sec in group}
+    for sec in generation_order(todo):
+        if sec not in grouped:
+            tasks[sec] = asyncio.create_task(_generate(sec))
+
+    # حد أقصى للطلب كاملاً (مع هامش لتسجيل الاستدعاءات التي تنتهي مهلتها عند الحد نفسه)
+    pending = set(tasks.values())
+    if pending:
+        done, pending = await asyncio.wait(pending, timeout=max(deadline - time.perf_counter(), 0.0) + 1.0)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        for task in done:
+            if task.exception() is not None:
+                print(f"⚠️ خطأ غير متوقع أثناء التوليد: {task.exception()!r}")
+        # الأقسام الملغاة أو التي توقفت مهمتها بخطأ: تُسجَّل ولا تُفقد الأقسام المكتملة
+        for sec in todo:
+            if sec not in recorded:
+                _record(sec, None, time.perf_counter() - started_at, expired=True)
+
+    return d
+
+
+@timed_stage("generate_all_sections")
+def generate_all_sections(state, llm):
+    from nodes.prompts import PROMPTS
 
+    d = state["decisions"]
+    sections = state["sections"]
 
-            result = await _call_llm_async(llm, eval_prompt)
-            d["Bid_Evaluation_Criteria"] = result
+    # كل قسم يُرسل فور اكتماله لمن يستمع (stream_mode="custom")، ولا أثر له مع invoke العادي
+    writer = get_stream_writer()
 
-        return d
+    # حلقة أحداث دائمة مشتركة بين الطلبات (تحافظ على اتصالات HTTP المفتوحة مع OpenAI)
+    timed_out = []
+    new_decisions = run_coroutine(generate_sections_async(
+        llm, PROMPTS, sections, d, on_event=writer, stream_tokens=bool(state.get("stream_tokens")),
+        deadline=state.get("deadline"), timed_out=timed_out))
 
-    return await _generate_parallel()
+    return {"decisions": new_decisions, "timed_out_sections": timed_out}
 
 
-def generate_all_sections(state, llm):
+# -----------------------------------------------------
+# ✅ إعادة توليد الأقسام التي تغيّرت مدخلاتها فقط
+# -----------------------------------------------------
+@timed_stage("regenerate_sections")
+def regenerate_sections(llm, decisions: dict, fingerprints: dict, deadline: float = None):
+    """
+    Regenerates only the sections (among those in `fingerprints`) whose inputs
+    changed or that timed out before, plus their dependents. Returns (decisions,
+    regenerated sections, updated fingerprints); sections timing out again keep
+    an empty fingerprint.
+    """
     from nodes.prompts import PROMPTS
 
-    d = state["decisions"]
-    sections = state["sections"]
-
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    new_decisions = loop.run_until_complete(generate_sections_async(llm, PROMPTS, sections, d))
-    loop.close()
-
-    return {"decisions": new_decisions}
+    stale = stale_sections(fingerprints, decisions, fingerprints)
+    timed_out = []
+    if stale:
+        print(f"♻️ إعادة توليد الأقسام المتأثرة فقط: {stale}")
+        decisions = run_coroutine(generate_sections_async(llm, PROMPTS, stale, decisions,
+                                                          deadline=deadline, timed_out=timed_out))
+    return decisions, stale, {**fingerprints, **fingerprint_sections(stale, decisions, pending=timed_out)}
 
 
 # -----------------------------------------------------
@@ -44,10 +44,10 @@ PROMPTS = {
     صِغ فقرة رسمية بعنوان نطاق العمل لتدرج في كراسة الشروط والمواصفات للمنافسة.
 
     المعطيات المرجعية — للاطلاع فقط ولا تُذكر نصاً:
-    {raw_input}
+    {section_context}
 
     التعليمات العامة:
-    - اقرأ محتوى raw_input وافهم منه نوع المشروع سواء كان تشغيل وصيانة مرافق، أو مشروع تقني، أو استشاري / خدمي، أو هندسي / إنشائي.
+    - اقرأ المعطيات المرجعية وافهم منها نوع المشروع سواء كان تشغيل وصيانة مرافق، أو مشروع تقني، أو استشاري / خدمي، أو هندسي / إنشائي.
     - صغ فقرة رسمية توضّح نطاق العمل بشكل يتناسب مع نوع المشروع المستنتج.
     - قدّم المهام والمسؤوليات والمخرجات المتوقعة من المتعاقد بصياغة حكومية احترافية.
     - يمكن استخدام فقرات أو نقاط واضحة إذا كان ذلك يخدم الوضوح.
@@ -148,10 +148,10 @@ PROMPTS = {
     صِغ فقرة رسمية بعنوان برنامج تقديم الخدمات لتدرج ضمن كراسة الشروط.
 
     المعطيات المرجعية — للاطلاع فقط ولا تُذكر نصاً:
-    {raw_input}
+    {section_context}
 
     المطلوب:
-    - اقرأ محتوى raw_input وافهم منه نوع المشروع سواء كان تشغيل وصيانة، مشروع تقني، استشاري أو خدمي، أو هندسي.
+    - اقرأ المعطيات المرجعية وافهم منها نوع المشروع سواء كان تشغيل وصيانة، مشروع تقني، استشاري أو خدمي، أو هندسي.
     - صِغ فقرة رسمية توضّح برنامج تقديم الخدمات مقسماً إلى ثلاث مراحل رئيسية: مرحلة التحضير، مرحلة التنفيذ والمتابعة، مرحلة التسليم النهائي.
 
     تفاصيل صياغة كل مرحلة:
@@ -178,7 +178,7 @@ PROMPTS = {
     صِغ فقرة رسمية بعنوان تجزئة المنافسة لإدراجها ضمن كراسة الشروط والمواصفات.
 
     استعمل المعلومات التالية فقط كمرجع للفهم ولا تذكرها نصاً:
-    {raw_input}
+    {section_context}
 
     المحتوى المطلوب:
     - توضيح أن الجهة صاحبة المنافسة تحتفظ بحق تجزئة بنود الأعمال أو الخدمات وترسيتها على أكثر من متنافس إذا كان ذلك يحقق مصلحة فنية أو تشغيلية.
@@ -269,7 +269,7 @@ PROMPTS = {
 صِغ فقرة رسمية بعنوان منهجية تنفيذ الخدمات لإدراجها في كراسة الشروط والمواصفات.
 
 المعطيات المرجعية — للاطلاع فقط ولا تُذكر نصًا:
-{raw_input}
+{section_context}
 مدة تنفيذ المشروع: {Project_Duration}
 
 التعليمات:
@@ -313,4 +313,63 @@ PROMPTS = {
 - لا تضف شرح أو تعليق.
 """,
 
+
+    # يعتمد على قسمي العرض الفني والمالي — يُولَّد بعد اكتمالهما (انظر nodes/section_dependencies)
+    "Bid_Evaluation_Criteria": """
+تحليل المحتوى التالي لاستخراج عناصر التقييم:
+
+العرض الفني:
+{Technical_Proposal_Documents}
+
+العرض المالي:
+{Financial_Proposal_Documents}
+
+المطلوب:
+
+إنشاء نموذج "معايير تقييم العروض" جاهز للإدراج في كراسة الشروط.
+
+التوجيهات:
+
+أولا تقسيم المعايير إلى مستويين فقط:
+- المستوى الأول: تقييم فني
+- المستوى الثاني: تقييم مالي
+
+ثانيا استخراج عناصر التقييم من محتوى العرض الفني والمالي أعلاه، وليس من خيالك.
+لا تتجاوز خمسة عناصر فنية وعنصرين ماليين.
+
+ثالثا توزيع النقاط يتم حسب طريقة الترسية الموضحة في الإدخال Award_Method:{Award_Method}
+
+
+- إذا كانت الترسية تعتمد على أفضل عرض فني فقط Best Technical Offer فليكن التركيز الأكبر للنقاط في الجانب الفني مع حصة بسيطة للمالي
+- إذا كانت Best Value فيجب توزيع النقاط بشكل متوازن بين الفني والمالي
+- إذا كانت Lowest Price فيكون الجانب المالي هو الأعلى وزنا ويكون الفني داعما
+
+رابعا إخراج النتيجة في جدول فقط يحتوي الأعمدة:
+المستوى الأول | المستوى الثاني | الوزن | النقاط
+
+خامسا يمنع كتابة شرح أو فقرات أو تعريفات. الجدول فقط.
+
+ثامنا مهم جدا:
+يمنع استخدام الأقواس بجميع أنواعها سواء كانت دائرية أو مربعة أو معقوفة.
+اكتب النص بدون أي أقواس.
+
+أخيرا اختم بجملة رسمية:
+يتم ترسية المنافسة على العرض الحاصل على أعلى مجموع نقاط بعد التقييم الفني والمالي.
+""",
+
+}
+
+
+# -----------------------------------------------------
+# حقول النموذج التي يحتاجها كل قسم يستخدم {section_context}
+# (تُعرض بصيغة مختصرة "الحقل: القيمة" بدل تمرير كامل بيانات النموذج)
+# -----------------------------------------------------
+SECTION_CONTEXT = {
+    "Project_Scope_of_Work": (
+        "Competition_Name", "Project_Type", "Service_Execution_Location",
+        "Project_Duration", "Includes_Equipment", "Local_Content_Requirements",
+    ),
+    "Service_Delivery_Plan": ("Competition_Name", "Project_Type", "Project_Duration", "Includes_Equipment"),
+    "Tender_Split_Section": ("Competition_Name", "Project_Type", "Includes_Equipment"),
+    "Service_Execution_Method": ("Competition_Name", "Project_Type", "Includes_Equipment"),
 }
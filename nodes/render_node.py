@@ -1,5 +1,5 @@
 # nodes/render_node.py
-from docxtpl import DocxTemplate
+from nodes.template_cache import template_for_render
 from datetime import datetime
 import os
 
@@ -24,7 +24,7 @@ def render_node(state):
 
         print(f"📂 تم العثور على القالب في: {template_path}")
 
-        doc = DocxTemplate(template_path)
+        doc = template_for_render(template_path)
   # يرجع لمجلد المشروع الرئيسي
 
         doc.render(decisions)
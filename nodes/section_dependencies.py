@@ -0,0 +1,148 @@
+# nodes/section_dependencies.py
+"""
+Field -> section dependency map for the generated RFP sections, prompt building,
+and input fingerprints for incremental regeneration.
+
+Each prompt in nodes.prompts.PROMPTS is parsed once for its placeholders
+({Project_Type}, {Award_Method}, ...). {section_context} stands for the form
+fields declared for the section in SECTION_CONTEXT, rendered compactly as
+"field: value" lines instead of the whole form. A section's fingerprint is a
+hash of its prompt template and the current values of those fields; when the
+user changes an input, only sections whose fingerprint changed are regenerated,
+plus the sections that depend on a regenerated section.
+
+A placeholder naming another generated section declares a prerequisite
+(Bid_Evaluation_Criteria uses {Technical_Proposal_Documents} and
+{Financial_Proposal_Documents}); generation schedules each section as soon as
+its prerequisites are complete.
+"""
+import hashlib
+import json
+import string
+from collections import defaultdict
+from graphlib import TopologicalSorter
+from typing import Dict, FrozenSet, Iterable, List, Set
+from nodes.prompts import PROMPTS, SECTION_CONTEXT
+
+CONTEXT_PLACEHOLDER = "section_context"
+
+
+def prompt_fields(template: str) -> FrozenSet[str]:
+    """Top-level placeholder names of a str.format template ({a.b} / {a[0]} count as a)."""
+    fields = set()
+    for _, name, _, _ in string.Formatter().parse(template):
+        if name:
+            fields.add(name.split(".", 1)[0].split("[", 1)[0])
+    return frozenset(fields)
+
+
+# section -> fields (inputs or other sections) it is generated from
+SECTION_DEPENDENCIES: Dict[str, FrozenSet[str]] = {
+    section: (prompt_fields(template) - {CONTEXT_PLACEHOLDER}) | frozenset(SECTION_CONTEXT.get(section, ()))
+    for section, template in PROMPTS.items()
+}
+
+# field -> sections that read it
+FIELD_DEPENDENTS: Dict[str, FrozenSet[str]] = {}
+for _section, _fields in SECTION_DEPENDENCIES.items():
+    for _field in _fields:
+        FIELD_DEPENDENTS[_field] = FIELD_DEPENDENTS.get(_field, frozenset()) | {_section}
+
+
+def render_context(fields: Iterable[str], values: dict) -> str:
+    """Compact "field: value" lines for the given fields (empty values skipped)."""
+    lines = []
+    for field in fields:
+        value = values.get(field)
+        if value not in (None, ""):
+            lines.append(f"{field}: {value}")
+    return "\n".join(lines)
+
+
+def build_prompt(section: str, values: dict, prompts: Dict[str, str] = PROMPTS) -> str:
+    """
+    The section's prompt with its placeholders and, if declared, its projected form context.
+    Placeholders without a value (an unset input, a prerequisite section that was not
+    generated) are left empty, as the prompts built with d.get(...) did.
+    """
+    fields = SECTION_CONTEXT.get(section)
+    if fields is not None:
+        values = {**values, CONTEXT_PLACEHOLDER: render_context(fields, values)}
+    return prompts[section].format_map(defaultdict(str, values))
+
+
+def section_prerequisites(section: str) -> FrozenSet[str]:
+    """Generated sections that must be complete before the section's prompt can be built."""
+    return SECTION_DEPENDENCIES.get(section, frozenset()) & PROMPTS.keys()
+
+
+def generation_order(sections: Iterable[str]) -> List[str]:
+    """The sections ordered so every section comes after its prerequisites (among the given ones)."""
+    sections = list(sections)
+    selected = set(sections)
+    graph = {s: section_prerequisites(s) & selected for s in sections}
+    return list(TopologicalSorter(graph).static_order())
+
+
+def dependency_depth(section: str, sections: Iterable[str]) -> int:
+    """
+    Length of the longest chain of generations starting at the section among the
+    given ones (1 when nothing selected waits for it). Used to reserve request time
+    for the sections waiting on it.
+    """
+    selected = set(sections)
+    dependents = (FIELD_DEPENDENTS.get(section, frozenset()) & selected) - {section}
+    return 1 + max((dependency_depth(d, selected) for d in dependents), default=0)
+
+
+# Fail at import on a dependency cycle between prompts
+TopologicalSorter({s: section_prerequisites(s) for s in PROMPTS}).prepare()
+
+
+def plan_section_groups(sections: Iterable[str], groups: Iterable[Iterable[str]]) -> List[List[str]]:
+    """
+    The configured groups restricted to the given sections. Only sections without
+    prerequisites are bundled, and a group needs at least two members.
+    """
+    selected = set(sections)
+    planned = []
+    for group in groups:
+        members = [s for s in group if s in selected and s in PROMPTS and not section_prerequisites(s)]
+        if len(members) >= 2:
+            planned.append(members)
+            selected -= set(members)
+    return planned
+
+
+def section_fingerprint(section: str, values: dict) -> str:
+    """Hash of the section's prompt template and the current values of its inputs."""
+    inputs = {field: values.get(field, "") for field in sorted(SECTION_DEPENDENCIES.get(section, ()))}
+    payload = json.dumps([PROMPTS.get(section, section), inputs], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint_sections(sections: Iterable[str], values: dict, pending: Iterable[str] = ()) -> Dict[str, str]:
+    """Fingerprints of the sections; `pending` ones (not generated, e.g. timed out) get "" so they count as stale."""
+    pending = set(pending)
+    return {section: "" if section in pending else section_fingerprint(section, values)
+            for section in sections if section in SECTION_DEPENDENCIES}
+
+
+def with_dependents(sections: Iterable[str]) -> Set[str]:
+    """The sections plus every section generated (directly or transitively) from them."""
+    result = set(sections)
+    pending = list(result)
+    while pending:
+        for dependent in FIELD_DEPENDENTS.get(pending.pop(), ()):
+            if dependent not in result:
+                result.add(dependent)
+                pending.append(dependent)
+    return result
+
+
+def stale_sections(sections: Iterable[str], values: dict, fingerprints: Dict[str, str]) -> List[str]:
+    """Sections (in the given order) whose inputs changed since their fingerprint was stored, with cascades."""
+    sections = list(sections)
+    changed = {s for s in sections if s in SECTION_DEPENDENCIES and fingerprints.get(s) != section_fingerprint(s, values)}
+    stale = with_dependents(changed)
+    return [s for s in sections if s in stale]
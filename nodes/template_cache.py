@@ -0,0 +1,160 @@
+# nodes/template_cache.py
+"""
+Process-level cache of the pre-processed Word template (rfp_general.docx).
+
+docxtpl normally does all of its template set-up again for every document:
+- unzip and parse the template;
+- run its regex patching of the XML (patch_xml) on the body, headers, footers
+  and footnotes;
+- compile the result as Jinja.
+Caching it takes the Word part of /save (render, tables, save) from about
+1.9-2.5 s to about 1.2-1.45 s (benchmarks/bench_docx_save.py). Per-document work
+remains: a python-docx Document is still loaded from the template bytes (about
+60 ms), and rendering, table insertion and serialization take the rest.
+
+prepared_template() does this work once per file version. The cache key is the
+file's path and mtime, so an edited template is picked up on the next call.
+template_for_render() returns a cheap per-request CachedDocxTemplate:
+- a fresh python-docx Document is loaded from the cached bytes;
+- the compiled Jinja templates are shared;
+- rendering only executes the templates.
+
+This hooks into DocxTemplate internals (DOCXTPL_INTERNALS), written against
+docxtpl 0.20 (pinned in requirements.txt). If the installed docxtpl lacks any
+of them, template_for_render() returns a plain DocxTemplate instead.
+"""
+import io
+import os
+import re
+import threading
+from typing import Dict
+from jinja2 import Template
+from docxtpl import DocxTemplate
+from config import RFP_TEMPLATE_PATH
+from utils.metrics import CACHE
+
+FOOTNOTES_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml"
+
+# DocxTemplate attributes the cache uses or overrides
+DOCXTPL_INTERNALS = (
+    "init_docx", "get_xml", "patch_xml", "get_part_xml", "get_headers_footers",
+    "get_headers_footers_encoding", "resolve_listing", "build_xml", "build_headers_footers_xml",
+    "render_footnotes", "HEADER_URI", "FOOTER_URI",
+)
+DOCXTPL_SUPPORTED = all(hasattr(DocxTemplate, name) for name in DOCXTPL_INTERNALS)
+
+
+class PreparedTemplate:
+    """The template's bytes and the compiled Jinja template of each XML part (by part name)."""
+
+    def __init__(self, path: str, mtime_ns: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        with open(path, "rb") as f:
+            self.blob = f.read()
+        self.templates: Dict[str, Template] = {}
+        self.encodings: Dict[str, str] = {}
+
+        tpl = DocxTemplate(io.BytesIO(self.blob))
+        tpl.init_docx()
+        self.body_part = str(tpl.docx._part.partname)
+        self._compile(tpl, self.body_part, tpl.get_xml())
+        for uri in (tpl.HEADER_URI, tpl.FOOTER_URI):
+            for _, part in tpl.get_headers_footers(uri):
+                xml = tpl.get_part_xml(part)
+                self.encodings[str(part.partname)] = tpl.get_headers_footers_encoding(xml)
+                self._compile(tpl, str(part.partname), xml)
+        for part in tpl.docx.part.package.parts:
+            if part.content_type == FOOTNOTES_CONTENT_TYPE:
+                blob = part.blob.decode("utf-8") if isinstance(part.blob, bytes) else part.blob
+                self._compile(tpl, str(part.partname), blob)
+
+    def _compile(self, tpl: DocxTemplate, partname: str, xml: str) -> None:
+        # Same pre-processing as DocxTemplate.patch_xml + render_xml_part, done once
+        src_xml = re.sub(r"<w:p([ >])", r"\n<w:p\1", tpl.patch_xml(xml))
+        self.templates[partname] = Template(src_xml)
+
+
+class CachedDocxTemplate(DocxTemplate):
+    """
+    DocxTemplate rendering with the compiled templates of a PreparedTemplate.
+    With a custom jinja_env / autoescape it falls back to docxtpl's own (uncached) path.
+    """
+
+    def __init__(self, prepared: PreparedTemplate):
+        super().__init__(io.BytesIO(prepared.blob))
+        self.prepared = prepared
+
+    def _render_part(self, partname: str, part, context) -> str:
+        self.current_rendering_part = part
+        dst_xml = self.prepared.templates[partname].render(context)
+        # The post-processing of DocxTemplate.render_xml_part
+        dst_xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", dst_xml)
+        dst_xml = (
+            dst_xml.replace("{_{", "{{")
+            .replace("}_}", "}}")
+            .replace("{_%", "{%")
+            .replace("%_}", "%}")
+        )
+        return self.resolve_listing(dst_xml)
+
+    def build_xml(self, context, jinja_env=None):
+        if jinja_env is not None:
+            return super().build_xml(context, jinja_env)
+        return self._render_part(self.prepared.body_part, self.docx._part, context)
+
+    def build_headers_footers_xml(self, context, uri, jinja_env=None):
+        if jinja_env is not None:
+            yield from super().build_headers_footers_xml(context, uri, jinja_env)
+            return
+        for relKey, part in self.get_headers_footers(uri):
+            partname = str(part.partname)
+            xml = self._render_part(partname, part, context)
+            yield relKey, xml.encode(self.prepared.encodings[partname])
+
+    def render_footnotes(self, context, jinja_env=None) -> None:
+        if jinja_env is not None:
+            return super().render_footnotes(context, jinja_env)
+        for part in self.docx.part.package.parts:
+            if part.content_type == FOOTNOTES_CONTENT_TYPE:
+                xml = self._render_part(str(part.partname), part, context)
+                part._blob = xml.encode("utf-8")
+
+
+_prepared: Dict[str, PreparedTemplate] = {}
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def prepared_template(path: str = RFP_TEMPLATE_PATH) -> PreparedTemplate:
+    """The pre-processed template, loaded again only when the file's mtime changes."""
+    if not DOCXTPL_SUPPORTED:
+        missing = [name for name in DOCXTPL_INTERNALS if not hasattr(DocxTemplate, name)]
+        raise RuntimeError(f"docxtpl غير مدعوم لتخزين القالب مؤقتاً (ينقص: {', '.join(missing)})")
+    key = os.path.abspath(path)
+    mtime_ns = os.stat(key).st_mtime_ns
+    prepared = _prepared.get(key)
+    if prepared is not None and prepared.mtime_ns == mtime_ns:
+        CACHE.hit("docx_template")
+        return prepared
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        prepared = _prepared.get(key)
+        if prepared is None or prepared.mtime_ns != mtime_ns:
+            CACHE.miss("docx_template")
+            prepared = PreparedTemplate(key, mtime_ns)
+            _prepared[key] = prepared
+            print(f"📄 تم تجهيز القالب {path} ({len(prepared.templates)} أجزاء)")
+    return prepared
+
+
+def template_for_render(path: str = RFP_TEMPLATE_PATH) -> DocxTemplate:
+    """
+    A fresh template instance for one document, sharing the cached set-up
+    (a plain, uncached DocxTemplate if the installed docxtpl is not supported).
+    """
+    if not DOCXTPL_SUPPORTED:
+        return DocxTemplate(path)
+    return CachedDocxTemplate(prepared_template(path))
+
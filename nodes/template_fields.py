@@ -0,0 +1,49 @@
+# nodes/template_fields.py
+"""
+Placeholders of the Word template (rfp_general.docx), read once per process.
+
+Generation only runs LLM sections that docxtpl will actually consume, plus the
+sections those depend on (e.g. the technical and financial sections feeding
+Bid_Evaluation_Criteria); anything else is skipped.
+"""
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+from config import RFP_TEMPLATE_PATH
+from nodes.section_dependencies import section_prerequisites
+from utils.metrics import CACHE
+
+
+@lru_cache(maxsize=None)
+def template_variables(path: str = RFP_TEMPLATE_PATH) -> Optional[FrozenSet[str]]:
+    """The Jinja variables the template uses, or None if the template cannot be read (no pruning)."""
+    try:
+        from docxtpl import DocxTemplate
+        variables = frozenset(DocxTemplate(path).get_undeclared_template_variables())
+    except Exception as e:
+        print(f"⚠️ تعذر قراءة متغيرات القالب {path}: {e} — سيتم توليد كل الأقسام")
+        return None
+    print(f"📄 القالب {path} يستخدم {len(variables)} متغيراً")
+    return variables
+
+
+CACHE.register_lru_cache("template_variables", template_variables)
+
+
+def prune_to_template(sections: List[str], path: str = RFP_TEMPLATE_PATH) -> List[str]:
+    """Keep the sections used by the template and, transitively, the sections they are generated from."""
+    variables = template_variables(path)
+    if variables is None:
+        return list(sections)
+
+    needed = {s for s in sections if s in variables}
+    pending = list(needed)
+    while pending:
+        for prerequisite in section_prerequisites(pending.pop()):
+            if prerequisite not in needed:
+                needed.add(prerequisite)
+                pending.append(prerequisite)
+
+    for s in sections:
+        if s not in needed:
+            print(f"🚫 SKIP section (غير مستخدم في القالب): {s}")
+    return [s for s in sections if s in needed]
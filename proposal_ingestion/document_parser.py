@@ -2,6 +2,7 @@ import pdfplumber
 from pathlib import Path
 from utils.helpers import clean_text, normalize_arabic_text, is_arabic_text, arabic_to_western_digits
 from typing import Optional
+from utils.metrics import timed_stage, STAGE_ERRORS
 
 import requests
 
@@ -25,6 +26,7 @@ def to_western_digits(s: str) -> str:
 
 
 
+@timed_stage("parse_tika")
 def read_pdf_text_with_tika(pdf_path: str) -> Optional[str]:
     """
     Sends PDF file to remote Apache Tika server deployed on Railway.
@@ -170,6 +172,67 @@ def extract_page_lines_manual_rtl(path: str | Path, page_idx: int = 0):
     return [] # Or implement the full manual logic here if needed as a fallback
 
 
+@timed_stage("parse_pdfplumber")
+def read_pdf_text_with_pdfplumber(file_path: str, extract_tables: bool = False):
+    """
+    Extracts text page by page with pdfplumber (built-in RTL handling).
+    Returns the cleaned text, or (text, tables by page) when extract_tables is set.
+    """
+    # Use the pdfplumber logic to extract text page by page
+    full_text = ""
+    all_extracted_tables = {} # Dictionary to store tables if requested
+
+    with pdfplumber.open(file_path) as pdf:
+        for page_num in range(len(pdf.pages)):
+            print(f"📄 معالجة صفحة {page_num + 1} من {len(pdf.pages)}...")
+            # --- NEW LOGIC: Use the built-in RTL handling function ---
+            page_lines = extract_page_lines_builtin_rtl(file_path, page_num)
+            # --- END NEW LOGIC ---
+
+            page_text = "\n".join(page_lines)
+            if page_text: # Check if text was extracted for this page using the new method
+                print(f"   ✅ تم استخراج {len(page_text)} حرف باستخدام الطريقة المبنية للصفحة {page_num + 1}.")
+                full_text += page_text + "\n"
+            else:
+                print(f"   ⚠️ الطريقة المبنية فشلت في استخراج نص من الصفحة {page_num + 1}.")
+                # --- FALLBACK LOGIC: Use manual coordinate-based RTL ---
+                # If the built-in method fails or doesn't work well, uncomment the next lines
+                # and implement the manual logic in extract_page_lines_manual_rtl
+                # page_lines_fallback = extract_page_lines_manual_rtl(file_path, page_num)
+                # page_text_fallback = "\n".join(page_lines_fallback)
+                # if page_text_fallback:
+                #     print(f"   ✅ تم استخراج {len(page_text_fallback)} حرف باستخدام الطريقة اليدوية للصفحة {page_num + 1}.")
+                #     full_text += page_text_fallback + "\n"
+                # else:
+                #     print(f"   ❌ كلا الطريقتين فشلتا في استخراج نص من الصفحة {page_num + 1}.")
+                # --- END FALLBACK LOGIC ---
+
+            # --- NEW LOGIC: Extract tables if requested ---
+            if extract_tables:
+                print(f"🔍 جاري استخراج الجداول من الصفحة {page_num + 1}...")
+                tables_on_page = extract_tables_from_page(file_path, page_num)
+                if tables_on_page:
+                     all_extracted_tables[page_num + 1] = tables_on_page
+            # --- END NEW LOGIC ---
+
+    if full_text:
+        # Apply the general clean_text function from helpers
+        cleaned_text = clean_text(full_text)
+    else:
+        print(f"⚠️ تحذير: لم يتم استخراج محتوى نصي من الملف: {file_path}")
+        cleaned_text = "" # Return empty string if no text found
+
+    # --- NEW LOGIC: Return text and optionally tables ---
+    if extract_tables:
+        # You might want to structure this differently depending on how you plan to use the tables
+        # For now, returning a tuple (text, tables_dict)
+        return cleaned_text, all_extracted_tables
+    else:
+        # Return only the text as before
+        return cleaned_text
+    # --- END NEW LOGIC ---
+
+
 def parse_document(file_path: str, extract_tables: bool = False) -> str: # Added extract_tables parameter
     """
     Parses a document (PDF only for now) using the enhanced extraction logic.
@@ -189,61 +252,10 @@ def parse_document(file_path: str, extract_tables: bool = False) -> str: # Added
                 cleaned_text = clean_text(full_text)
                 return cleaned_text
             else:
+                STAGE_ERRORS.inc("parse_tika")
                 print(f"⚠️ Apache Tika failed, using pdfplumber fallback...")
             
-            # Use the pdfplumber logic to extract text page by page
-            full_text = ""
-            all_extracted_tables = {} # Dictionary to store tables if requested
-
-            with pdfplumber.open(file_path) as pdf:
-                for page_num in range(len(pdf.pages)):
-                    print(f"📄 معالجة صفحة {page_num + 1} من {len(pdf.pages)}...")
-                    # --- NEW LOGIC: Use the built-in RTL handling function ---
-                    page_lines = extract_page_lines_builtin_rtl(file_path, page_num)
-                    # --- END NEW LOGIC ---
-
-                    page_text = "\n".join(page_lines)
-                    if page_text: # Check if text was extracted for this page using the new method
-                        print(f"   ✅ تم استخراج {len(page_text)} حرف باستخدام الطريقة المبنية للصفحة {page_num + 1}.")
-                        full_text += page_text + "\n"
-                    else:
-                        print(f"   ⚠️ الطريقة المبنية فشلت في استخراج نص من الصفحة {page_num + 1}.")
-                        # --- FALLBACK LOGIC: Use manual coordinate-based RTL ---
-                        # If the built-in method fails or doesn't work well, uncomment the next lines
-                        # and implement the manual logic in extract_page_lines_manual_rtl
-                        # page_lines_fallback = extract_page_lines_manual_rtl(file_path, page_num)
-                        # page_text_fallback = "\n".join(page_lines_fallback)
-                        # if page_text_fallback:
-                        #     print(f"   ✅ تم استخراج {len(page_text_fallback)} حرف باستخدام الطريقة اليدوية للصفحة {page_num + 1}.")
-                        #     full_text += page_text_fallback + "\n"
-                        # else:
-                        #     print(f"   ❌ كلا الطريقتين فشلتا في استخراج نص من الصفحة {page_num + 1}.")
-                        # --- END FALLBACK LOGIC ---
-
-                    # --- NEW LOGIC: Extract tables if requested ---
-                    if extract_tables:
-                        print(f"🔍 جاري استخراج الجداول من الصفحة {page_num + 1}...")
-                        tables_on_page = extract_tables_from_page(file_path, page_num)
-                        if tables_on_page:
-                             all_extracted_tables[page_num + 1] = tables_on_page
-                    # --- END NEW LOGIC ---
-
-            if full_text:
-                # Apply the general clean_text function from helpers
-                cleaned_text = clean_text(full_text)
-            else:
-                print(f"⚠️ تحذير: لم يتم استخراج محتوى نصي من الملف: {file_path}")
-                cleaned_text = "" # Return empty string if no text found
-
-            # --- NEW LOGIC: Return text and optionally tables ---
-            if extract_tables:
-                # You might want to structure this differently depending on how you plan to use the tables
-                # For now, returning a tuple (text, tables_dict)
-                return cleaned_text, all_extracted_tables
-            else:
-                # Return only the text as before
-                return cleaned_text
-            # --- END NEW LOGIC ---
+            return read_pdf_text_with_pdfplumber(file_path, extract_tables)
 
         except Exception as e:
             print(f"❌ خطأ في تحليل الملف {file_path}: {str(e)}")
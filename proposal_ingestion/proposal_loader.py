@@ -4,7 +4,34 @@ from pathlib import Path
 # Import the parser function
 from proposal_ingestion.document_parser import parse_document
 
-def load_proposals(proposals_dir: str) -> dict:
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt')
+
+def load_proposal_file(filepath: str, parse=parse_document) -> dict:
+    """
+    Loads a single proposal file (PDF or TXT).
+    `parse` is the PDF parser (injected by the workflow, parse_document by default).
+    Returns {"text": "...", "name": "..."}
+    """
+    filename = os.path.basename(filepath)
+    # Extract a display name from the filename (remove extension, replace _ with spaces, etc.)
+    path_obj = Path(filename)
+    display_name = path_obj.stem.replace('_', ' ').replace('-', ' ').title() # Example: "Vendor_A_Report.pdf" -> "Vendor A Report"
+
+    if filename.lower().endswith('.txt'):
+         # Read text files directly
+         with open(filepath, 'r', encoding='utf-8') as f:
+              text = f.read()
+    else:
+         # Use the pdfplumber parser for PDFs
+         text = parse(filepath)
+         # The text is now extracted but NOT saved to a separate .txt file
+
+    return {
+        "text": text,
+        "name": display_name # Add the extracted name
+    }
+
+def load_proposals(proposals_dir: str, parse=parse_document) -> dict:
     """
     Loads proposals from a directory.
     Converts PDF to text using pdfplumber. Reads TXT directly.
@@ -15,24 +42,8 @@ def load_proposals(proposals_dir: str) -> dict:
     for filename in os.listdir(proposals_dir):
         filepath = os.path.join(proposals_dir, filename)
         # Check for supported document extensions (PDF, TXT for now)
-        if os.path.isfile(filepath) and filename.lower().endswith(('.pdf', '.txt')):
-            # Extract a display name from the filename (remove extension, replace _ with spaces, etc.)
-            path_obj = Path(filename)
-            display_name = path_obj.stem.replace('_', ' ').replace('-', ' ').title() # Example: "Vendor_A_Report.pdf" -> "Vendor A Report"
-
-            if filename.lower().endswith('.txt'):
-                 # Read text files directly
-                 with open(filepath, 'r', encoding='utf-8') as f:
-                      text = f.read()
-            elif filename.lower().endswith('.pdf'):
-                 # Use the pdfplumber parser for PDFs
-                 text = parse_document(filepath)
-                 # The text is now extracted but NOT saved to a separate .txt file
-
-            proposals[filename] = {
-                "text": text,
-                "name": display_name # Add the extracted name
-            }
+        if os.path.isfile(filepath) and filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            proposals[filename] = load_proposal_file(filepath, parse)
         else:
              print(f"⚠️ تجاهل الملف غير المدعوم: {filename}")
     return proposals
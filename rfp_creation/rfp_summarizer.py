@@ -6,6 +6,8 @@ from pathlib import Path
 from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 from config import OPENAI_API_KEY, MODEL_NAME
+from utils.llm_clients import get_chat_model
+from utils.metrics import timed_stage
 import requests
 
 TIKA_URL = "https://tika-service-production.up.railway.app"  # النسخة النهائية
@@ -106,7 +108,8 @@ class RFPSummary(BaseModel):
 
 # --- End Pydantic Models ---
 
-def summarize_rfp(rfp_text: str, output_file_path: str = "./rfp_summary_output.json") -> RFPSummary:
+@timed_stage("summarize_rfp")
+def summarize_rfp(rfp_text: str, output_file_path: str = "./rfp_summary_output.json", llm: ChatOpenAI = None) -> RFPSummary:
     """
     Summarize RFP into structured JSON using LLM via with_structured_output.
     Saves the structured output to a file.
@@ -123,7 +126,7 @@ def summarize_rfp(rfp_text: str, output_file_path: str = "./rfp_summary_output.j
         return summary_object
 
     try:
-        llm = ChatOpenAI(model=MODEL_NAME, temperature=0.0, api_key=OPENAI_API_KEY)
+        llm = llm or get_chat_model(MODEL_NAME, 0.0)
         structured_llm = llm.with_structured_output(RFPSummary)
 
         # Define the prompt specifically for structured output
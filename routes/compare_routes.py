@@ -1,113 +1,441 @@
-from flask import Blueprint, request, jsonify
-import os, shutil, stat
+from flask import Blueprint, Response, request, jsonify
+import os, shutil
 from werkzeug.utils import secure_filename
-from workflow.rfp_workflow import build_rfp_graph
+from config import COMPARISON_SSE_MAX_SECONDS
+from workflow.graph_registry import get_graph
+from workflow.workspaces import create_workspace, PROPOSALS_DIR
+from workflow.comparison_jobs import submit_job, get_job, retry_job, get_events
+import json
+import math
 import time
 import uuid
 
 compare_bp = Blueprint("compare_bp", __name__)
 
-@compare_bp.route("/compare_llm", methods=["POST"])
-def compare_llm():
-    try:
-        upload_dir = "uploads"
-        proposals_dir = os.path.join(upload_dir, "proposals")
+# workflow.comparison_runs, workflow.checkpointing and evaluation_engine pull in
+# LangGraph, LangChain/OpenAI, pdfplumber and numpy; the routes import them on
+# first use so importing the app (every gunicorn worker boot) stays cheap.
+
+SSE_POLL_INTERVAL = 0.5      # seconds between reads of the job's event log
+SSE_KEEPALIVE_SECONDS = 15   # comment line sent when idle so proxies keep the stream open
+MAX_SENSITIVITY_SAMPLES = 50000  # upper bound of "samples" for /compare_llm/sensitivity
+
+
+def expand_results(final_report, proposal_original_names=None) -> list:
+    """Flatten the ranker's final_report into the list of result cards sent to the page."""
+    proposal_original_names = proposal_original_names or []
+    all_results = []
+
+    if isinstance(final_report, list):
+        for item in final_report:
+            all_results.append(item if isinstance(item, dict) else {"details": str(item)})
+    elif isinstance(final_report, dict):
+        all_results.append(final_report)
+
+    expanded_results = []
+    for idx, r in enumerate(all_results):
+
+        if isinstance(r, dict) and "ranked_proposals" in r:
+            for i, sub in enumerate(r["ranked_proposals"]):
+                expanded_results.append({
+                    "proposal_id": sub.get("proposal_id"),
+                    "proposal_name": sub.get("name"),
+                    "scores": [{"criterion": k, "score": float(v)} for k, v in sub.get("scores", {}).items()],
+                    "details": sub.get("overall_comment", "لا يوجد تعليق."),
+                    "total_score": sub.get("total_score", 0)
+                })
+        elif isinstance(r, dict):
+            expanded_results.append({
+                "proposal_name": proposal_original_names[idx] if idx < len(proposal_original_names) else r.get("name"),     # ← الاسم الأصلي
+                "scores": [{"criterion": k, "score": v} for k, v in (r.get("scores") or {}).items()],
+                "details": r.get("details") or r.get("overall_comment") or "لا يوجد تعليق.",
+                "total_score": r.get("total_score", 0)
+            })
+        print(f"✅ تم استخراج {len(expanded_results)} نتيجة جاهزة للعرض.")
+
+    # 🔥 ترتيب حسب الدرجة — نفس المنطق
+    return sorted(expanded_results, key=lambda x: x.get("total_score", 0), reverse=True)
+
 
-        def handle_remove_readonly(func, path, exc_info):
-            os.chmod(path, stat.S_IWRITE)
-            func(path)
+def run_payload(run) -> dict:
+    """JSON body returned for a persisted comparison run."""
+    return {
+        "run_id": run.run_id,
+        "results": expand_results(run.final_report),
+        "total_uploaded": len(run.scored_proposals),
+        "criteria_with_weights": run.criteria_with_weights,
+    }
 
-        if os.path.exists(upload_dir):
-            shutil.rmtree(upload_dir, onerror=handle_remove_readonly)
-        os.makedirs(proposals_dir, exist_ok=True)
+def upload_filename(filename: str, default: str) -> str:
+    """
+    The last path component of an uploaded file name (no directories, no leading
+    dots), so a name like "../../x.pdf" stays inside the run's workspace. The
+    original (often Arabic) characters are kept; `default` when nothing is left.
+    """
+    name = os.path.basename((filename or "").replace("\\", "/")).strip().lstrip(".")
+    return name or default
 
-        # 🟣 كراسة الشروط
-        rfp_file = request.files["rfp_file"]
-        rfp_filename = secure_filename(rfp_file.filename or f"RFP_{int(time.time())}.pdf")
-        rfp_path = os.path.join(upload_dir, rfp_filename)
-        with open(rfp_path, "wb") as f:
-            rfp_file.stream.seek(0)
-            shutil.copyfileobj(rfp_file.stream, f)
-        print(f"✅ تم حفظ كراسة الشروط في: {rfp_path}")
 
-        # 🟢 العروض
-        proposal_files = request.files.getlist("proposal_files")
-        proposal_names = []              # ← أسماء الملفات بعد الحفظ
-        proposal_original_names = []     # ⭐ الأسماء الأصلية كما رفعها المستخدم
+def save_comparison_uploads(run_id: str) -> dict:
+    """
+    Save the RFP and proposal files of the current request in the run's own workspace
+    (kept there so an interrupted or queued run still has its inputs; removed by the janitor).
+    """
+    upload_dir = create_workspace(run_id)
+    proposals_dir = os.path.join(upload_dir, PROPOSALS_DIR)
 
-        for idx, file in enumerate(proposal_files, start=1):
-            
-            original_name = file.filename                 # ← الاسم الأصلي 100%
-            proposal_original_names.append(original_name) # ← نحفظه لواجهة HTML
+    # 🟣 كراسة الشروط
+    rfp_file = request.files["rfp_file"]
+    rfp_filename = secure_filename(rfp_file.filename or f"RFP_{int(time.time())}.pdf")
+    rfp_path = os.path.join(upload_dir, rfp_filename)
+    with open(rfp_path, "wb") as f:
+        rfp_file.stream.seek(0)
+        shutil.copyfileobj(rfp_file.stream, f)
+    print(f"✅ تم حفظ كراسة الشروط في: {rfp_path}")
 
-            filename = original_name                      # ← نترك الاسم كما هو
+    # 🟢 العروض
+    proposal_files = request.files.getlist("proposal_files")
+    proposal_names = []              # ← أسماء الملفات بعد الحفظ
+    proposal_original_names = []     # ⭐ الأسماء الأصلية كما رفعها المستخدم
 
-            # ضمان وجود امتداد PDF
-            if not filename.lower().endswith(".pdf"):
-                filename += ".pdf"
+    for idx, file in enumerate(proposal_files, start=1):
 
-            # حفظ الملف بنفس اسمه الأصلي دون أي تغيير
-            save_path = os.path.join(proposals_dir, filename)
-            file.save(save_path)
+        original_name = file.filename                 # ← الاسم الأصلي 100%
+        proposal_original_names.append(original_name) # ← نحفظه لواجهة HTML (للعرض فقط)
 
-            proposal_names.append(filename)
+        # اسم الملف على القرص: الجزء الأخير من الاسم فقط (لا مسارات)، دون تكرار داخل المقارنة
+        filename = upload_filename(original_name, f"proposal_{idx}.pdf")
 
-            print(f"📄 تم حفظ العرض بنفس اسمه الأصلي: {filename}")
+        # ضمان وجود امتداد PDF
+        if not filename.lower().endswith(".pdf"):
+            filename += ".pdf"
+        if os.path.exists(os.path.join(proposals_dir, filename)):
+            filename = f"{filename[:-4]}_{idx}.pdf"
+
+        save_path = os.path.join(proposals_dir, filename)
+        file.save(save_path)
+
+        proposal_names.append(filename)
+
+        print(f"📄 تم حفظ العرض: {filename}")
+
+    return {
+        "workspace_dir": upload_dir,
+        "rfp_path": rfp_path,
+        "rfp_filename": rfp_filename,
+        "proposals_dir": proposals_dir,
+        "proposal_names": proposal_names,
+        "proposal_original_names": proposal_original_names,
+    }
+
+@compare_bp.route("/compare_llm", methods=["POST"])
+def compare_llm():
+    from workflow.comparison_runs import new_run_id, create_run_from_state
+    from workflow.checkpointing import run_config
+    from utils.llm_callbacks import FirstLLMCallTimer
+
+    request_started = time.perf_counter()
+    run_id = None
+    try:
+        run_id = new_run_id()
+        uploads = save_comparison_uploads(run_id)
+        rfp_path, rfp_filename = uploads["rfp_path"], uploads["rfp_filename"]
+        proposals_dir = uploads["proposals_dir"]
+        proposal_names = uploads["proposal_names"]
+        proposal_original_names = uploads["proposal_original_names"]
 
         if not proposal_names:
             return jsonify({"error": "⚠️ لم يتم رفع أي ملفات عروض صالحة."}), 400
 
         print(f"✅ تم حفظ {len(proposal_names)} عرض بنجاح.")
 
-        # 🧠 تشغيل Workflow
-        graph = build_rfp_graph()
-        inputs = {"user_input": rfp_path, "proposals_dir": proposals_dir}
-        state = graph.invoke(inputs)
-
-        final_report = state.get("final_report", None)
-        all_results = []
-
-        if isinstance(final_report, list):
-            for item in final_report:
-                all_results.append(item if isinstance(item, dict) else {"details": str(item)})
-        elif isinstance(final_report, dict):
-            all_results.append(final_report)
-
-        expanded_results = []
-        for idx, r in enumerate(all_results):
-
-            if isinstance(r, dict) and "ranked_proposals" in r:
-                for i, sub in enumerate(r["ranked_proposals"]):
-                    expanded_results.append({
-                        "proposal_name": sub.get("name"),
-                        "scores": [{"criterion": k, "score": float(v)} for k, v in sub.get("scores", {}).items()],
-                        "details": sub.get("overall_comment", "لا يوجد تعليق."),
-                        "total_score": sub.get("total_score", 0)
-                    })
-            elif isinstance(r, dict):
-                expanded_results.append({
-                    "proposal_name": proposal_original_names[idx],     # ← الاسم الأصلي
-                    "scores": [{"criterion": k, "score": v} for k, v in (r.get("scores") or {}).items()],
-                    "details": r.get("details") or r.get("overall_comment") or "لا يوجد تعليق.",
-                    "total_score": r.get("total_score", 0)
-                })
+        # 🧠 تشغيل Workflow (كل خطوة تُحفظ كنقطة استئناف تحت run_id)
+        graph = get_graph("rfp_workflow")
+        inputs = {"user_input": rfp_path, "proposals_dir": proposals_dir, "workspace_dir": uploads["workspace_dir"]}
+        callbacks = [FirstLLMCallTimer("rfp_workflow", request_started)]
+        state = graph.invoke(inputs, config=run_config(run_id, callbacks))
 
-            else:
-                expanded_results.append({
-                    "proposal_name": sub.get("name"),
-                    "scores": [{"criterion": k, "score": float(v)} for k, v in sub.get("scores", {}).items()],
-                    "details": sub.get("overall_comment", "لا يوجد تعليق."),
-                    "total_score": sub.get("total_score", 0)
-                })
-            print(f"✅ تم استخراج {len(expanded_results)} نتيجة جاهزة للعرض.")
+        try:
+            create_run_from_state(run_id, state, rfp_filename=rfp_filename)
+        except Exception as e:
+            print(f"❌ خطأ في حفظ نتائج المقارنة: {e}")
+            run_id = None
 
-        # 🔥 ترتيب حسب الدرجة — نفس المنطق
-        expanded_results = sorted(expanded_results, key=lambda x: x.get("total_score", 0), reverse=True)
+        expanded_results = expand_results(state.get("final_report", None), proposal_original_names)
 
-        return jsonify({"results": expanded_results, "total_uploaded": len(proposal_names)}), 200
+        return jsonify({
+            "run_id": run_id,
+            "results": expanded_results,
+            "total_uploaded": len(proposal_names),
+            "criteria_with_weights": state.get("criteria_with_weights", []),
+        }), 200
 
     except Exception as e:
         import traceback
         print("❌ Error in /compare_llm:")
         traceback.print_exc()
+        # The steps completed so far are checkpointed; POST /compare_runs/<run_id>/resume continues the run
+        return jsonify({"error": str(e), "run_id": run_id, "resumable": run_id is not None}), 500
+
+
+@compare_bp.route("/compare_jobs", methods=["POST"])
+def submit_comparison_job():
+    """
+    Queue a comparison (same form as /compare_llm) and return immediately with the
+    job id; poll GET /compare_jobs/<job_id> and fetch /compare_jobs/<job_id>/result.
+    """
+    from workflow.comparison_runs import new_run_id
+
+    try:
+        run_id = new_run_id()
+        uploads = save_comparison_uploads(run_id)
+        if not uploads["proposal_names"]:
+            return jsonify({"error": "⚠️ لم يتم رفع أي ملفات عروض صالحة."}), 400
+
+        job = submit_job(run_id, {
+            "rfp_path": uploads["rfp_path"],
+            "rfp_filename": uploads["rfp_filename"],
+            "proposals_dir": uploads["proposals_dir"],
+            "workspace_dir": uploads["workspace_dir"],
+            "total_uploaded": len(uploads["proposal_names"]),
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
         return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "job_id": job["job_id"],
+        "run_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/compare_jobs/{job['job_id']}",
+        "result_url": f"/compare_jobs/{job['job_id']}/result",
+        "events_url": f"/compare_jobs/{job['job_id']}/events",
+    }), 202
+
+
+@compare_bp.route("/compare_jobs/<job_id>", methods=["GET"])
+def get_comparison_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "⚠️ المهمة غير موجودة."}), 404
+    body = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "total_uploaded": job["inputs"].get("total_uploaded"),
+    }
+    if job["status"] == "running":
+        from workflow.comparison_runs import run_progress
+        body["progress"] = run_progress(job_id)
+    return jsonify(body), 200
+
+
+@compare_bp.route("/compare_jobs/<job_id>/result", methods=["GET"])
+def get_comparison_job_result(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "⚠️ المهمة غير موجودة."}), 404
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"], "status": job["status"], "resumable": True}), 500
+    from workflow.comparison_runs import load_run
+    run = load_run(job_id) if job["status"] == "succeeded" else None
+    if run is None:
+        return jsonify({"job_id": job_id, "status": job["status"]}), 202
+    payload = run_payload(run)
+    payload["total_uploaded"] = job["inputs"].get("total_uploaded", payload["total_uploaded"])
+    return jsonify(payload), 200
+
+
+@compare_bp.route("/compare_jobs/<job_id>/events", methods=["GET"])
+def stream_comparison_job(job_id):
+    """
+    Server-Sent Events for a comparison job: status changes, stage progress
+    (parsed, summarized, criteria_ready), each proposal's scores as soon as it is
+    evaluated and the provisional ranking. Reconnects continue from Last-Event-ID;
+    the stream is closed after COMPARISON_SSE_MAX_SECONDS so it does not hold a
+    server thread for the whole run.
+    """
+    if get_job(job_id) is None:
+        return jsonify({"error": "⚠️ المهمة غير موجودة."}), 404
+    try:
+        after = int(request.headers.get("Last-Event-ID") or request.args.get("after") or 0)
+    except ValueError:
+        after = 0
+
+    def generate(after):
+        last_write = time.monotonic()
+        deadline = last_write + COMPARISON_SSE_MAX_SECONDS
+        while True:
+            # Read the status first: the final status event is written together with it,
+            # so a finished job's events read afterwards are complete
+            job = get_job(job_id)
+            if job is None:
+                # Removed while streaming (janitor / workspace cleanup)
+                event = {"type": "status", "status": "failed", "error": "⚠️ المهمة غير موجودة."}
+                yield f"event: status\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                return
+            finished = job["status"] in ("succeeded", "failed")
+            events = get_events(job_id, after)
+            for seq, event in events:
+                after = seq
+                yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if finished or time.monotonic() >= deadline:
+                return
+            if events:
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write > SSE_KEEPALIVE_SECONDS:
+                last_write = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(SSE_POLL_INTERVAL)
+
+    return Response(generate(after), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+    })
+
+
+@compare_bp.route("/compare_jobs/<job_id>/retry", methods=["POST"])
+def retry_comparison_job(job_id):
+    """Re-queue a failed job; it continues from the run's last checkpoint."""
+    job = retry_job(job_id)
+    if job is None:
+        return jsonify({"error": "⚠️ لا توجد مهمة فاشلة بهذا المعرف."}), 404
+    return jsonify({"job_id": job_id, "status": job["status"]}), 202
+
+
+@compare_bp.route("/compare_llm/sensitivity", methods=["POST"])
+def compare_sensitivity():
+    """
+    Weight-sensitivity analysis for a finished comparison.
+    Body: {"run_id": "..."} for a persisted run, or {"results": [...], "criteria_with_weights": [...]}
+    as returned by /compare_llm; optional "delta" (default 5, within 0-100 weight points),
+    "samples" (default 2000, at most MAX_SENSITIVITY_SAMPLES), "seed" (a non-negative integer).
+    Invalid values get a 400.
+    """
+    from workflow.comparison_runs import load_run
+    from evaluation_engine.ranker import build_score_matrix
+    from evaluation_engine.sensitivity import (
+        analyze_weight_sensitivity, matrix_from_results, DEFAULT_SAMPLES, DEFAULT_DELTA,
+    )
+
+    data = request.get_json(silent=True) or {}
+    run = load_run(data["run_id"]) if data.get("run_id") else None
+    if data.get("run_id") and run is None:
+        return jsonify({"error": "⚠️ المقارنة غير موجودة."}), 404
+
+    if run is not None:
+        criteria_with_weights = run.criteria_with_weights
+        proposal_ids, matrix = build_score_matrix(run.scored_proposals, criteria_with_weights)
+        names = [run.scored_proposals[pid].get("name", pid) for pid in proposal_ids]
+    else:
+        results = data.get("results") or []
+        criteria_with_weights = data.get("criteria_with_weights") or []
+        names, matrix = matrix_from_results(results, criteria_with_weights)
+    if not len(names) or not criteria_with_weights:
+        return jsonify({"error": "⚠️ يجب تمرير نتائج المقارنة ومعايير التقييم مع الأوزان."}), 400
+
+    try:
+        samples = int(data.get("samples", DEFAULT_SAMPLES))
+        delta = float(data.get("delta", DEFAULT_DELTA))
+        seed = data.get("seed")
+        if not 1 <= samples <= MAX_SENSITIVITY_SAMPLES:
+            raise ValueError(samples)
+        if not (math.isfinite(delta) and 0 < delta <= 100):
+            raise ValueError(delta)
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+            raise ValueError(seed)
+    except (TypeError, ValueError):
+        return jsonify({"error": "⚠️ قيم samples أو delta أو seed غير صالحة."}), 400
+
+    analysis = analyze_weight_sensitivity(matrix, criteria_with_weights, names,
+                                          n_samples=samples, delta=delta, seed=seed)
+    return jsonify(analysis), 200
+
+
+@compare_bp.route("/compare_runs/<run_id>", methods=["GET"])
+def get_comparison_run(run_id):
+    from workflow.comparison_runs import load_run
+    run = load_run(run_id)
+    if run is None:
+        return jsonify({"error": "⚠️ المقارنة غير موجودة."}), 404
+    return jsonify(run_payload(run)), 200
+
+
+@compare_bp.route("/compare_runs/<run_id>/progress", methods=["GET"])
+def get_comparison_progress(run_id):
+    """Checkpointed progress of a run (how many proposals are already scored, next step)."""
+    from workflow.comparison_runs import run_progress
+    progress = run_progress(run_id)
+    if progress is None:
+        return jsonify({"error": "⚠️ لا توجد نقطة حفظ لهذه المقارنة."}), 404
+    return jsonify(progress), 200
+
+
+@compare_bp.route("/compare_runs/<run_id>/resume", methods=["POST"])
+def resume_comparison_run(run_id):
+    """
+    Resume a comparison that failed halfway (e.g. LLM provider errors) from its last
+    checkpoint; only the proposals that were not scored yet are evaluated.
+    """
+    from workflow.comparison_runs import resume_run
+    from utils.llm_callbacks import FirstLLMCallTimer
+
+    request_started = time.perf_counter()
+    try:
+        run = resume_run(run_id, [FirstLLMCallTimer("rfp_workflow", request_started)])
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e), "run_id": run_id, "resumable": True}), 500
+    if run is None:
+        return jsonify({"error": "⚠️ لا توجد نقطة حفظ لهذه المقارنة."}), 404
+    return jsonify(run_payload(run)), 200
+
+
+@compare_bp.route("/compare_runs/<run_id>/proposals", methods=["POST"])
+def add_or_replace_proposal(run_id):
+    """
+    Add a late proposal or replace a corrected one in an existing run.
+    Only the uploaded proposal is evaluated (one LLM call); the rest are re-ranked.
+    Form: proposal_file (required), proposal_id (optional, defaults to the file name;
+    an existing id is replaced).
+    """
+    from workflow.comparison_runs import load_run, upsert_proposal
+
+    if load_run(run_id) is None:
+        return jsonify({"error": "⚠️ المقارنة غير موجودة."}), 404
+    file = request.files.get("proposal_file")
+    if file is None or not file.filename:
+        return jsonify({"error": "⚠️ لم يتم رفع ملف العرض."}), 400
+
+    filename = upload_filename(file.filename, "proposal.pdf")
+    if not filename.lower().endswith((".pdf", ".txt")):
+        filename += ".pdf"
+    proposal_id = request.form.get("proposal_id") or filename
+
+    # keep the original (often Arabic) name, it becomes the proposal display name;
+    # the same name replaces the proposal's previous file
+    upload_dir = os.path.join(create_workspace(run_id), PROPOSALS_DIR)
+    save_path = os.path.join(upload_dir, filename)
+    file.save(save_path)
+
+    try:
+        run = upsert_proposal(run_id, save_path, proposal_id)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    return jsonify(run_payload(run)), 200
+
+
+@compare_bp.route("/compare_runs/<run_id>/proposals/<path:proposal_id>", methods=["DELETE"])
+def delete_proposal(run_id, proposal_id):
+    from workflow.comparison_runs import remove_proposal
+    run = remove_proposal(run_id, proposal_id)
+    if run is None:
+        return jsonify({"error": "⚠️ المقارنة أو العرض غير موجود."}), 404
+    return jsonify(run_payload(run)), 200
@@ -1,6 +1,4 @@
 from flask import Blueprint, jsonify, request, session
-from langchain_openai import ChatOpenAI  # type: ignore
-from graph1 import run_graph, llm  # type: ignore
 import os
 table_bp = Blueprint("table_bp", __name__)
 from dotenv import load_dotenv
@@ -10,7 +8,11 @@ load_dotenv()
 
 
 def generate_table_from_text(user_input: str):
-    llm_instance = ChatOpenAI(model="gpt-5-mini", temperature=0.3)
+    from graph1 import get_llm  # type: ignore
+    from utils.llm_clients import track_tier_latency
+    llm = get_llm()
+    tier = llm.tier("generate_table")
+    llm_instance = llm.clients[tier]
     prompt = f"""
         أنت مساعد ذكي متخصص في استخراج الجداول من النصوص العربية.
 
@@ -27,7 +29,8 @@ def generate_table_from_text(user_input: str):
         الوصف:
         {user_input}
         """
-    result = llm_instance.invoke([("user", prompt)])
+    with track_tier_latency(llm, tier):
+        result = llm_instance.invoke([("user", prompt)])
     table_text = result.content.strip()
     lines = [l.strip() for l in table_text.split("\n") if "|" in l]
     headers = [h.strip() for h in lines[0].split("|")]
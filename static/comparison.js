@@ -32,8 +32,8 @@ document.getElementById("compareForm").addEventListener("submit", async function
   resultsSection.style.display = "block";
 
   try {
-    const response = await fetch("/compare_llm", { method: "POST", body: formData });
-    const data = await response.json();
+    // 🕒 إرسال المقارنة كمهمة في الخلفية ثم متابعة حالتها حتى تكتمل
+    const data = await runComparisonJob(formData, resultsSection);
     resultsSection.innerHTML = "";
     console.log("✅ البيانات المستلمة:", data);
 
@@ -184,12 +184,211 @@ document.getElementById("compareForm").addEventListener("submit", async function
 
       resultsSection.appendChild(card);
     });
+
+    // ⚖️ تحليل حساسية الأوزان (هل يتغير الفائز لو تغيّر وزن معيار؟)
+    if (Array.isArray(data.criteria_with_weights) && data.criteria_with_weights.length > 0) {
+      renderSensitivityButton(resultsSection, results, data.criteria_with_weights);
+    }
   } catch (err) {
     console.error("❌ Error:", err);
     resultsSection.innerHTML = `<p style='color:red;text-align:center;'>حدث خطأ أثناء التحليل.</p>`;
   }
 });
 
+// ===============================
+// 🕒 مهمة المقارنة في الخلفية (إرسال + متابعة مباشرة للنتائج)
+// ===============================
+const JOB_POLL_INTERVAL_MS = 2000;
+
+async function runComparisonJob(formData, statusEl) {
+  const submitResponse = await fetch("/compare_jobs", { method: "POST", body: formData });
+  const job = await submitResponse.json();
+  if (job.error) return job;
+
+  // ⚡ بث مباشر (SSE): كل عرض يظهر فور تقييمه، مع ترتيب مبدئي يتحدث تلقائيًا
+  if (window.EventSource && job.events_url) {
+    return await followJobEvents(job, statusEl);
+  }
+  return await pollJobStatus(job, statusEl);
+}
+
+function followJobEvents(job, statusEl) {
+  return new Promise((resolve) => {
+    const live = renderLiveProgress(statusEl);
+    const source = new EventSource(job.events_url);
+    let finished = false;
+
+    const finish = async (status) => {
+      finished = true;
+      source.close();
+      if (status.status === "failed") {
+        resolve({ error: status.error || "فشلت عملية المقارنة.", job_id: job.job_id });
+        return;
+      }
+      const resultResponse = await fetch(job.result_url);
+      resolve(await resultResponse.json());
+    };
+
+    source.addEventListener("status", (e) => {
+      const status = JSON.parse(e.data);
+      if (status.status === "queued") live.setStage("المهمة في الانتظار");
+      if (status.status === "running") live.setStage("جاري تجهيز الملفات وتحليل كراسة الشروط");
+      if (status.status === "succeeded" || status.status === "failed") finish(status);
+    });
+
+    source.addEventListener("stage", (e) => {
+      const stage = JSON.parse(e.data);
+      const labels = {
+        parsed: `تمت قراءة ${stage.proposals} عرض`,
+        summarized: "تم تلخيص كراسة الشروط",
+        criteria_ready: "تم استخراج معايير التقييم، جاري تقييم العروض",
+        resumed: `استئناف المقارنة (${stage.scored} من ${stage.proposals} عرض مقيّم)`,
+      };
+      live.setStage(labels[stage.stage] || stage.stage);
+      if (stage.proposals) live.total = stage.proposals;
+    });
+
+    source.addEventListener("proposal", (e) => {
+      const proposal = JSON.parse(e.data);
+      live.total = proposal.proposals || live.total;
+      live.setStage(`تم تقييم ${proposal.scored} من ${live.total} عرض`);
+    });
+
+    source.addEventListener("ranking", (e) => {
+      live.setRanking(JSON.parse(e.data).ranking);
+    });
+
+    source.onerror = () => {
+      // EventSource يعيد الاتصال تلقائيًا؛ إذا أُغلق نهائيًا نعود للاستعلام الدوري
+      if (!finished && source.readyState === EventSource.CLOSED) {
+        finished = true;
+        pollJobStatus(job, statusEl).then(resolve);
+      }
+    };
+  });
+}
+
+function renderLiveProgress(container) {
+  container.innerHTML = `
+    <p class="live-stage" style='text-align:center;color:#0f3d61;'> جاري تحليل العروض باستخدام AI الرجاء الانتظار...</p>
+    <table class="summary-table live-ranking" style="display:none;">
+      <tr><th>الترتيب المبدئي</th><th>العرض</th><th>الدرجة</th><th>الحالة</th></tr>
+    </table>`;
+  const stageEl = container.querySelector(".live-stage");
+  const table = container.querySelector(".live-ranking");
+
+  return {
+    total: 0,
+    setStage(text) {
+      stageEl.textContent = `⏳ ${text}`;
+    },
+    setRanking(ranking) {
+      if (!ranking || ranking.length === 0) return;
+      let rows = "<tr><th>الترتيب المبدئي</th><th>العرض</th><th>الدرجة</th><th>الحالة</th></tr>";
+      ranking.forEach(r => {
+        rows += `<tr>
+          <td>${r.rank}</td>
+          <td>${String(r.proposal_name).replace(/\.[^/.]+$/, "")}</td>
+          <td>${r.total_score}</td>
+          <td>${r.is_qualified ? "✅ مؤهل" : "❌ غير مؤهل"}</td>
+        </tr>`;
+      });
+      table.innerHTML = rows;
+      table.style.display = "";
+    },
+  };
+}
+
+async function pollJobStatus(job, statusEl) {
+  while (true) {
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const statusResponse = await fetch(job.status_url);
+    const status = await statusResponse.json();
+
+    if (status.error && status.status !== "failed") return status;
+    if (status.status === "failed") {
+      return { error: status.error || "فشلت عملية المقارنة.", job_id: job.job_id };
+    }
+    if (status.status === "succeeded") {
+      const resultResponse = await fetch(job.result_url);
+      return await resultResponse.json();
+    }
+
+    const progress = status.progress;
+    const progressText = progress && progress.proposals
+      ? `تم تقييم ${progress.scored} من ${progress.proposals} عرض`
+      : (status.status === "queued" ? "المهمة في الانتظار" : "جاري تجهيز الملفات وتحليل كراسة الشروط");
+    statusEl.innerHTML = `<p style='text-align:center;color:#0f3d61;'> جاري تحليل العروض باستخدام AI الرجاء الانتظار... (${progressText})</p>`;
+  }
+}
+
+// ===============================
+// ⚖️ تحليل حساسية الأوزان واستقرار الترتيب
+// ===============================
+function renderSensitivityButton(container, results, criteriaWithWeights) {
+  const box = document.createElement("div");
+  box.className = "proposal-card sensitivity-card";
+
+  const btn = document.createElement("button");
+  btn.type = "button";
+  btn.textContent = "⚖️ تحليل حساسية الأوزان";
+  box.appendChild(btn);
+
+  const output = document.createElement("div");
+  box.appendChild(output);
+
+  btn.addEventListener("click", async () => {
+    btn.disabled = true;
+    output.innerHTML = "<p style='text-align:center;color:#0f3d61;'>جاري التحليل...</p>";
+    try {
+      const response = await fetch("/compare_llm/sensitivity", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          results: results.filter(r => Array.isArray(r.scores) ? r.scores.length > 0 : !!r.scores),
+          criteria_with_weights: criteriaWithWeights,
+          delta: 5,
+        }),
+      });
+      const analysis = await response.json();
+      if (analysis.error) {
+        output.innerHTML = `<p style='color:red;text-align:center;'>⚠️ ${analysis.error}</p>`;
+        return;
+      }
+
+      let rows = "";
+      analysis.proposals.forEach(p => {
+        rows += `<tr>
+          <td>${p.base_rank}. ${p.proposal_name.replace(/\.[^/.]+$/, "")}</td>
+          <td>${(p.win_probability * 100).toFixed(1)}%</td>
+          <td>${(p.stability_score * 100).toFixed(1)}%</td>
+          <td>${p.best_rank} - ${p.worst_rank}</td>
+        </tr>`;
+      });
+
+      const flips = analysis.sweep.filter(s => s.winner_changed);
+      const flipText = flips.length
+        ? flips.map(s => `${s.criterion} (${s.change > 0 ? "+" : ""}${s.change}) ← ${s.winner.replace(/\.[^/.]+$/, "")}`).join("<br>")
+        : "لا يتغير الفائز عند تعديل وزن أي معيار بمقدار " + analysis.delta + " نقاط.";
+
+      output.innerHTML = `
+        <p><b>ثبات الفائز:</b> ${(analysis.winner_stability * 100).toFixed(1)}% من ${analysis.samples} سيناريو أوزان</p>
+        <table class="summary-table">
+          <tr><th>العرض</th><th>احتمال الفوز</th><th>ثبات الترتيب</th><th>نطاق الترتيب</th></tr>
+          ${rows}
+        </table>
+        <p><b>تغيّر الفائز عند:</b><br>${flipText}</p>`;
+    } catch (err) {
+      console.error("❌ Sensitivity error:", err);
+      output.innerHTML = `<p style='color:red;text-align:center;'>حدث خطأ أثناء تحليل الحساسية.</p>`;
+    } finally {
+      btn.disabled = false;
+    }
+  });
+
+  container.appendChild(box);
+}
+
 // ===============================
 // 💅 الأنماط الجمالية
 // ===============================
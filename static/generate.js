@@ -71,6 +71,105 @@ if (saveBtn) {
   });
 }
 
+// ============================
+// 📡 استقبال الأقسام أولاً بأول (نسخة البث من /rfp_generate)
+// ============================
+const streamStatus = document.getElementById("streamStatus");
+
+if (streamStatus && window.EventSource) {
+  const form = document.querySelector("form[action='/save']");
+  const submitBtn = document.getElementById("saveBtn");
+  const streamCount = document.getElementById("streamCount");
+  const started = new Set();
+  let completed = 0;
+
+  if (submitBtn) submitBtn.disabled = true;
+  const source = new EventSource(streamStatus.dataset.streamUrl);
+
+  const fieldFor = (name) => form.querySelector(`textarea[name="${name}"]`);
+
+  source.addEventListener("delta", (e) => {
+    const data = JSON.parse(e.data);
+    const field = fieldFor(data.section);
+    if (!field) return;
+    if (!started.has(data.section)) {
+      started.add(data.section);
+      field.value = "";
+    }
+    field.value += data.text;
+  });
+
+  source.addEventListener("section", (e) => {
+    const data = JSON.parse(e.data);
+    const field = fieldFor(data.section);
+    if (field) field.value = data.text;
+    completed++;
+    streamCount.textContent = `(${completed})`;
+  });
+
+  source.addEventListener("done", async (e) => {
+    source.close();
+    const data = JSON.parse(e.data);
+    // القيم النهائية (بما فيها الأقسام غير المعروضة كحقول) تُحفظ في الجلسة
+    await fetch("/rfp_generate/finish", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ decisions: data.decisions, fingerprints: data.fingerprints }),
+    });
+    Object.entries(data.decisions).forEach(([name, value]) => {
+      const field = fieldFor(name);
+      if (field && !field.value) field.value = value || "";
+    });
+    const timedOut = data.timed_out || [];
+    streamStatus.textContent = timedOut.length
+      ? `⚠️ لم يكتمل ${timedOut.length} قسم ضمن المهلة (${timedOut.join("، ")}) — استخدم إعادة التوليد لإكمالها`
+      : "✅ اكتمل توليد الأقسام";
+    if (submitBtn) submitBtn.disabled = false;
+  });
+
+  source.addEventListener("error", (e) => {
+    // حدث خطأ من الخادم (data) أو انقطاع الاتصال
+    source.close();
+    let message = "انقطع الاتصال";
+    try { message = JSON.parse(e.data).error; } catch (_) {}
+    streamStatus.textContent = "❌ تعذر إكمال التوليد: " + message;
+    if (submitBtn) submitBtn.disabled = false;
+  });
+}
+
+// ============================
+// ♻️ إعادة توليد الأقسام التي تغيّرت مدخلاتها فقط
+// ============================
+const regenerateBtn = document.getElementById("regenerateBtn");
+const regenerateMsg = document.getElementById("regenerateMsg");
+
+if (regenerateBtn) {
+  regenerateBtn.addEventListener("click", async () => {
+    const form = regenerateBtn.closest("form");
+    regenerateBtn.disabled = true;
+    regenerateMsg.style.display = "block";
+    regenerateMsg.textContent = "جاري إعادة توليد الأقسام المتأثرة...";
+
+    try {
+      const res = await fetch("/rfp_regenerate", { method: "POST", body: new FormData(form) });
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.error || res.statusText);
+
+      Object.entries(data.sections).forEach(([name, text]) => {
+        const field = form.querySelector(`textarea[name="${name}"]`);
+        if (field) field.value = text;
+      });
+      regenerateMsg.textContent = data.regenerated.length
+        ? `تمت إعادة توليد ${data.regenerated.length} قسم: ${data.regenerated.join("، ")}`
+        : "لا توجد أقسام متأثرة بالتغييرات.";
+    } catch (err) {
+      regenerateMsg.textContent = "❌ تعذرت إعادة التوليد: " + err.message;
+    } finally {
+      regenerateBtn.disabled = false;
+    }
+  });
+}
+
 // ============================
 // 🎨 أنيميشن ناعم للتنقل بين الأقسام
 // ============================
@@ -0,0 +1,66 @@
+# tests/mock_openai.py
+"""
+Minimal local OpenAI-compatible chat completions server for the tests and benchmarks.
+
+- Counts TCP connections and requests.
+- Replies in JSON mode (response_format json_object) with one key per
+  "### <Section>" heading of the prompt, so grouped-section calls parse.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_TEXT = "نص القسم المولد."
+
+
+class MockOpenAI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    connections = 0
+    requests = 0
+    prompt_chars = 0
+    delay = 0.02
+
+    def setup(self):
+        super().setup()
+        MockOpenAI.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        MockOpenAI.requests += 1
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        MockOpenAI.prompt_chars += len(prompt)
+        time.sleep(self.delay)
+
+        content = REPLY_TEXT
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            sections = re.findall(r"^### (\w+)$", prompt, flags=re.MULTILINE)
+            content = json.dumps({sec: REPLY_TEXT for sec in sections}, ensure_ascii=False)
+
+        out = json.dumps({
+            "id": "mock", "object": "chat.completion", "created": 0, "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    @classmethod
+    def reset(cls):
+        cls.connections = cls.requests = cls.prompt_chars = 0
+
+
+def start_mock_server():
+    """Start a server in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOpenAI)
+    server.handle_error = lambda request, client_address: None  # clients dropping pooled sockets
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
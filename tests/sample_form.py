@@ -0,0 +1,51 @@
+# tests/sample_form.py
+"""A complete sample RFP form and generated section texts, shared by the tests and benchmarks."""
+from nodes.field_map import FIELD_MAP
+from nodes.orchestrator_graph import build_decisions
+
+SAMPLE_FORM = {
+    "Government_Agency": "وزارة الشؤون البلدية والقروية والإسكان",
+    "Competition_Name": "تشغيل وصيانة أنظمة المباني الذكية لمقر الوزارة الرئيسي",
+    "Booklet_Number": "2025-145-OM",
+    "Issue_Date": "2025-03-01",
+    "Competition_Document_Fees": "1500",
+    "Payment_Method": "سداد",
+    "Name_of_Government_Agency_Representative": "عبدالله محمد العتيبي",
+    "Position_of_Government_Agency_Representative": "مدير إدارة المشتريات",
+    "Phone_Number_of_Government_Agency_Representative": "0114567890",
+    "Fax_Number_of_Government_Agency_Representative": "0114567891",
+    "Email_of_Government_Agency_Representative": "procurement@example.gov.sa",
+    "Bid_Submission_Address": "الرياض، حي الملز، طريق الأمير عبدالرحمن بن عبدالعزيز",
+    "Bid_Submission_Building": "المبنى الرئيسي",
+    "Bid_Submission_Floor": "الدور الثالث",
+    "Bid_Submission_Department_Name": "إدارة المنافسات والمشتريات",
+    "Bid_Submission_Time": "10:00 صباحاً",
+    "Post_Qualification": "نعم",
+    "Inquiry_Submission_period": "10 أيام",
+    "Inquiry_Response_Period": "5 أيام",
+    "Inquiry_Email": "inquiries@example.gov.sa",
+    "Initial_Guarantee_Percentage": "2",
+    "Max_Penalty_Percentage": "10",
+    "Service_Execution_Location": "الرياض",
+    "Project_Type": "تشغيل وصيانة",
+    "Project_Duration": "36 شهراً",
+    "Award_Method": "Best Value",
+    "Includes_Equipment": "نعم",
+    "Local_Content_Requirements": "الحد الأدنى للمحتوى المحلي 40٪",
+    "Penalty_Deduction": "نعم",
+    "Penalty_Execute_On_Vendor": "نعم",
+    "Penalty_Suspend": "لا",
+    "Penalty_Termination": "نعم",
+    "include_Tender_Split_Section": "on",
+    "include_Alternative_Offers": "on",
+}
+
+# Generated sections fed to dependent prompts (Bid_Evaluation_Criteria)
+SAMPLE_SECTION_TEXT = "يلتزم المتنافس بتقديم المستندات الفنية والمالية وفق المتطلبات الموضحة في الكراسة. " * 6
+
+
+def sample_values() -> dict:
+    """Decisions of the sample form plus generated section texts, as the section prompts see them."""
+    values = build_decisions(dict(SAMPLE_FORM))
+    values.update({k: SAMPLE_SECTION_TEXT for k, v in FIELD_MAP.items() if v == "llm"})
+    return values
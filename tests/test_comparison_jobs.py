@@ -0,0 +1,103 @@
+# tests/test_comparison_jobs.py
+"""SQLite comparison job queue on a temporary database: claiming, stale jobs, final status."""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import pytest
+import workflow.comparison_jobs as jobs
+
+
+@pytest.fixture(autouse=True)
+def jobs_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "COMPARISON_JOBS_DB", str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(jobs, "COMPARISON_WORKER_MODE", "process")  # nothing runs on submit
+    monkeypatch.setattr(jobs, "_schema_ready", False)
+    return tmp_path / "jobs.sqlite"
+
+
+def submit(count):
+    return [jobs.submit_job(f"job-{i:02d}", {"rfp_path": "rfp.pdf"})["job_id"] for i in range(count)]
+
+
+def run_threads(target, count):
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        target()
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_claimers_never_take_the_same_job():
+    job_ids = submit(30)
+    claimed, lock = [], threading.Lock()
+
+    def claim_until_empty():
+        while (job := jobs.claim_job()) is not None:
+            with lock:
+                claimed.append(job["job_id"])
+
+    run_threads(claim_until_empty, 8)
+    assert sorted(claimed) == job_ids
+    assert {jobs.get_job(job_id)["status"] for job_id in job_ids} == {jobs.RUNNING}
+
+
+def test_one_claimer_wins_a_given_job():
+    [job_id] = submit(1)
+    winners, lock = [], threading.Lock()
+
+    def claim():
+        job = jobs.claim_job(job_id)
+        if job is not None:
+            with lock:
+                winners.append(job["worker"])
+
+    run_threads(claim, 8)
+    assert len(winners) == 1
+
+
+def set_heartbeat(job_id, age_seconds):
+    at = (datetime.now() - timedelta(seconds=age_seconds)).isoformat(timespec="seconds")
+    with jobs._db() as conn:
+        conn.execute("UPDATE comparison_jobs SET heartbeat_at = ? WHERE job_id = ?", (at, job_id))
+
+
+def test_stale_heartbeat_is_requeued():
+    stale, fresh = submit(2)
+    jobs.claim_job(stale), jobs.claim_job(fresh)
+    set_heartbeat(stale, jobs.COMPARISON_JOB_STALE_SECONDS + 60)
+    set_heartbeat(fresh, 1)
+
+    assert jobs.requeue_stale_jobs() == [stale]
+    assert jobs.get_job(stale)["status"] == jobs.QUEUED and jobs.get_job(stale)["worker"] is None
+    assert jobs.get_job(fresh)["status"] == jobs.RUNNING
+    assert jobs.get_events(stale)[-1][1] == {"type": "status", "status": jobs.QUEUED}
+    # The next claim without a job id picks the requeued job up again
+    assert jobs.claim_job()["job_id"] == stale
+
+
+def test_finish_writes_status_and_final_event_together():
+    [job_id] = submit(1)
+    jobs.claim_job(job_id)
+    jobs._finish(job_id, jobs.FAILED, "boom")
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["error"]) == (jobs.FAILED, "boom")
+    assert jobs.get_events(job_id)[-1][1] == {"type": "status", "status": jobs.FAILED, "error": "boom"}
+
+
+def test_finish_leaves_the_job_unchanged_if_the_event_cannot_be_written():
+    [job_id] = submit(1)
+    jobs.claim_job(job_id)
+    events = jobs.get_events(job_id)
+    with jobs._db() as conn:
+        conn.execute("CREATE TRIGGER no_events BEFORE INSERT ON comparison_job_events "
+                     "BEGIN SELECT RAISE(ABORT, 'event log unavailable'); END")
+    with pytest.raises(sqlite3.DatabaseError):
+        jobs._finish(job_id, jobs.SUCCEEDED)
+    assert jobs.get_job(job_id)["status"] == jobs.RUNNING
+    assert jobs.get_events(job_id) == events
@@ -0,0 +1,59 @@
+# tests/test_docx_renderer.py
+"""Table targets in the rendered document: ParagraphIndex lookups and table insertion."""
+from docx import Document
+from nodes.docx_renderer import ParagraphIndex, find_table_target, insert_table
+
+TABLE_TEXT = "البند | الكمية\nمضخة | 2\nمولد | 1"
+
+
+def document():
+    doc = Document()
+    doc.add_paragraph("مقدمة")
+    cell = doc.add_table(rows=1, cols=2).rows[0].cells
+    cell[0].text = "خلية: جدول العمالة"
+    cell[1].text = "{{Workers_Table}}"
+    doc.add_paragraph("  جدول الكميات  ")
+    doc.add_paragraph("ملحق: جدول الكميات والأسعار")
+    doc.add_paragraph("{{Bill_of_Quantities}}")
+    doc.add_paragraph("الفقرة الأخيرة")
+    return doc
+
+
+def test_exact_matches_stripped_body_paragraphs():
+    index = ParagraphIndex(document(), [])
+    assert index.exact("جدول الكميات").text == "  جدول الكميات  "
+    assert index.exact("جدول") is None
+
+
+def test_containing_prefers_body_paragraphs_over_cells():
+    index = ParagraphIndex(document(), ["جدول", "{{Workers_Table}}", "غير موجود"])
+    assert index.containing("جدول").text == "  جدول الكميات  "
+    assert index.containing("{{Workers_Table}}").text == "{{Workers_Table}}"
+    assert index.containing("غير موجود") is None
+
+
+def test_find_table_target_falls_back_from_heading_to_placeholder():
+    index = ParagraphIndex(document(), ["جدول الكميات والأسعار", "{{Bill_of_Quantities}}", "عنوان آخر"])
+    assert find_table_target(index, "{{Bill_of_Quantities}}", "جدول الكميات والأسعار").text == \
+        "ملحق: جدول الكميات والأسعار"
+    assert find_table_target(index, "{{Bill_of_Quantities}}", "عنوان آخر").text == "{{Bill_of_Quantities}}"
+    assert find_table_target(index, "{{Bill_of_Quantities}}").text == "{{Bill_of_Quantities}}"
+
+
+def test_insert_table_after_placeholder_and_clear_it():
+    doc = document()
+    assert insert_table(doc, TABLE_TEXT, "{{Bill_of_Quantities}}", "عنوان غير موجود")
+    body = list(doc.element.body.iterchildren())
+    table = next(el for el in body if el.tag.endswith("}tbl") and "مضخة" in "".join(el.itertext()))
+    previous = body[body.index(table) - 1]
+    assert "".join(previous.itertext()) == ""  # the placeholder paragraph, emptied
+    assert [[c.text for c in row.cells] for row in doc.tables[-1].rows] == [
+        ["البند", "الكمية"], ["مضخة", "2"], ["مولد", "1"],
+    ]
+
+
+def test_insert_table_skips_missing_targets_and_empty_tables():
+    doc = document()
+    assert not insert_table(doc, TABLE_TEXT, "{{Missing}}", "عنوان غير موجود")
+    assert not insert_table(doc, "لا يوجد جدول", "{{Bill_of_Quantities}}")
+    assert len(doc.tables) == 1
@@ -0,0 +1,109 @@
+# tests/test_evaluator.py
+"""Local repair of evaluation replies: tolerant JSON, score coercion, criterion names, re-ask excerpts."""
+import pytest
+from evaluation_engine.evaluator import _coerce_score, loads_tolerant, reask_excerpt, reconcile_criteria
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"scores": {"السعر": 85}}', {"scores": {"السعر": 85}}),
+    ('```json\n{"scores": {"السعر": 85}}\n```', {"scores": {"السعر": 85}}),
+    ('النتيجة: {"scores": {"السعر": 85}} انتهى', {"scores": {"السعر": 85}}),
+    ('{"scores": {"السعر": ٨٥}}', {"scores": {"السعر": 85}}),
+    ('{"a": ٨٥٫٥}', {"a": 85.5}),
+    ('{“scores”: {“a”: 1,},}', {"scores": {"a": 1}}),
+    ("{'scores': {'a': 1}}", {"scores": {"a": 1}}),
+    ("لا يوجد JSON", None),
+    ("", None),
+    ("[1, 2]", None),
+])
+def test_loads_tolerant(text, expected):
+    assert loads_tolerant(text) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (85, 85.0),
+    (0, 0.0),
+    ("0", 0.0),
+    (85.5, 85.5),
+    ("85", 85.0),
+    ("85%", 85.0),
+    ("85/100", 85.0),
+    ("17/20", 85.0),
+    ("٨٥", 85.0),
+    ("٨٥٪", 85.0),
+    ({"score": 70}, 70.0),
+    ({"value": "70"}, 70.0),
+    ("-3", None),
+    ("−3", None),
+    (120, None),
+    ("abc", None),
+    (None, None),
+    (True, None),
+])
+def test_coerce_score(value, expected):
+    assert _coerce_score(value) == expected
+
+
+CRITERIA = ["الخبرة الفنية", "الخبرة الفنية للفريق", "السعر", "الجدول الزمني", "المدة الزمنية للتنفيذ"]
+
+
+@pytest.mark.parametrize("returned, expected", [
+    ({"السعر": 90}, {"السعر": 90}),
+    ({"السعر ": 90}, {"السعر": 90}),
+    ({"الخبرة الفنيه": 80}, {"الخبرة الفنية": 80}),
+    # Contained in exactly one requested name
+    ({"المدة الزمنية": 50}, {"المدة الزمنية للتنفيذ": 50}),
+    ({"السعر الإجمالي": 90}, {"السعر": 90}),
+    # Contained in two requested names: not guessed
+    ({"الخبرة": 80}, {}),
+    ({"معيار آخر": 80}, {}),
+    # A score of 0 is a score, not a missing criterion
+    ({"السعر": 0}, {"السعر": 0}),
+])
+def test_reconcile_criteria(returned, expected):
+    scores, missing = reconcile_criteria(returned, CRITERIA)
+    assert scores == expected
+    assert missing == [c for c in CRITERIA if c not in expected]
+
+
+def test_reask_excerpt_keeps_matching_paragraphs_within_the_limit():
+    text = "\n".join(["مقدمة عامة عن الشركة", "السعر الإجمالي 100 ريال", "فريق العمل", "الجدول الزمني 6 أشهر"])
+    assert reask_excerpt(text, ["السعر", "الجدول الزمني"]) == "السعر الإجمالي 100 ريال\nالجدول الزمني 6 أشهر"
+    assert reask_excerpt(text, ["الجدول الزمني"], limit=10) == text[:10]
+    assert reask_excerpt("x" * 100, ["السعر"], limit=30) == "x" * 30
+
+
+class FakeEvaluationLLM:
+    """Chat model whose structured output returns `replies` in turn; records the prompts."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def with_structured_output(self, schema, **kwargs):
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+
+        def reply(prompt_value):
+            self.prompts.append(prompt_value.to_string())
+            return {"raw": AIMessage(content=self.replies.pop(0)), "parsed": None, "parsing_error": None}
+        return RunnableLambda(reply)
+
+
+def test_reask_sends_only_missing_criteria_and_an_excerpt():
+    from evaluation_engine.evaluator import REASK_EXCERPT_CHARS, evaluate_proposal
+    proposal = "\n".join(["حشو " * 50] * 200 + ["الجدول الزمني للتنفيذ 6 أشهر"])
+    llm = FakeEvaluationLLM('{"scores": {"السعر": 0}}', '{"scores": {"الجدول الزمني": 75}}')
+    result = evaluate_proposal(proposal, {"المدة": "سنة"}, ["السعر", "الجدول الزمني"], llm=llm)
+    assert {s.criterion: s.score for s in result.scores} == {"السعر": 0.0, "الجدول الزمني": 75.0}
+    reask = llm.prompts[1]
+    assert proposal in llm.prompts[0] and len(reask) < REASK_EXCERPT_CHARS
+    assert "الجدول الزمني للتنفيذ 6 أشهر" in reask and "السعر" not in reask
+
+
+def test_no_reask_when_every_criterion_is_scored():
+    from evaluation_engine.evaluator import evaluate_proposal
+    llm = FakeEvaluationLLM('{"scores": {"السعر": 60, "الجودة": "٨٠"}}')
+    result = evaluate_proposal("نص", {}, ["السعر", "الجودة"], llm=llm)
+    assert [s.score for s in result.scores] == [60.0, 80.0]
+    assert len(llm.prompts) == 1
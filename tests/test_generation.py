@@ -0,0 +1,199 @@
+# tests/test_generation.py
+"""
+Section generation (nodes.orchestrator_graph.generate_sections_async) with a fake
+async chat model: prompt building, scheduling of dependent sections.
+"""
+import asyncio
+import pytest
+import nodes.orchestrator_graph as orchestrator_graph
+from nodes.llm_runtime import run_coroutine
+from nodes.orchestrator_graph import TIMED_OUT_TEXT, generate_sections_async
+from nodes.prompts import PROMPTS
+from nodes.section_dependencies import build_prompt
+
+
+class FakeLLM:
+    """Async chat model answering every prompt with `reply`; records the prompts it got."""
+    model_name = "fake-generation"
+
+    def __init__(self, reply="نص مولد"):
+        self.reply = reply
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0)
+        return type("Reply", (), {"content": self.reply})()
+
+
+def generate(llm, sections, values, **kwargs):
+    return run_coroutine(generate_sections_async(llm, PROMPTS, sections, values, groups=[], **kwargs))
+
+
+def test_build_prompt_leaves_missing_placeholders_empty():
+    prompt = build_prompt("Bid_Evaluation_Criteria", {"Project_Name": "x"})
+    assert "{Technical_Proposal_Documents}" not in prompt
+    assert "Award_Method:\n" in prompt
+
+
+def test_dependent_section_alone_does_not_raise():
+    # Prerequisites neither scheduled nor in the values: left pending, not built from empty texts
+    llm, timed_out = FakeLLM(), []
+    result = generate(llm, ["Bid_Evaluation_Criteria"], {"Project_Name": "x"}, timed_out=timed_out)
+    assert result["Bid_Evaluation_Criteria"] == TIMED_OUT_TEXT
+    assert timed_out == ["Bid_Evaluation_Criteria"]
+    assert llm.prompts == []
+
+
+def test_dependent_section_without_award_method():
+    llm = FakeLLM()
+    values = {"Technical_Proposal_Documents": "فني", "Financial_Proposal_Documents": "مالي"}
+    result = generate(llm, ["Bid_Evaluation_Criteria"], values)
+    assert result["Bid_Evaluation_Criteria"] == "نص مولد"
+    assert "فني" in llm.prompts[0] and "مالي" in llm.prompts[0]
+
+
+@pytest.mark.parametrize("groups", [[], [["Alternative_Offers", "Joint_Venture", "Tender_Split_Section"]]])
+def test_prompt_error_is_recorded_for_its_section_only(monkeypatch, groups):
+    build_prompt = orchestrator_graph.build_prompt
+
+    def failing_build_prompt(section, values, prompts):
+        if section == "Joint_Venture":
+            raise ValueError("bad template")
+        return build_prompt(section, values, prompts)
+
+    monkeypatch.setattr(orchestrator_graph, "build_prompt", failing_build_prompt)
+    sections = ["Alternative_Offers", "Joint_Venture", "Tender_Split_Section"]
+    timed_out = []
+    result = run_coroutine(generate_sections_async(FakeLLM(), PROMPTS, sections, {}, groups=groups,
+                                                   timed_out=timed_out))
+    assert result["Joint_Venture"] == TIMED_OUT_TEXT
+    assert timed_out == ["Joint_Venture"]
+    assert result["Alternative_Offers"] == result["Tender_Split_Section"] == "نص مولد"
+
+
+class FailingLLM(FakeLLM):
+    """Streams two tokens then fails; counts every kind of call."""
+    model_name = "fake-failing"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def astream(self, prompt):
+        self.calls.append("astream")
+        yield "جزء "
+        yield "أول"
+        raise RuntimeError("provider error")
+
+    async def ainvoke(self, prompt):
+        self.calls.append("ainvoke")
+        raise RuntimeError("provider error")
+
+    def invoke(self, prompt):
+        self.calls.append("invoke")
+        return "sync"
+
+
+@pytest.mark.parametrize("stream_tokens", [False, True])
+def test_failed_call_is_not_retried(stream_tokens):
+    llm, events, timed_out = FailingLLM(), [], []
+    result = generate(llm, ["Competition_Definition"], {}, on_event=events.append,
+                      stream_tokens=stream_tokens, timed_out=timed_out)
+    assert llm.calls == (["astream"] if stream_tokens else ["ainvoke"])
+    assert result["Competition_Definition"] == orchestrator_graph.LLM_ERROR_TEXT
+    assert timed_out == ["Competition_Definition"]
+    deltas = [e["text"] for e in events if e["type"] == "delta"]
+    assert deltas == (["جزء ", "أول"] if stream_tokens else [])
+
+
+class SlowLLM(FakeLLM):
+    """FakeLLM taking `delay` seconds per call; the first `failures` calls raise."""
+
+    def __init__(self, delay=0.0, failures=0):
+        super().__init__()
+        self.delay = delay
+        self.failures = failures
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        if len(self.prompts) <= self.failures:
+            raise RuntimeError("provider error")
+        return type("Reply", (), {"content": f"نص {len(self.prompts)}"})()
+
+
+def test_dependent_section_starts_after_its_prerequisites():
+    llm, events = SlowLLM(delay=0.01), []
+    sections = ["Bid_Evaluation_Criteria", "Technical_Proposal_Documents", "Financial_Proposal_Documents"]
+    result = generate(llm, sections, {}, on_event=events.append)
+    finished = [e["section"] for e in events]
+    assert finished[-1] == "Bid_Evaluation_Criteria"
+    assert len(llm.prompts) == 3
+    assert result["Technical_Proposal_Documents"] in llm.prompts[2]
+    assert result["Financial_Proposal_Documents"] in llm.prompts[2]
+
+
+def test_failed_prerequisite_leaves_its_dependents_pending():
+    llm, timed_out = SlowLLM(failures=1), []
+    values = {"Financial_Proposal_Documents": "مالي"}
+    result = generate(llm, ["Bid_Evaluation_Criteria", "Technical_Proposal_Documents"], values, timed_out=timed_out)
+    assert result["Technical_Proposal_Documents"] == orchestrator_graph.LLM_ERROR_TEXT
+    assert result["Bid_Evaluation_Criteria"] == TIMED_OUT_TEXT
+    assert sorted(timed_out) == ["Bid_Evaluation_Criteria", "Technical_Proposal_Documents"]
+    assert len(llm.prompts) == 1
+
+
+def test_deadline_cuts_off_running_sections():
+    import time
+    llm, timed_out = SlowLLM(delay=5), []
+    result = generate(llm, ["Alternative_Offers", "Joint_Venture"], {}, timed_out=timed_out,
+                      deadline=time.perf_counter() + 0.1)
+    assert result["Alternative_Offers"] == result["Joint_Venture"] == TIMED_OUT_TEXT
+    assert sorted(timed_out) == ["Alternative_Offers", "Joint_Venture"]
+
+
+def test_group_without_structured_output_falls_back_to_single_calls():
+    llm = FakeLLM()
+    sections = ["Alternative_Offers", "Joint_Venture"]
+    result = run_coroutine(generate_sections_async(llm, PROMPTS, sections, {}, groups=[sections]))
+    assert result["Alternative_Offers"] == result["Joint_Venture"] == "نص مولد"
+    assert len(llm.prompts) == 2
+
+
+def router(monkeypatch, replies):
+    """ModelRouter over fake clients: tier "strong" (first) and "fast", answering with replies[model]."""
+    import utils.llm_clients as llm_clients
+    clients = {model: FakeLLM(reply) for model, reply in replies.items()}
+    monkeypatch.setattr(llm_clients, "get_chat_model", lambda model, *args: clients[model])
+    tiers = {"strong": {"model": "strong-model"}, "fast": {"model": "fast-model"}}
+    return llm_clients.ModelRouter(tiers, {"Project_Scope_of_Work": "strong"}, "fast"), clients
+
+
+def test_empty_completion_is_retried_on_the_strong_tier(monkeypatch):
+    llm, clients = router(monkeypatch, {"strong-model": "نص قوي", "fast-model": ""})
+    result = generate(llm, ["Alternative_Offers"], {})
+    assert result["Alternative_Offers"] == "نص قوي"
+    assert len(clients["fast-model"].prompts) == len(clients["strong-model"].prompts) == 1
+
+
+def test_empty_completion_of_the_strong_tier_is_a_failure(monkeypatch):
+    llm, clients = router(monkeypatch, {"strong-model": "", "fast-model": "نص"})
+    timed_out = []
+    result = generate(llm, ["Project_Scope_of_Work"], {}, timed_out=timed_out)
+    assert result["Project_Scope_of_Work"] == orchestrator_graph.FAILED_TEXT
+    assert timed_out == ["Project_Scope_of_Work"]
+    assert len(clients["strong-model"].prompts) == 1 and clients["fast-model"].prompts == []
+
+
+def test_tiering_is_off_by_default(monkeypatch):
+    import importlib
+    import config
+    monkeypatch.delenv("LLM_TIERING_ENABLED", raising=False)
+    try:
+        importlib.reload(config)
+        assert config.LLM_TIERS == {"default": {"model": config.GENERATION_MODEL_NAME, "temperature": 0.3}}
+        assert config.DEFAULT_LLM_TIER == "default"
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
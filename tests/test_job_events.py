@@ -0,0 +1,32 @@
+import json
+
+from app import app
+import routes.compare_routes as compare_routes
+
+
+def stream(monkeypatch, jobs, events=()):
+    """Read /compare_jobs/j1/events while get_job returns the items of jobs in turn."""
+    jobs = iter(jobs)
+    monkeypatch.setattr(compare_routes, "get_job", lambda job_id: next(jobs))
+    monkeypatch.setattr(compare_routes, "get_events", lambda job_id, after: list(events))
+    monkeypatch.setattr(compare_routes, "SSE_POLL_INTERVAL", 0)
+    return app.test_client().get("/compare_jobs/j1/events").get_data(as_text=True)
+
+
+def test_deleted_job_ends_the_stream_with_an_error(monkeypatch):
+    body = stream(monkeypatch, [{"status": "running"}, None])
+    assert body.startswith("event: status\n")
+    event = json.loads(body.split("data: ", 1)[1])
+    assert event["status"] == "failed" and event["error"]
+
+
+def test_finished_job_streams_its_events_and_closes(monkeypatch):
+    body = stream(monkeypatch, [{"status": "running"}, {"status": "succeeded"}],
+                  [(1, {"type": "status", "status": "succeeded"})])
+    assert body == 'id: 1\nevent: status\ndata: {"type": "status", "status": "succeeded"}\n\n'
+
+
+def test_stream_is_closed_after_its_lifetime(monkeypatch):
+    monkeypatch.setattr(compare_routes, "COMPARISON_SSE_MAX_SECONDS", 0)
+    running = {"status": "running"}
+    assert stream(monkeypatch, [running, running, running]) == ""
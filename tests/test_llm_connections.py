@@ -0,0 +1,63 @@
+# tests/test_llm_connections.py
+"""
+Connection reuse of the shared async LLM client (nodes.llm_runtime), against the
+local OpenAI-compatible mock server of tests/mock_openai.py.
+"""
+import asyncio
+from langchain_openai import ChatOpenAI
+from nodes.llm_runtime import run_coroutine
+from nodes.orchestrator_graph import _call_llm_async
+from tests.mock_openai import MockOpenAI, start_mock_server
+from utils.metrics import STAGE_ERRORS
+
+REQUESTS = 5
+SECTIONS_PER_REQUEST = 6
+
+
+async def one_request(llm):
+    return await asyncio.gather(*[_call_llm_async(llm, f"section {i}") for i in range(SECTIONS_PER_REQUEST)])
+
+
+def per_request_loop(llm):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(one_request(llm))
+    finally:
+        loop.close()
+
+
+def shared_loop(llm):
+    return run_coroutine(one_request(llm))
+
+
+def measure(run):
+    """(connections, failed calls) of REQUESTS requests run with `run`."""
+    # A server (base_url) per mode: langchain_openai caches its default httpx client per base_url
+    server, base_url = start_mock_server()
+    try:
+        llm = ChatOpenAI(model="mock-model", api_key="sk-mock", base_url=base_url, max_retries=0)
+        MockOpenAI.reset()
+        errors_before = STAGE_ERRORS.value("generate_section")
+        for _ in range(REQUESTS):
+            run(llm)
+        return MockOpenAI.connections, int(STAGE_ERRORS.value("generate_section") - errors_before)
+    finally:
+        server.shutdown()
+
+
+def test_shared_loop_reuses_connections_without_errors():
+    connections, errors = measure(shared_loop)
+
+    # One loop and one client for every request: the first request's pooled
+    # connections serve all the following ones, and no call fails
+    assert connections <= SECTIONS_PER_REQUEST
+    assert errors == 0
+
+
+def test_per_request_loop_opens_new_connections():
+    # The previous behaviour, kept as the baseline the shared loop is measured against
+    shared_connections, _ = measure(shared_loop)
+    connections, _ = measure(per_request_loop)
+
+    assert connections > shared_connections
+    assert connections > SECTIONS_PER_REQUEST * (REQUESTS // 2)
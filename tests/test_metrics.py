@@ -0,0 +1,24 @@
+import sys
+import threading
+
+from utils.metrics import STAGE_IN_FLIGHT, timed_stage
+
+
+def test_in_flight_gauge_returns_to_zero_under_concurrency():
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+    try:
+        stage = timed_stage("test_concurrent_stage")(lambda: None)
+
+        def run():
+            for _ in range(20000):
+                stage()
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert STAGE_IN_FLIGHT.value("test_concurrent_stage") == 0
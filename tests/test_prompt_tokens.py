@@ -0,0 +1,44 @@
+# tests/test_prompt_tokens.py
+"""
+Section prompts carry only the form fields they declare (SECTION_CONTEXT / their
+placeholders), never the whole form as the old {raw_input} did.
+"""
+import re
+import pytest
+from nodes.prompts import PROMPTS, SECTION_CONTEXT
+from nodes.section_dependencies import CONTEXT_PLACEHOLDER, SECTION_DEPENDENCIES, build_prompt
+from tests.sample_form import SAMPLE_FORM, sample_values
+
+# Minimum token cut of a section with a projected context against the whole-form prompt
+MIN_SECTION_REDUCTION = 0.4
+
+# Sample values that identify their field (long, and not part of another field's value)
+DISTINCT_VALUES = {
+    field: value for field, value in SAMPLE_FORM.items()
+    if len(value) >= 12 and not any(value in other for f, other in SAMPLE_FORM.items() if f != field)
+}
+
+
+def count_tokens(text):
+    """Word and punctuation count, a stand-in for model tokens (see benchmarks/bench_prompt_tokens.py)."""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+@pytest.mark.parametrize("section", sorted(SECTION_CONTEXT))
+def test_projected_context_cuts_section_tokens(section):
+    values = sample_values()
+    whole_form = PROMPTS[section].format(**{**values, CONTEXT_PLACEHOLDER: str(SAMPLE_FORM)})  # the old {raw_input}
+    assert count_tokens(build_prompt(section, values)) <= (1.0 - MIN_SECTION_REDUCTION) * count_tokens(whole_form)
+
+
+@pytest.mark.parametrize("section", sorted(PROMPTS))
+def test_prompt_has_only_its_fields(section):
+    # "raw_input" is available as it was in the graph state: a template interpolating
+    # it (or the whole form) again would bring in the values of every field
+    values = {**sample_values(), "raw_input": str(SAMPLE_FORM)}
+    prompt = build_prompt(section, values)
+    leaked = [
+        field for field, value in DISTINCT_VALUES.items()
+        if field not in SECTION_DEPENDENCIES[section] and value in prompt
+    ]
+    assert not leaked
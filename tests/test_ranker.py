@@ -0,0 +1,76 @@
+# tests/test_ranker.py
+"""The vectorized ranking core against the scalar reference (calculate_weighted_score, round(x, 1))."""
+import numpy as np
+import pytest
+from evaluation_engine.ranker import (
+    QUALIFICATION_THRESHOLD, calculate_weighted_score, rank_proposals, rank_score_matrix, round_scores,
+)
+
+
+def reference_ranking(matrix, weights):
+    """Scalar scoring and a stable sort: qualified first, then by total score, ties in input order."""
+    # Python floats, as parsed from JSON: round() of a NumPy scalar rounds like np.round
+    criteria = [{"name": f"c{j}", "weight": w} for j, w in enumerate(weights.tolist())]
+    totals = [calculate_weighted_score({f"c{j}": v for j, v in enumerate(row)}, criteria) for row in matrix.tolist()]
+    qualified = [t >= QUALIFICATION_THRESHOLD for t in totals]
+    order = sorted(range(len(totals)), key=lambda i: (not qualified[i], -totals[i]))
+    return totals, qualified, order
+
+
+@pytest.mark.parametrize("values", [
+    np.arange(0, 10001) / 100.0,          # every x.x5 midpoint on the 0-100 scale
+    np.arange(0, 100001) / 1000.0,
+    np.random.default_rng(0).uniform(0, 100, 100000),
+])
+def test_round_scores_matches_round(values):
+    assert round_scores(values).tolist() == [round(v, 1) for v in values.tolist()]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_rank_score_matrix_matches_the_scalar_reference(seed):
+    rng = np.random.default_rng(seed)
+    n_criteria = int(rng.integers(2, 8))
+    weights = rng.dirichlet(np.ones(n_criteria)) * 100.0
+    if seed % 2:
+        # Integer scores around the threshold: many equal totals and x.x5 sums
+        matrix = rng.integers(60, 81, size=(200, n_criteria)).astype(np.float64)
+        weights = np.round(weights, 1)
+    else:
+        matrix = np.round(rng.uniform(0, 100, size=(200, n_criteria)), 2)
+    totals, qualified, order = rank_score_matrix(matrix, weights)
+    ref_totals, ref_qualified, ref_order = reference_ranking(matrix, weights)
+    assert totals.tolist() == ref_totals
+    assert qualified.tolist() == ref_qualified
+    assert order.tolist() == ref_order
+
+
+def test_ties_keep_input_order():
+    matrix = np.array([[70.0, 70.0], [80.0, 60.0], [60.0, 60.0], [75.0, 65.0], [60.0, 60.0]])
+    totals, qualified, order = rank_score_matrix(matrix, np.array([50.0, 50.0]))
+    assert totals.tolist() == [70.0, 70.0, 60.0, 70.0, 60.0]
+    assert order.tolist() == [0, 1, 3, 2, 4]
+
+
+def test_batched_weights_rank_each_sample_like_a_single_vector():
+    rng = np.random.default_rng(1)
+    matrix = rng.integers(60, 81, size=(30, 4)).astype(np.float64)
+    batch = rng.dirichlet(np.ones(4), size=50).T * 100.0
+    totals, qualified, order = rank_score_matrix(matrix, batch)
+    for s in range(batch.shape[1]):
+        single = rank_score_matrix(matrix, batch[:, s])
+        assert totals[:, s].tolist() == single[0].tolist()
+        assert order[:, s].tolist() == single[2].tolist()
+
+
+def test_rank_proposals_orders_qualified_first():
+    criteria = [{"name": "فني", "weight": 60.0}, {"name": "خبرة", "weight": 40.0}]
+    scored = {
+        "a": {"scores": {"فني": 60, "خبرة": 60}},
+        "b": {"scores": {"فني": 90, "خبرة": 70}},
+        "c": {"scores": {"فني": 80}},
+        "d": {"scores": {"فني": 75, "خبرة": 65}},
+    }
+    ranked = rank_proposals(scored, criteria)["ranked_proposals"]
+    assert [(p["proposal_id"], p["total_score"], p["is_qualified"]) for p in ranked] == [
+        ("b", 82.0, True), ("d", 71.0, True), ("a", 60.0, False), ("c", 48.0, False),
+    ]
@@ -0,0 +1,56 @@
+# tests/test_section_dependencies.py
+"""Section dependency graph: generation order, time reserve depth and stale-section fingerprints."""
+from nodes.section_dependencies import (
+    dependency_depth, fingerprint_sections, generation_order, plan_section_groups, stale_sections,
+)
+
+TECHNICAL, FINANCIAL, CRITERIA = "Technical_Proposal_Documents", "Financial_Proposal_Documents", "Bid_Evaluation_Criteria"
+SECTIONS = [CRITERIA, "Alternative_Offers", TECHNICAL, FINANCIAL]
+VALUES = {
+    "Project_Type": "تشغيل وصيانة", "Initial_Guarantee_Percentage": "2", "Award_Method": "Best Value",
+    TECHNICAL: "فني", FINANCIAL: "مالي", CRITERIA: "معايير", "Alternative_Offers": "بدائل",
+}
+
+
+def test_generation_order_puts_prerequisites_first():
+    order = generation_order(SECTIONS)
+    assert sorted(order) == sorted(SECTIONS)
+    assert order.index(CRITERIA) > max(order.index(TECHNICAL), order.index(FINANCIAL))
+
+
+def test_dependency_depth_counts_waiting_sections():
+    assert dependency_depth(TECHNICAL, SECTIONS) == 2
+    assert dependency_depth(TECHNICAL, [TECHNICAL]) == 1
+    assert dependency_depth(CRITERIA, SECTIONS) == 1
+
+
+def test_groups_only_bundle_sections_without_prerequisites():
+    groups = [[CRITERIA, "Alternative_Offers", TECHNICAL], [FINANCIAL, "Joint_Venture"]]
+    assert plan_section_groups(SECTIONS, groups) == [["Alternative_Offers", TECHNICAL]]
+
+
+def test_unchanged_inputs_are_not_stale():
+    fingerprints = fingerprint_sections(SECTIONS, VALUES)
+    assert stale_sections(SECTIONS, dict(VALUES), fingerprints) == []
+
+
+def test_changed_field_makes_its_sections_and_dependents_stale():
+    fingerprints = fingerprint_sections(SECTIONS, VALUES)
+    assert stale_sections(SECTIONS, {**VALUES, "Initial_Guarantee_Percentage": "5"}, fingerprints) == [
+        CRITERIA, FINANCIAL,
+    ]
+    assert stale_sections(SECTIONS, {**VALUES, "Project_Type": "توريد"}, fingerprints) == [
+        CRITERIA, TECHNICAL, FINANCIAL,
+    ]
+    assert stale_sections(SECTIONS, {**VALUES, "Award_Method": "أقل سعر"}, fingerprints) == [CRITERIA]
+
+
+def test_regenerated_prerequisite_text_makes_dependents_stale():
+    fingerprints = fingerprint_sections(SECTIONS, VALUES)
+    assert stale_sections(SECTIONS, {**VALUES, TECHNICAL: "فني جديد"}, fingerprints) == [CRITERIA]
+
+
+def test_pending_sections_stay_stale():
+    fingerprints = fingerprint_sections(SECTIONS, VALUES, pending=[FINANCIAL])
+    assert fingerprints[FINANCIAL] == ""
+    assert stale_sections(SECTIONS, VALUES, fingerprints) == [CRITERIA, FINANCIAL]
@@ -0,0 +1,55 @@
+# tests/test_sensitivity.py
+"""Weight-sensitivity analysis (evaluation_engine.sensitivity) and its endpoint's input checks."""
+import numpy as np
+import pytest
+from app import app
+from evaluation_engine.ranker import rank_score_matrix
+from evaluation_engine.sensitivity import _ranks_for_weights, analyze_weight_sensitivity
+
+CRITERIA = [{"name": f"c{j}", "weight": w} for j, w in enumerate((33.3, 33.3, 33.4))]
+RESULTS = [
+    {"proposal_name": "A", "scores": {"c0": 80, "c1": 75, "c2": 90}},
+    {"proposal_name": "B", "scores": {"c0": 85, "c1": 80, "c2": 70}},
+]
+
+
+def test_sampled_ranks_match_the_ranking_at_the_base_weights():
+    # Many near-ties around the 0.1 rounding step: a batched matrix product sums in a
+    # different order than the ranking and used to flip some of them
+    rng = np.random.default_rng(0)
+    for _ in range(1000):
+        weights = np.round(rng.uniform(5, 40, size=4), 1)
+        weights = weights / weights.sum() * 100
+        matrix = rng.integers(66, 74, size=(50, 4)).astype(np.float64)
+        _, _, order = rank_score_matrix(matrix, weights)
+        base_ranks = np.empty(len(order), dtype=np.int64)
+        base_ranks[order] = np.arange(len(order))
+
+        ranks, _ = _ranks_for_weights(matrix, np.tile(weights, (4, 1)))
+        assert (ranks == base_ranks[:, None]).all()
+
+
+def test_no_winner_change_without_weight_change():
+    matrix = np.array([[80.0, 75.0, 90.0], [85.0, 80.0, 70.0]])
+    analysis = analyze_weight_sensitivity(matrix, CRITERIA, ["A", "B"], n_samples=50, delta=1e-9, seed=1)
+    assert analysis["winner_stability"] == 1.0
+    assert not any(step["winner_changed"] for step in analysis["sweep"])
+
+
+@pytest.mark.parametrize("extra", [
+    {"samples": 0}, {"samples": -5}, {"samples": 50001}, {"samples": "x"},
+    {"seed": "abc"}, {"seed": 1.5}, {"seed": True}, {"seed": -1},
+    {"delta": float("nan")}, {"delta": float("inf")}, {"delta": -1}, {"delta": 0}, {"delta": 101}, {"delta": "x"},
+])
+def test_invalid_parameters_get_400(extra):
+    response = app.test_client().post("/compare_llm/sensitivity",
+                                      json={"results": RESULTS, "criteria_with_weights": CRITERIA, **extra})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("extra", [{}, {"seed": 0, "samples": 1}, {"seed": 7, "delta": 100, "samples": 50000}])
+def test_valid_parameters(extra):
+    response = app.test_client().post("/compare_llm/sensitivity",
+                                      json={"results": RESULTS, "criteria_with_weights": CRITERIA, **extra})
+    assert response.status_code == 200
+    assert response.get_json()["winner"] in ("A", "B")
@@ -0,0 +1,58 @@
+# tests/test_template_cache.py
+"""The cached Word template renders the same document as a plain DocxTemplate."""
+import io
+import os
+import zipfile
+import pytest
+from docx import Document
+from docxtpl import DocxTemplate
+from config import RFP_TEMPLATE_PATH
+from nodes.field_map import FIELD_MAP
+from nodes.template_cache import CachedDocxTemplate, prepared_template, template_for_render
+
+pytestmark = pytest.mark.skipif(not isinstance(template_for_render(), CachedDocxTemplate),
+                                reason="installed docxtpl is not supported by the template cache")
+
+
+def rendered_parts(tpl, context):
+    """The saved document's zip members (the zip's own timestamps differ between saves)."""
+    tpl.render(context)
+    buffer = io.BytesIO()
+    tpl.save(buffer)
+    with zipfile.ZipFile(buffer) as docx:
+        return {name: docx.read(name) for name in docx.namelist()}
+
+
+def test_cached_render_is_byte_identical_to_docxtpl():
+    context = {key: f"قيمة {key} <&> \"x\"" for key in FIELD_MAP}
+    cached = rendered_parts(template_for_render(RFP_TEMPLATE_PATH), context)
+    plain = rendered_parts(DocxTemplate(RFP_TEMPLATE_PATH), context)
+    assert cached.keys() == plain.keys()
+    assert [name for name in plain if cached[name] != plain[name]] == []
+    # Rendering twice from the cache gives the same document again
+    assert rendered_parts(template_for_render(RFP_TEMPLATE_PATH), context) == cached
+
+
+def write_template(path, text, mtime_ns):
+    doc = Document()
+    doc.add_paragraph(text)
+    doc.save(path)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def render_text(path, context):
+    tpl = template_for_render(str(path))
+    tpl.render(context)
+    return "\n".join(p.text for p in tpl.docx.paragraphs)
+
+
+def test_template_is_prepared_again_when_its_mtime_changes(tmp_path):
+    path = tmp_path / "template.docx"
+    write_template(path, "الاسم: {{ name }}", 1_000_000_000_000_000_000)
+    first = prepared_template(str(path))
+    assert prepared_template(str(path)) is first
+    assert render_text(path, {"name": "أ"}) == "الاسم: أ"
+
+    write_template(path, "المشروع: {{ name }}", 1_000_000_001_000_000_000)
+    assert prepared_template(str(path)) is not first
+    assert render_text(path, {"name": "ب"}) == "المشروع: ب"
@@ -0,0 +1,31 @@
+# tests/test_template_fields.py
+"""Generation is limited to the sections the Word template uses, plus their prerequisites."""
+from docx import Document
+from nodes.template_fields import prune_to_template
+
+SECTIONS = ["Alternative_Offers", "Technical_Proposal_Documents", "Financial_Proposal_Documents",
+            "Bid_Evaluation_Criteria", "Joint_Venture"]
+
+
+def template(tmp_path, *placeholders):
+    path = tmp_path / "template.docx"
+    doc = Document()
+    for placeholder in placeholders:
+        doc.add_paragraph(f"{{{{ {placeholder} }}}}")
+    doc.save(path)
+    return str(path)
+
+
+def test_keeps_used_sections_and_their_prerequisites(tmp_path):
+    path = template(tmp_path, "Bid_Evaluation_Criteria", "Joint_Venture", "Project_Name")
+    assert prune_to_template(SECTIONS, path) == [
+        "Technical_Proposal_Documents", "Financial_Proposal_Documents", "Bid_Evaluation_Criteria", "Joint_Venture",
+    ]
+
+
+def test_drops_sections_the_template_does_not_use(tmp_path):
+    assert prune_to_template(SECTIONS, template(tmp_path, "Alternative_Offers")) == ["Alternative_Offers"]
+
+
+def test_unreadable_template_keeps_every_section(tmp_path):
+    assert prune_to_template(SECTIONS, str(tmp_path / "missing.docx")) == SECTIONS
@@ -0,0 +1,43 @@
+# tests/test_uploads.py
+"""Comparison uploads stay inside the run's workspace whatever the client-side file name."""
+import io
+import os
+import pytest
+import workflow.workspaces as workspaces
+from app import app
+from routes.compare_routes import save_comparison_uploads, upload_filename
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("عرض الشركة.pdf", "عرض الشركة.pdf"),
+    ("../../x.pdf", "x.pdf"),
+    ("..\\..\\x.pdf", "x.pdf"),
+    ("/etc/passwd", "passwd"),
+    ("..", "default.pdf"),
+    ("", "default.pdf"),
+    (None, "default.pdf"),
+])
+def test_upload_filename(filename, expected):
+    assert upload_filename(filename, "default.pdf") == expected
+
+
+def test_uploads_are_saved_in_the_run_workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspaces, "WORKSPACE_ROOT", str(tmp_path / "runs"))
+    data = {
+        "rfp_file": (io.BytesIO(b"rfp"), "../rfp.pdf"),
+        "proposal_files": [
+            (io.BytesIO(b"a"), "../../escape.pdf"),
+            (io.BytesIO(b"b"), "عرض"),
+            (io.BytesIO(b"c"), "sub/عرض.pdf"),
+        ],
+    }
+    with app.test_request_context("/compare_llm", method="POST", data=data,
+                                  content_type="multipart/form-data"):
+        uploads = save_comparison_uploads("run1")
+
+    proposals_dir = tmp_path / "runs" / "run1" / "proposals"
+    assert sorted(os.listdir(proposals_dir)) == sorted(["escape.pdf", "عرض.pdf", "عرض_3.pdf"])
+    assert uploads["proposal_names"] == ["escape.pdf", "عرض.pdf", "عرض_3.pdf"]
+    assert uploads["proposal_original_names"] == ["../../escape.pdf", "عرض", "sub/عرض.pdf"]
+    assert os.path.dirname(uploads["rfp_path"]) == str(tmp_path / "runs" / "run1")
+    assert not (tmp_path / "escape.pdf").exists()
@@ -0,0 +1,35 @@
+# utils/llm_callbacks.py
+"""
+LangChain callbacks used on the LLM path.
+
+Kept apart from utils.metrics: langchain_core (and pydantic) are only imported by
+the code that actually runs a graph, not when the app and its metrics load.
+"""
+import time
+from typing import Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from utils.metrics import REQUEST_OVERHEAD
+
+
+class FirstLLMCallTimer(BaseCallbackHandler):
+    """
+    LangChain callback passed in the graph config; records how long the request
+    took to reach its first LLM call (graph lookup, uploads, parsing, prompt building).
+    """
+
+    def __init__(self, graph_name: str, started: Optional[float] = None):
+        self.graph_name = graph_name
+        self.started = started if started is not None else time.perf_counter()
+        self.elapsed: Optional[float] = None
+
+    def _record(self) -> None:
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+            REQUEST_OVERHEAD.observe(self.elapsed, self.graph_name)
+            print(f"⏱️ [{self.graph_name}] أول استدعاء LLM بعد {self.elapsed * 1000:.1f} ms من بداية الطلب")
+
+    def on_chat_model_start(self, serialized, messages, **kwargs) -> None:
+        self._record()
+
+    def on_llm_start(self, serialized, prompts, **kwargs) -> None:
+        self._record()
@@ -0,0 +1,85 @@
+# utils/llm_clients.py
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional
+from langchain_openai import ChatOpenAI
+from config import OPENAI_API_KEY, MODEL_NAME, LLM_TIERS, LLM_TASK_TIERS, DEFAULT_LLM_TIER
+from utils.metrics import CACHE, LLM_TIER_LATENCY, LLM_BUDGET_EXCEEDED
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(model: str = MODEL_NAME, temperature: float = 0.0,
+                   max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> ChatOpenAI:
+    """
+    Process-wide ChatOpenAI client per (model, temperature, max_tokens, timeout).
+    Clients are thread-safe and keep their HTTP connection pools, so nodes and
+    routes receive these shared instances instead of constructing their own.
+    """
+    return ChatOpenAI(model=model, temperature=temperature, api_key=OPENAI_API_KEY,
+                      max_tokens=max_tokens, timeout=timeout)
+
+
+CACHE.register_lru_cache("llm_clients", get_chat_model)
+
+
+class ModelRouter:
+    """
+    Routes each generation task (a section name, "generate_table", ...) to the
+    shared client of its model tier (LLM_TASK_TIERS, default DEFAULT_LLM_TIER).
+    With LLM_TIERING_ENABLED heavy sections get the strong model and short
+    boilerplate the fast one; otherwise there is a single "default" tier.
+    """
+
+    def __init__(self, tiers: dict = None, task_tiers: dict = None, default_tier: str = None):
+        self.tiers = tiers or LLM_TIERS
+        self.task_tiers = task_tiers or LLM_TASK_TIERS
+        self.default_tier = default_tier or DEFAULT_LLM_TIER
+        # Clients are created up front (on app start-up, with the graphs)
+        self.clients = {
+            name: get_chat_model(tier["model"], tier.get("temperature", 0.0), tier.get("max_tokens"),
+                                 tier.get("latency_budget"))
+            for name, tier in self.tiers.items()
+        }
+
+    def tier(self, task: str) -> str:
+        tier = self.task_tiers.get(task, self.default_tier)
+        return tier if tier in self.tiers else self.default_tier
+
+    def for_task(self, task: str) -> ChatOpenAI:
+        return self.clients[self.tier(task)]
+
+    def tier_for_group(self, tasks) -> str:
+        """The strongest tier (first in LLM_TIERS order) among the tasks of a grouped call."""
+        used = {self.tier(task) for task in tasks}
+        return next((name for name in self.tiers if name in used), self.default_tier)
+
+    def escalation_tier(self, tier: str) -> Optional[str]:
+        """The strongest tier, to retry an empty completion of `tier` on; None if `tier` is the strongest."""
+        strongest = next(iter(self.tiers))
+        return strongest if tier != strongest else None
+
+    def latency_budget(self, tier: str) -> Optional[float]:
+        return self.tiers.get(tier, {}).get("latency_budget")
+
+
+def resolve_llm(llm, task: str):
+    """(client, tier) for a task: routed through a ModelRouter, or the injected client as is."""
+    if isinstance(llm, ModelRouter):
+        tier = llm.tier(task)
+        return llm.clients[tier], tier
+    return llm, "default"
+
+
+@contextmanager
+def track_tier_latency(llm, tier: str):
+    """Record the call's duration under its tier and count calls over the tier's latency budget."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        LLM_TIER_LATENCY.observe(elapsed, tier)
+        budget = llm.latency_budget(tier) if isinstance(llm, ModelRouter) else None
+        if budget is not None and elapsed > budget:
+            LLM_BUDGET_EXCEEDED.inc(tier)
@@ -0,0 +1,244 @@
+# utils/metrics.py
+"""
+Minimal in-process metrics rendered in Prometheus text format on /metrics.
+
+Each label set owns a small list that is created once (under a lock) and then
+updated in place, so recording a value allocates nothing. Counter and histogram
+updates take no lock; gauge updates do, since an increment lost to a concurrent
+update would leave an in-flight gauge off for good. Stage timers resolve their
+series when they are defined, not per call.
+"""
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry: List["Histogram"] = []
+
+
+class Histogram:
+    """Cumulative latency histogram with optional labels (one series per label tuple)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def series(self, *labels: str) -> list:
+        series = self._series.get(labels)
+        if series is None:
+            with self._lock:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        return series
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.observe_series(self.series(*labels), value)
+
+    def observe_series(self, series: list, value: float) -> None:
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series.items()):
+            base = [f'{k}="{v}"' for k, v in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = ",".join(base + ['le="%s"' % le])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            label_str = f'{{{",".join(base)}}}' if base else ""
+            lines.append(f"{self.name}_sum{label_str} {series[-1]}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class _Scalar:
+    """Counter/gauge base: one [value] list per label tuple."""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def series(self, *labels: str) -> list:
+        series = self._series.get(labels)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(labels, [0.0])
+        return series
+
+    def value(self, *labels: str) -> float:
+        return self.series(*labels)[0]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in list(self._series.items()):
+            label_str = ",".join(f'{k}="{v}"' for k, v in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{label_str}}} {series[0]}" if label_str else f"{self.name} {series[0]}")
+        return lines
+
+
+class Counter(_Scalar):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.series(*labels)[0] += amount
+
+
+class Gauge(_Scalar):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.add_series(self.series(*labels), amount)
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.add_series(self.series(*labels), -amount)
+
+    def add_series(self, series: list, amount: float) -> None:
+        with self._lock:
+            series[0] += amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self.series(*labels)[0] = value
+
+
+class CacheStats:
+    """
+    Hit/miss counters per cache plus the hit ratio, computed when /metrics is rendered.
+    Caches built with functools.lru_cache can be registered instead of counted by hand.
+    """
+
+    def __init__(self, name: str, documentation: str):
+        self.requests = Counter(f"{name}_requests_total", documentation, ("cache", "result"))
+        _registry.remove(self.requests)  # rendered below together with the lru_cache counts
+        self.name = f"{name}_hit_ratio"
+        self._lru_caches: Dict[str, Callable] = {}
+        _registry.append(self)
+
+    def hit(self, cache: str) -> None:
+        self.requests.inc(cache, "hit")
+
+    def miss(self, cache: str) -> None:
+        self.requests.inc(cache, "miss")
+
+    def register_lru_cache(self, cache: str, cached_function: Callable) -> None:
+        self._lru_caches[cache] = cached_function
+
+    def _counts(self) -> Dict[str, list]:
+        counts: Dict[str, list] = {}
+        for (cache, result), series in list(self.requests._series.items()):
+            counts.setdefault(cache, [0.0, 0.0])[0 if result == "hit" else 1] += series[0]
+        for cache, fn in self._lru_caches.items():
+            info = fn.cache_info()
+            counts[cache] = [float(info.hits), float(info.misses)]
+        return counts
+
+    def render(self) -> List[str]:
+        counts = self._counts()
+        requests = self.requests.name
+        lines = [f"# HELP {requests} {self.requests.documentation}", f"# TYPE {requests} counter"]
+        for cache, (hits, misses) in counts.items():
+            lines.append(f'{requests}{{cache="{cache}",result="hit"}} {hits}')
+            lines.append(f'{requests}{{cache="{cache}",result="miss"}} {misses}')
+        lines += [f"# HELP {self.name} Cache hit ratio (hits / lookups).", f"# TYPE {self.name} gauge"]
+        for cache, (hits, misses) in counts.items():
+            total = hits + misses
+            lines.append(f'{self.name}{{cache="{cache}"}} {hits / total if total else 0.0}')
+        return lines
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------------------------------
+# Per-stage latency, in-flight and error metrics
+# -----------------------------------------------------
+STAGE_LATENCY = Histogram(
+    "rfp_stage_duration_seconds",
+    "Duration of pipeline stages (parse, summarize, evaluate, rank, section generation, docx rendering).",
+    ("stage",),
+)
+STAGE_IN_FLIGHT = Gauge("rfp_stage_in_flight", "Stage executions currently running.", ("stage",))
+STAGE_ERRORS = Counter("rfp_stage_errors_total", "Stage executions that raised or fell back after an error.", ("stage",))
+CACHE = CacheStats("rfp_cache", "Cache lookups by cache and result (hit/miss).")
+LLM_IN_FLIGHT = Gauge("rfp_llm_in_flight", "LLM calls currently holding a slot of the model budget.", ("model",))
+LLM_WAITING = Gauge("rfp_llm_waiting", "LLM calls waiting for a slot of the model budget.", ("model",))
+LLM_TIER_LATENCY = Histogram("rfp_llm_tier_duration_seconds", "Duration of generation LLM calls by model tier.", ("tier",))
+SECTION_TIMEOUTS = Counter("rfp_section_timeouts_total", "Generated sections cut off by the request deadline or their latency budget.", ("section",))
+LLM_BUDGET_EXCEEDED = Counter("rfp_llm_budget_exceeded_total", "Generation LLM calls slower than their tier's latency budget.", ("tier",))
+
+
+def timed_stage(stage: str):
+    """
+    Decorator recording latency, in-flight count and errors of `stage` for a sync
+    or async function. Series are looked up once here, so a call only does a few
+    in-place list updates.
+    """
+    latency = STAGE_LATENCY.series(stage)
+    in_flight = STAGE_IN_FLIGHT.series(stage)
+    track = STAGE_IN_FLIGHT.add_series
+    errors = STAGE_ERRORS.series(stage)
+    observe = STAGE_LATENCY.observe_series
+    clock = time.perf_counter
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                track(in_flight, 1)
+                started = clock()
+                try:
+                    return await fn(*args, **kwargs)
+                except BaseException:
+                    errors[0] += 1
+                    raise
+                finally:
+                    track(in_flight, -1)
+                    observe(latency, clock() - started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            track(in_flight, 1)
+            started = clock()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                errors[0] += 1
+                raise
+            finally:
+                track(in_flight, -1)
+                observe(latency, clock() - started)
+        return wrapper
+
+    return decorator
+
+
+# -----------------------------------------------------
+# Request overhead before the first LLM call
+# -----------------------------------------------------
+REQUEST_OVERHEAD = Histogram(
+    "rfp_request_overhead_seconds",
+    "Time from request start to the first LLM call of the request.",
+    ("graph",),
+)
@@ -130,4 +130,26 @@ FOCUS_WINDOW_PROMPT = """
 
 [نص المقطع #{chunk_num}/{total_chunks}]
 {chunk_text}
-"""
\ No newline at end of file
+"""
+# EVALUATION_REASK_PROMPT (Targeted re-ask for criteria missing from the first evaluation reply)
+EVALUATION_REASK_PROMPT = """
+أنت خبير تقييم مناقصات. سبق تقييم هذا العرض لكن الاستجابة السابقة لم تتضمن درجات بعض المعايير.
+قيّم العرض **فقط** على المعايير المذكورة أدناه، دون إعادة تقييم أي معيار آخر.
+
+**ملخص متطلبات كراسة الشروط (مختصر):**
+{rfp_summary}
+
+**مقتطفات من نص العرض ذات صلة بالمعايير:**
+{proposal_text}
+
+**المعايير الناقصة المطلوب تقييمها فقط:**
+{criteria_list}
+
+**التعليمات:**
+- امنح **درجة من 0 إلى 100** لكل معيار من المعايير أعلاه.
+- استخدم أسماء المعايير **كما هي حرفيًا** كمفاتيح.
+- أعد الاستجابة فقط كـ JSON نقي يحتوي على مفتاح واحد "scores".
+
+**مثال على التنسيق المطلوب:**
+{{"scores": {{"اسم المعيار": 80}}}}
+"""
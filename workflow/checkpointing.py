@@ -0,0 +1,50 @@
+# workflow/checkpointing.py
+"""
+Durable LangGraph checkpoints for the comparison workflow.
+
+Every completed step of build_rfp_graph() (parsed proposals, RFP summary and
+criteria, each proposal's score) is written to a local SQLite database under the
+run id (used as the LangGraph thread_id), so a run that failed halfway can be
+resumed from its last completed step instead of starting over.
+"""
+import os
+import sqlite3
+import threading
+from typing import Optional
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from config import COMPARISON_CHECKPOINT_DB
+
+# Pydantic models stored in the workflow state that may be restored from a checkpoint
+CHECKPOINT_TYPES = [("rfp_creation.rfp_summarizer", "RFPSummary")]
+
+_checkpointer: Optional[SqliteSaver] = None
+_lock = threading.Lock()
+
+
+def get_checkpointer() -> SqliteSaver:
+    """Process-wide SQLite checkpointer (one connection shared by all graph runs)."""
+    global _checkpointer
+    if _checkpointer is None:
+        with _lock:
+            if _checkpointer is None:
+                directory = os.path.dirname(COMPARISON_CHECKPOINT_DB)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # SqliteSaver serializes access to the connection with its own lock
+                conn = sqlite3.connect(COMPARISON_CHECKPOINT_DB, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                _checkpointer = SqliteSaver(conn, serde=JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES))
+    return _checkpointer
+
+
+def run_config(run_id: str, callbacks: list = None) -> dict:
+    """Graph config that checkpoints (and resumes) the run under its run id."""
+    config = {"configurable": {"thread_id": run_id}}
+    if callbacks:
+        config["callbacks"] = callbacks
+    return config
+
+
+def delete_checkpoints(run_id: str) -> None:
+    get_checkpointer().delete_thread(run_id)
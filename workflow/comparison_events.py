@@ -0,0 +1,82 @@
+# workflow/comparison_events.py
+"""
+Turns the comparison graph's streamed node updates into progress events for the
+comparison page (stage progress, each proposal's scores, provisional ranking).
+"""
+from typing import Callable, Dict, Optional
+from evaluation_engine.ranker import build_score_matrix, normalized_weight_vector, rank_score_matrix
+
+
+def provisional_ranking(scored_proposals: Dict[str, dict], criteria_with_weights: list, weights=None) -> list:
+    """Ranking of the proposals scored so far (same ordering as rank_proposals, without logging)."""
+    if not scored_proposals or not criteria_with_weights:
+        return []
+    if weights is None:
+        weights = normalized_weight_vector(criteria_with_weights)
+    proposal_ids, matrix = build_score_matrix(scored_proposals, criteria_with_weights)
+    totals, qualified, order = rank_score_matrix(matrix, weights)
+    return [
+        {
+            "rank": rank,
+            "proposal_id": proposal_ids[i],
+            "proposal_name": scored_proposals[proposal_ids[i]].get("name", proposal_ids[i]),
+            "total_score": float(totals[i]),
+            "is_qualified": bool(qualified[i]),
+        }
+        for rank, i in enumerate(order.tolist(), 1)
+    ]
+
+
+class ComparisonEvents:
+    """Accumulates node updates of one run and emits events through `emit`."""
+
+    def __init__(self, emit: Callable[[dict], None], state: Optional[dict] = None):
+        self.emit = emit
+        state = state or {}
+        self.total = len(state.get("proposals") or {})
+        self.criteria_with_weights = state.get("criteria_with_weights") or []
+        self.weights = normalized_weight_vector(self.criteria_with_weights) if self.criteria_with_weights else None
+        self.scored: Dict[str, dict] = dict(state.get("scored_proposals") or {})
+
+    def resumed(self) -> None:
+        """Replay what a resumed run already has, so the page starts from the checkpoint."""
+        self.emit({"type": "stage", "stage": "resumed", "proposals": self.total, "scored": len(self.scored),
+                   "criteria_with_weights": self.criteria_with_weights})
+        if self.scored:
+            self._emit_ranking(final=False)
+
+    def node_finished(self, node: str, update: Optional[dict]) -> None:
+        update = update or {}
+        if node == "ingest_proposals":
+            self.total = len(update.get("proposals") or {})
+            self.emit({"type": "stage", "stage": "parsed", "proposals": self.total})
+        elif node == "summarize_rfp":
+            self.emit({"type": "stage", "stage": "summarized"})
+            self.criteria_with_weights = update.get("criteria_with_weights") or []
+            if self.criteria_with_weights:
+                self.weights = normalized_weight_vector(self.criteria_with_weights)
+            self.emit({"type": "stage", "stage": "criteria_ready",
+                       "criteria_with_weights": self.criteria_with_weights})
+        elif node == "evaluate_proposal":
+            for proposal_id, scored in (update.get("scored_proposals") or {}).items():
+                self.scored[proposal_id] = scored
+                self._emit_ranking(final=False, announce=proposal_id)
+        elif node == "rank_proposals":
+            self._emit_ranking(final=True)
+
+    def _emit_ranking(self, final: bool, announce: str = None) -> None:
+        ranking = provisional_ranking(self.scored, self.criteria_with_weights, self.weights)
+        if announce is not None:
+            scored = self.scored[announce]
+            total_score = next((r["total_score"] for r in ranking if r["proposal_id"] == announce), 0.0)
+            self.emit({
+                "type": "proposal",
+                "proposal_id": announce,
+                "proposal_name": scored.get("name", announce),
+                "scores": [{"criterion": k, "score": float(v)} for k, v in scored.get("scores", {}).items()],
+                "details": scored.get("overall_comment", ""),
+                "total_score": total_score,
+                "scored": len(self.scored),
+                "proposals": self.total,
+            })
+        self.emit({"type": "ranking", "final": final, "ranking": ranking})
@@ -0,0 +1,333 @@
+# workflow/comparison_jobs.py
+"""
+Background job queue for comparisons.
+
+Jobs are stored in a local SQLite queue (COMPARISON_JOBS_DB) so any web worker
+can answer status/result requests. They are executed either by a thread pool
+inside the web process (COMPARISON_WORKER_MODE="thread", the default) or by a
+separate worker process:
+
+    COMPARISON_WORKER_MODE=process python -m workflow.comparison_jobs
+
+COMPARISON_WORKERS sets how many comparisons run at the same time per process.
+The job id is the comparison run id, so a job's result is the persisted run and
+a failed job can be retried from its last checkpoint.
+
+A running job refreshes its heartbeat_at while it runs. Jobs whose worker died
+(no heartbeat for COMPARISON_JOB_STALE_SECONDS) are queued again: by the worker
+process before it claims a job, and in thread mode by recover_jobs() when a web
+worker starts, which also picks up the jobs left queued by a previous process.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from config import (
+    COMPARISON_JOBS_DB, COMPARISON_JOB_HEARTBEAT_SECONDS, COMPARISON_JOB_STALE_SECONDS,
+    COMPARISON_WORKERS, COMPARISON_WORKER_MODE,
+)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Short-lived connection per operation (safe across threads and worker processes)."""
+    global _schema_ready
+    directory = os.path.dirname(COMPARISON_JOBS_DB)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(COMPARISON_JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS comparison_jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                error TEXT,
+                worker TEXT,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                heartbeat_at TEXT,
+                finished_at TEXT
+            )""")
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(comparison_jobs)")}
+        if "heartbeat_at" not in columns:  # queue created before heartbeats
+            conn.execute("ALTER TABLE comparison_jobs ADD COLUMN heartbeat_at TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_comparison_jobs_status ON comparison_jobs (status, created_at)")
+        # Progress events of each job, read by the SSE endpoint (seq doubles as the SSE event id)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS comparison_job_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_comparison_job_events_job ON comparison_job_events (job_id, seq)")
+        _schema_ready = True
+    return conn
+
+
+@contextmanager
+def _db():
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["inputs"] = json.loads(job["inputs"])
+    return job
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=COMPARISON_WORKERS, thread_name_prefix="comparison-job")
+    return _executor
+
+
+def delete_job(job_id: str) -> None:
+    with _db() as conn:
+        conn.execute("DELETE FROM comparison_job_events WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM comparison_jobs WHERE job_id = ?", (job_id,))
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with _db() as conn:
+        row = conn.execute("SELECT * FROM comparison_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def add_event(job_id: str, event: dict) -> None:
+    with _db() as conn:
+        conn.execute(
+            "INSERT INTO comparison_job_events (job_id, event, created_at) VALUES (?, ?, ?)",
+            (job_id, json.dumps(event, ensure_ascii=False), _now()),
+        )
+
+
+def get_events(job_id: str, after_seq: int = 0) -> list:
+    """Events of a job newer than after_seq, as (seq, event) pairs in order."""
+    with _db() as conn:
+        rows = conn.execute(
+            "SELECT seq, event FROM comparison_job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+            (job_id, after_seq),
+        ).fetchall()
+    return [(row["seq"], json.loads(row["event"])) for row in rows]
+
+
+def submit_job(job_id: str, inputs: dict) -> dict:
+    """
+    Queue a comparison. inputs: {"rfp_path", "proposals_dir", "workspace_dir", "rfp_filename", "total_uploaded"}.
+    In thread mode the job starts on the local pool right away.
+    """
+    with _db() as conn:
+        conn.execute(
+            "INSERT INTO comparison_jobs (job_id, status, inputs, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(inputs, ensure_ascii=False), _now()),
+        )
+    add_event(job_id, {"type": "status", "status": QUEUED})
+    print(f"📥 تمت إضافة مهمة المقارنة {job_id} إلى الطابور")
+    if COMPARISON_WORKER_MODE == "thread":
+        _get_executor().submit(execute_job, job_id)
+    return get_job(job_id)
+
+
+def retry_job(job_id: str) -> Optional[dict]:
+    """Re-queue a failed job; it resumes from the run's last checkpoint."""
+    with _db() as conn:
+        updated = conn.execute(
+            "UPDATE comparison_jobs SET status = ?, error = NULL, finished_at = NULL WHERE job_id = ? AND status = ?",
+            (QUEUED, job_id, FAILED),
+        ).rowcount
+    if not updated:
+        return None
+    add_event(job_id, {"type": "status", "status": QUEUED})
+    if COMPARISON_WORKER_MODE == "thread":
+        _get_executor().submit(execute_job, job_id)
+    return get_job(job_id)
+
+
+def requeue_stale_jobs() -> list:
+    """
+    Queue again the running jobs whose heartbeat (or start, if none yet) is older
+    than COMPARISON_JOB_STALE_SECONDS. Returns their ids.
+    """
+    cutoff = (datetime.now() - timedelta(seconds=COMPARISON_JOB_STALE_SECONDS)).isoformat(timespec="seconds")
+    with _db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        job_ids = [row["job_id"] for row in conn.execute(
+            "SELECT job_id FROM comparison_jobs WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ?",
+            (RUNNING, cutoff),
+        )]
+        for job_id in job_ids:
+            conn.execute(
+                "UPDATE comparison_jobs SET status = ?, worker = NULL, heartbeat_at = NULL WHERE job_id = ?",
+                (QUEUED, job_id),
+            )
+        conn.execute("COMMIT")
+    for job_id in job_ids:
+        add_event(job_id, {"type": "status", "status": QUEUED})
+        print(f"♻️ إعادة مهمة المقارنة {job_id} إلى الطابور (توقف العامل الذي كان ينفذها)")
+    return job_ids
+
+
+def recover_jobs() -> list:
+    """
+    Thread mode, at worker start: re-queue stale running jobs and submit every
+    queued job to the local pool (another worker may claim it first). Returns the submitted ids.
+    """
+    if COMPARISON_WORKER_MODE != "thread":
+        return []
+    requeue_stale_jobs()
+    with _db() as conn:
+        job_ids = [row["job_id"] for row in conn.execute(
+            "SELECT job_id FROM comparison_jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+        )]
+    for job_id in job_ids:
+        _get_executor().submit(execute_job, job_id)
+    if job_ids:
+        print(f"📤 استئناف {len(job_ids)} مهمة مقارنة من الطابور")
+    return job_ids
+
+
+def claim_job(job_id: str = None) -> Optional[dict]:
+    """
+    Atomically move a queued job (the given one, or the oldest) to running.
+    Returns None if there is nothing to claim or another worker got it first.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+    if job_id is None:
+        requeue_stale_jobs()
+    with _db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if job_id is None:
+            row = conn.execute(
+                "SELECT job_id FROM comparison_jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            job_id = row["job_id"] if row else None
+        updated = 0
+        if job_id is not None:
+            updated = conn.execute(
+                "UPDATE comparison_jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (RUNNING, worker, _now(), _now(), job_id, QUEUED),
+            ).rowcount
+        conn.execute("COMMIT")
+    return get_job(job_id) if updated else None
+
+
+def _heartbeat(job_id: str, stop: threading.Event) -> None:
+    while not stop.wait(COMPARISON_JOB_HEARTBEAT_SECONDS):
+        try:
+            with _db() as conn:
+                conn.execute("UPDATE comparison_jobs SET heartbeat_at = ? WHERE job_id = ? AND status = ?",
+                             (_now(), job_id, RUNNING))
+        except sqlite3.Error as e:
+            print(f"⚠️ تعذر تحديث نبض مهمة المقارنة {job_id}: {e}")
+
+
+def _finish(job_id: str, status: str, error: str = None) -> None:
+    # Status and its event are written together: once a reader sees the final
+    # status, the final event is already in the log
+    event = json.dumps({"type": "status", "status": status, "error": error}, ensure_ascii=False)
+    with _db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE comparison_jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+            (status, error, _now(), job_id),
+        )
+        conn.execute(
+            "INSERT INTO comparison_job_events (job_id, event, created_at) VALUES (?, ?, ?)",
+            (job_id, event, _now()),
+        )
+        conn.execute("COMMIT")
+
+
+def execute_job(job_id: str = None) -> Optional[dict]:
+    """Claim and run one job (the given one, or the oldest queued). Returns the finished job."""
+    # Imported here so the queue itself stays light for the status endpoints
+    from workflow.comparison_runs import run_comparison
+    from utils.llm_callbacks import FirstLLMCallTimer
+
+    job = claim_job(job_id)
+    if job is None:
+        return None
+    job_id = job["job_id"]
+    inputs = job["inputs"]
+    started = time.perf_counter()
+    add_event(job_id, {"type": "status", "status": RUNNING})
+    print(f"🚀 بدء تنفيذ مهمة المقارنة {job_id}")
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop_heartbeat),
+                     name=f"heartbeat-{job_id}", daemon=True).start()
+    try:
+        run_comparison(
+            job_id,
+            inputs["rfp_path"],
+            inputs["proposals_dir"],
+            rfp_filename=inputs.get("rfp_filename", ""),
+            workspace=inputs.get("workspace_dir"),
+            callbacks=[FirstLLMCallTimer("rfp_workflow", started)],
+            on_event=lambda event: add_event(job_id, event),
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        _finish(job_id, FAILED, str(e))
+        print(f"❌ فشلت مهمة المقارنة {job_id}: {e}")
+    else:
+        _finish(job_id, SUCCEEDED)
+        print(f"✅ اكتملت مهمة المقارنة {job_id} في {time.perf_counter() - started:.1f} ث")
+    finally:
+        stop_heartbeat.set()
+    return get_job(job_id)
+
+
+def run_worker(poll_interval: float = 1.0) -> None:
+    """Worker-process loop: COMPARISON_WORKERS threads, each claiming queued jobs from SQLite."""
+    def loop():
+        while True:
+            try:
+                job = execute_job()
+            except Exception as e:
+                print(f"⚠️ خطأ في عامل المقارنات: {e}")
+                job = None
+            if job is None:
+                time.sleep(poll_interval)
+
+    print(f"👷 عامل المقارنات يعمل بـ {COMPARISON_WORKERS} خيوط على {COMPARISON_JOBS_DB}")
+    threads = [threading.Thread(target=loop, name=f"comparison-worker-{i}", daemon=True)
+               for i in range(COMPARISON_WORKERS)]
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("👋 إيقاف عامل المقارنات")
+
+
+if __name__ == "__main__":
+    run_worker()
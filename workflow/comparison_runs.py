@@ -0,0 +1,204 @@
+# workflow/comparison_runs.py
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from pydantic import BaseModel, Field
+from rfp_creation.rfp_summarizer import RFPSummary
+from proposal_ingestion.proposal_loader import load_proposal_file
+from evaluation_engine.ranker import rank_proposals
+from workflow.rfp_workflow import score_proposal
+from workflow.checkpointing import run_config
+from workflow.graph_registry import get_graph
+from workflow.comparison_events import ComparisonEvents
+from workflow.workspaces import (
+    WORKSPACE_ROOT, EVALUATION_LOG_FILE, artifact_path, run_lock, validate_run_id, workspace_dir,
+)
+
+# Run records live next to the per-run workspaces: RUNS_DIR/<run_id>.json and RUNS_DIR/<run_id>/
+RUNS_DIR = WORKSPACE_ROOT
+
+# --- Pydantic Model for a persisted comparison run ---
+class ComparisonRun(BaseModel):
+    """Everything needed to re-rank a comparison without re-running the RFP steps."""
+    run_id: str
+    created_at: str
+    updated_at: str
+    rfp_filename: str = ""
+    rfp_summary: RFPSummary = Field(default_factory=RFPSummary)
+    criteria_with_weights: list = Field(default_factory=list)
+    scored_proposals: Dict[str, dict] = Field(default_factory=dict)
+    final_report: dict = Field(default_factory=dict)
+
+# --- End Pydantic Model ---
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+def _run_path(run_id: str) -> str:
+    return os.path.join(RUNS_DIR, f"{validate_run_id(run_id)}.json")
+
+def save_run(run: ComparisonRun) -> ComparisonRun:
+    """Persist the run atomically (write to a temp file, then replace)."""
+    run.updated_at = datetime.now().isoformat(timespec="seconds")
+    path = _run_path(run.run_id)
+    os.makedirs(RUNS_DIR, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(run.model_dump_json(indent=2))
+    os.replace(tmp_path, path)
+    return run
+
+def load_run(run_id: str) -> Optional[ComparisonRun]:
+    try:
+        path = _run_path(run_id)
+    except ValueError:
+        return None
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return ComparisonRun.model_validate(json.load(f))
+
+def create_run_from_state(run_id: str, state: dict, rfp_filename: str = "") -> ComparisonRun:
+    """Persist the output of a full build_rfp_graph() invocation as a comparison run."""
+    now = datetime.now().isoformat(timespec="seconds")
+    run = ComparisonRun(
+        run_id=run_id,
+        created_at=now,
+        updated_at=now,
+        rfp_filename=rfp_filename,
+        rfp_summary=state.get("rfp_summary") or RFPSummary(),
+        criteria_with_weights=state.get("criteria_with_weights", []),
+        scored_proposals=state.get("scored_proposals", {}),
+        final_report=state.get("final_report") or {},
+    )
+    return save_run(run)
+
+def _rerank(run: ComparisonRun) -> None:
+    # Ranking is a vectorized pass over the stored score matrix; no LLM calls
+    run.final_report = rank_proposals(run.scored_proposals, run.criteria_with_weights)
+
+def upsert_proposal(run_id: str, proposal_path: str, proposal_id: Optional[str] = None) -> Optional[ComparisonRun]:
+    """
+    Add a late proposal, or replace an existing one (same proposal_id), evaluating
+    only that proposal against the stored RFP summary and criteria, then re-rank.
+    """
+    run = load_run(run_id)
+    if run is None:
+        return None
+    proposal_id = proposal_id or os.path.basename(proposal_path)
+
+    details = load_proposal_file(proposal_path)
+    criteria_names = [c["name"] for c in run.criteria_with_weights]
+    action = "استبدال" if proposal_id in run.scored_proposals else "إضافة"
+    print(f"🔁 {action} العرض '{proposal_id}' في المقارنة {run_id} (تقييم عرض واحد فقط)...")
+    log_path = artifact_path(workspace_dir(run_id), EVALUATION_LOG_FILE)
+    scored = score_proposal(details, run.rfp_summary.model_dump(), criteria_names, log_path=log_path)
+
+    with run_lock(run_id):
+        # Reload so concurrent edits to other proposals of the same run are not lost
+        run = load_run(run_id) or run
+        run.scored_proposals[proposal_id] = scored
+        _rerank(run)
+        return save_run(run)
+
+def remove_proposal(run_id: str, proposal_id: str) -> Optional[ComparisonRun]:
+    """Remove a proposal from the run and re-rank the rest."""
+    try:
+        validate_run_id(run_id)
+    except ValueError:
+        return None
+    with run_lock(run_id):
+        run = load_run(run_id)
+        if run is None or proposal_id not in run.scored_proposals:
+            return None
+        del run.scored_proposals[proposal_id]
+        _rerank(run)
+        return save_run(run)
+
+def run_progress(run_id: str) -> Optional[dict]:
+    """Checkpointed progress of a (possibly interrupted) workflow run, or None if unknown."""
+    snapshot = get_graph("rfp_workflow").get_state(run_config(run_id))
+    if not snapshot.values:
+        return None
+    values = snapshot.values
+    return {
+        "run_id": run_id,
+        "finished": not snapshot.next,
+        "next": list(snapshot.next),
+        "proposals": len(values.get("proposals") or {}),
+        "scored": len(values.get("scored_proposals") or {}),
+        "summarized": values.get("rfp_summary") is not None,
+    }
+
+def _execute_graph(graph_input, config: dict, on_event: Callable[[dict], None] = None, resumed_state: dict = None) -> dict:
+    """
+    Run (graph_input=inputs) or continue (graph_input=None) the workflow and return the final state.
+    With on_event, node updates are streamed and reported as progress events while the graph runs.
+    """
+    graph = get_graph("rfp_workflow")
+    if on_event is None:
+        return graph.invoke(graph_input, config=config)
+
+    events = ComparisonEvents(on_event, resumed_state)
+    if resumed_state is not None:
+        events.resumed()
+    for update in graph.stream(graph_input, config=config, stream_mode="updates"):
+        for node, values in update.items():
+            events.node_finished(node, values)
+    return graph.get_state(config).values
+
+def resume_run(run_id: str, callbacks: list = None, on_event: Callable[[dict], None] = None) -> Optional[ComparisonRun]:
+    """
+    Continue an interrupted comparison from its last checkpoint: completed steps
+    (parsing, summary, criteria, already-scored proposals) are not re-run, only
+    the remaining evaluations and the ranking. Returns None for an unknown run id.
+    """
+    graph = get_graph("rfp_workflow")
+    config = run_config(run_id, callbacks)
+    snapshot = graph.get_state(config)
+    if not snapshot.values:
+        return None
+
+    if snapshot.next:
+        values = snapshot.values
+        print(f"♻️ استئناف المقارنة {run_id}: تم تقييم {len(values.get('scored_proposals') or {})} "
+              f"من {len(values.get('proposals') or {})} عرض، الخطوة التالية: {list(snapshot.next)}")
+        state = _execute_graph(None, config, on_event, resumed_state=values)
+    else:
+        print(f"ℹ️ المقارنة {run_id} مكتملة بالفعل.")
+        state = snapshot.values
+        existing = load_run(run_id)
+        if existing is not None:
+            return existing
+
+    rfp_filename = os.path.basename(state.get("user_input", ""))
+    return create_run_from_state(run_id, state, rfp_filename=rfp_filename)
+
+def run_comparison(run_id: str, rfp_path: str, proposals_dir: str, rfp_filename: str = "",
+                   callbacks: list = None, on_event: Callable[[dict], None] = None,
+                   workspace: str = None) -> ComparisonRun:
+    """
+    Run the comparison workflow for run_id and persist the result. If the run was
+    already started (checkpoint exists, e.g. a retried job), it is resumed instead.
+    on_event receives progress events (see workflow.comparison_events) as the run advances.
+    """
+    if run_progress(run_id) is not None:
+        return resume_run(run_id, callbacks, on_event)
+    inputs = {"user_input": rfp_path, "proposals_dir": proposals_dir, "workspace_dir": workspace}
+    state = _execute_graph(inputs, run_config(run_id, callbacks), on_event)
+    return create_run_from_state(run_id, state, rfp_filename=rfp_filename)
+
+
+if __name__ == "__main__":
+    # python -m workflow.comparison_runs <run_id>  →  resume an interrupted comparison
+    import sys
+    if len(sys.argv) != 2:
+        print("usage: python -m workflow.comparison_runs <run_id>")
+        sys.exit(2)
+    run = resume_run(sys.argv[1])
+    if run is None:
+        print(f"❌ لا توجد نقطة حفظ للمقارنة {sys.argv[1]}")
+        sys.exit(1)
+    print(f"✅ تم حفظ المقارنة {run.run_id} ({len(run.scored_proposals)} عرض) في {_run_path(run.run_id)}")
@@ -0,0 +1,69 @@
+# workflow/graph_registry.py
+"""
+Process-level registry of compiled LangGraph graphs.
+
+Graphs are built and compiled once per process (on warm_up() at app start or on
+first use) and shared by all requests; compiled graphs are safe to invoke
+concurrently.
+"""
+import importlib
+import threading
+import time
+from utils.metrics import CACHE
+
+# name -> "module:builder" (imported lazily so the registry has no heavy imports)
+GRAPH_BUILDERS = {
+    "rfp_workflow": "workflow.rfp_workflow:build_rfp_graph",
+    "rfp_generation": "graph1:build_main_app",
+}
+
+_graphs = {}
+_lock = threading.Lock()
+
+
+def get_graph(name: str):
+    """Return the compiled graph `name`, building it on first use."""
+    graph = _graphs.get(name)
+    if graph is not None:
+        CACHE.hit("compiled_graphs")
+        return graph
+    CACHE.miss("compiled_graphs")
+    with _lock:
+        graph = _graphs.get(name)
+        if graph is None:
+            module_name, builder_name = GRAPH_BUILDERS[name].split(":")
+            builder = getattr(importlib.import_module(module_name), builder_name)
+            started = time.perf_counter()
+            graph = builder()
+            _graphs[name] = graph
+            print(f"🧩 تم تجميع الرسم '{name}' في {(time.perf_counter() - started) * 1000:.1f} ms")
+    return graph
+
+
+def warm_up(names=None) -> None:
+    """
+    Compile the registered graphs (and their injected LLM clients) ahead of the
+    first request, and read / pre-process the Word template once.
+    """
+    for name in names or GRAPH_BUILDERS:
+        try:
+            get_graph(name)
+        except Exception as e:
+            print(f"⚠️ فشل تجهيز الرسم '{name}' مسبقًا: {e}")
+
+    from nodes.template_fields import template_variables
+    from nodes.template_cache import prepared_template
+    template_variables()
+    try:
+        prepared_template()
+    except Exception as e:
+        print(f"⚠️ فشل تجهيز قالب Word مسبقًا: {e}")
+
+
+def reset(name: str = None) -> None:
+    """Drop compiled graphs so the next get_graph() rebuilds them."""
+    with _lock:
+        if name is None:
+            _graphs.clear()
+        else:
+            _graphs.pop(name, None)
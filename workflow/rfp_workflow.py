@@ -1,14 +1,20 @@
 # workflow/rfp_workflow.py
-from typing import TypedDict, Dict
+from typing import TypedDict, Dict, Annotated
 import json  # Import json for saving at the top level
 from pydantic import BaseModel  # Import BaseModel
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from rfp_creation.rfp_summarizer import summarize_rfp, RFPSummary  # Import RFPSummary
 from proposal_ingestion.proposal_loader import load_proposals
 from evaluation_engine.criteria_extractor import extract_criteria_from_rfp_summary  # This function now handles RFPSummary
 from evaluation_engine.evaluator import evaluate_proposal, EvaluationResult  # Import the model
 from evaluation_engine.ranker import rank_proposals
 import os
+from functools import partial
+from utils.llm_clients import get_chat_model
+from workflow.checkpointing import get_checkpointer
+from workflow.workspaces import PARSED_RFP_FILE, RFP_SUMMARY_FILE, EVALUATION_LOG_FILE, artifact_path
+from config import MODEL_NAME, EVALUATION_MAX_CONCURRENCY
 
 # --- Pydantic Model for Parsed RFP ---
 class ParsedRFP(BaseModel):
@@ -18,16 +24,23 @@ class ParsedRFP(BaseModel):
 
 # --- End Pydantic Model ---
 
+def merge_scored_proposals(current: Dict[str, dict], update: Dict[str, dict]) -> Dict[str, dict]:
+    """Reducer: each per-proposal evaluation task contributes {proposal_id: scores}."""
+    merged = dict(current or {})
+    merged.update(update or {})
+    return merged
+
 class AgentState(TypedDict):
     user_input: str
     proposals_dir: str
+    workspace_dir: str  # per-run directory for artifacts (optional; defaults to the current directory)
     rfp_summary: RFPSummary  # Change type hint to Pydantic model
     criteria_with_weights: list
     proposals: Dict[str, Dict[str, str]]
-    scored_proposals: Dict[str, dict]  # Still stores dict for compatibility with ranker for now
+    scored_proposals: Annotated[Dict[str, dict], merge_scored_proposals]  # Merged from the per-proposal fan-out
     final_report: dict
 
-def summarize_rfp_node(state: AgentState) -> AgentState:
+def summarize_rfp_node(state: AgentState, llm=None, parse=None) -> AgentState:
     rfp_file_path = state["user_input"]
     if not os.path.isfile(rfp_file_path):
         raise FileNotFoundError(f"RFP file not found: {rfp_file_path}")
@@ -36,11 +49,12 @@ def summarize_rfp_node(state: AgentState) -> AgentState:
         with open(rfp_file_path, 'r', encoding='utf-8') as f:
             rfp_text = f.read()
     else:
-        from proposal_ingestion.document_parser import parse_document
-        rfp_text = parse_document(rfp_file_path)
+        if parse is None:
+            from proposal_ingestion.document_parser import parse_document as parse
+        rfp_text = parse(rfp_file_path)
         # --- NEW LOGIC: Save parsed text as structured JSON ---
         parsed_rfp_obj = ParsedRFP(filename=os.path.basename(rfp_file_path), text=rfp_text)
-        parsed_rfp_json_path = "./last_parsed_rfp.json"  # Change extension to .json
+        parsed_rfp_json_path = artifact_path(state.get("workspace_dir"), PARSED_RFP_FILE)
         try:
             # Use the json imported at the top level
             with open(parsed_rfp_json_path, 'w', encoding='utf-8') as f:
@@ -51,62 +65,91 @@ def summarize_rfp_node(state: AgentState) -> AgentState:
         # --- END NEW LOGIC ---
 
     # rfp_summary is now an RFPSummary object
-    rfp_summary: RFPSummary = summarize_rfp(rfp_text)
+    summary_path = artifact_path(state.get("workspace_dir"), RFP_SUMMARY_FILE)
+    rfp_summary: RFPSummary = summarize_rfp(rfp_text, output_file_path=summary_path, llm=llm)
 
     # Extract criteria with weights using the updated function
-    criteria_with_weights = extract_criteria_from_rfp_summary(rfp_summary)
+    criteria_with_weights = extract_criteria_from_rfp_summary(rfp_summary, llm=llm)
 
     # Return the Pydantic object and the criteria list
     return {"rfp_summary": rfp_summary, "criteria_with_weights": criteria_with_weights}
 
-def ingest_proposals_node(state: AgentState) -> AgentState:
+def ingest_proposals_node(state: AgentState, parse=None) -> AgentState:
     proposals_dir = state.get("proposals_dir", "./proposals")
     print(f"📂 جاري تحميل العروض من: {proposals_dir}")
-    proposals = load_proposals(proposals_dir)  # This now returns the new structure
+    proposals = load_proposals(proposals_dir, parse) if parse else load_proposals(proposals_dir)  # This now returns the new structure
     return {"proposals": proposals}
 
-def evaluate_proposals_node(state: AgentState) -> AgentState:
-    # Access the Pydantic object
-    rfp_summary_obj: RFPSummary = state["rfp_summary"]
-    # Convert it back to a dictionary for the evaluator prompt (for now)
-    rfp_summary_dict = rfp_summary_obj.model_dump()  # Pydantic method to convert to dict
-
-    proposals_with_details = state["proposals"]  # {pid: {"text": "...", "name": "..."}} # Extract criteria with weights (list of dicts)
-    criteria_with_weights = state["criteria_with_weights"]
-
-    # Extract just the names for passing to the evaluator
-    criteria_names = [c["name"] for c in criteria_with_weights]
+class ProposalTask(TypedDict):
+    """Payload sent to one evaluate_proposal task in the fan-out."""
+    proposal_id: str
+    details: Dict[str, str]
+    rfp_summary: dict
+    criteria_names: list
+    log_path: str
+
+def dispatch_evaluations(state: AgentState):
+    """
+    Fan-out: one evaluate_proposal task per proposal (LangGraph map-reduce via Send).
+    Runs after both the RFP branch and the ingestion branch have finished.
+    """
+    proposals_with_details = state.get("proposals") or {}
+    if not proposals_with_details:
+        return "rank_proposals"
+
+    # Convert the Pydantic summary to a dictionary once for the evaluator prompt
+    rfp_summary_dict = state["rfp_summary"].model_dump()
+    criteria_names = [c["name"] for c in state["criteria_with_weights"]]
+    # The raw evaluation log belongs to the run: without a workspace it is not written
+    workspace = state.get("workspace_dir")
+    log_path = artifact_path(workspace, EVALUATION_LOG_FILE) if workspace else None
 
     print(f"🔍 جاري تقييم {len(proposals_with_details)} عرضًا مقابل كراسة الشروط باستخدام المعايير: {criteria_names}...")
-    scored = {}
-    for pid, details in proposals_with_details.items():
-        text = details["text"]
-        name = details["name"]
-
-        if not text.strip():
-            # Still store as dict for compatibility with ranker
-            scored[pid] = {
-                "name": name,
-                "scores": {},
-                "overall_comment": "العرض فارغ أو غير قابل للتحليل."
-            }
-            continue
-
-        # Pass the list of names to evaluate_proposal - it now returns EvaluationResult
-        evaluation_result: EvaluationResult = evaluate_proposal(text, rfp_summary_dict, criteria_names)  # Pass the dict version
-
-        # Convert EvaluationResult back to a dictionary structure for the state
-        # This maintains compatibility with the existing ranker which expects scores as a dict
-        scores_dict = {score.criterion: score.score for score in evaluation_result.scores}
-
-        score_result = {
-            "scores": scores_dict,
-            "overall_comment": evaluation_result.overall_comment
+    return [
+        Send("evaluate_proposal", {
+            "proposal_id": pid,
+            "details": details,
+            "rfp_summary": rfp_summary_dict,
+            "criteria_names": criteria_names,
+            "log_path": log_path,
+        })
+        for pid, details in proposals_with_details.items()
+    ]
+
+def evaluate_proposal_node(task: ProposalTask, llm=None) -> AgentState:
+    scored = score_proposal(task["details"], task["rfp_summary"], task["criteria_names"], llm,
+                            log_path=task.get("log_path"))
+    return {"scored_proposals": {task["proposal_id"]: scored}}
+
+def score_proposal(details: Dict[str, str], rfp_summary_dict: dict, criteria_names: list, llm=None,
+                   log_path: str = None) -> dict:
+    """
+    Evaluates a single proposal ({"text": "...", "name": "..."}) and returns the
+    dict stored in scored_proposals: {"name", "scores", "overall_comment"}.
+    """
+    text = details["text"]
+    name = details["name"]
+
+    if not text.strip():
+        # Still store as dict for compatibility with ranker
+        return {
+            "name": name,
+            "scores": {},
+            "overall_comment": "العرض فارغ أو غير قابل للتحليل."
         }
-        score_result["name"] = name  # Add the name back
-        scored[pid] = score_result  # Store the dict version
 
-    return {"scored_proposals": scored}
+    # Pass the list of names to evaluate_proposal - it now returns EvaluationResult
+    evaluation_result: EvaluationResult = evaluate_proposal(text, rfp_summary_dict, criteria_names, llm, log_path=log_path)  # Pass the dict version
+
+    # Convert EvaluationResult back to a dictionary structure for the state
+    # This maintains compatibility with the existing ranker which expects scores as a dict
+    scores_dict = {score.criterion: score.score for score in evaluation_result.scores}
+
+    return {
+        "name": name,  # Add the name back
+        "scores": scores_dict,
+        "overall_comment": evaluation_result.overall_comment
+    }
 
 def rank_proposals_node(state: AgentState) -> AgentState:
     print("📊 جاري ترتيب العروض وفقًا للأداء...")
@@ -116,17 +159,38 @@ def rank_proposals_node(state: AgentState) -> AgentState:
     ranked = rank_proposals(state["scored_proposals"], criteria_with_weights)
     return {"final_report": ranked}
 
-def build_rfp_graph():
+def build_rfp_graph(llm=None, parse=None, checkpointer=None):
+    """
+    Builds and compiles the comparison workflow.
+    Node dependencies are injected here once: `llm` (shared evaluation client)
+    and `parse` (PDF parser). Use workflow.graph_registry.get_graph("rfp_workflow")
+    to get the process-wide compiled instance instead of calling this per request.
+
+    Runs are checkpointed to SQLite (workflow.checkpointing) under the thread_id
+    passed in the config; invoke with run_config(run_id) so a failed run can be
+    resumed with graph.invoke(None, run_config(run_id)).
+    """
+    llm = llm or get_chat_model(MODEL_NAME, 0.0)
+    checkpointer = checkpointer or get_checkpointer()
+    if parse is None:
+        from proposal_ingestion.document_parser import parse_document as parse
+
     workflow = StateGraph(AgentState)
-    workflow.add_node("summarize_rfp", summarize_rfp_node)
-    workflow.add_node("ingest_proposals", ingest_proposals_node)
-    workflow.add_node("evaluate_proposals", evaluate_proposals_node)
+    workflow.add_node("summarize_rfp", partial(summarize_rfp_node, llm=llm, parse=parse))
+    workflow.add_node("ingest_proposals", partial(ingest_proposals_node, parse=parse))
+    workflow.add_node("plan_evaluations", lambda state: {})
+    workflow.add_node("evaluate_proposal", partial(evaluate_proposal_node, llm=llm))
     workflow.add_node("rank_proposals", rank_proposals_node)
 
-    workflow.set_entry_point("summarize_rfp")
-    workflow.add_edge("summarize_rfp", "ingest_proposals")
-    workflow.add_edge("ingest_proposals", "evaluate_proposals")
-    workflow.add_edge("evaluate_proposals", "rank_proposals")
+    # RFP processing and proposal ingestion are independent branches
+    workflow.add_edge(START, "summarize_rfp")
+    workflow.add_edge(START, "ingest_proposals")
+    # Join both branches, then fan out one evaluation per proposal
+    workflow.add_edge(["summarize_rfp", "ingest_proposals"], "plan_evaluations")
+    workflow.add_conditional_edges("plan_evaluations", dispatch_evaluations, ["evaluate_proposal", "rank_proposals"])
+    # Fan-in: the ranker runs once every evaluation task has merged its scores
+    workflow.add_edge("evaluate_proposal", "rank_proposals")
     workflow.add_edge("rank_proposals", END)
 
-    return workflow.compile()
+    # Cap how many evaluations (LLM calls) run at the same time
+    return workflow.compile(checkpointer=checkpointer).with_config(max_concurrency=EVALUATION_MAX_CONCURRENCY)
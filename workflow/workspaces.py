@@ -0,0 +1,150 @@
+# workflow/workspaces.py
+"""
+Per-run workspaces for comparisons.
+
+Every comparison run gets its own directory, WORKSPACE_ROOT/<run_id>/, holding
+its uploads (RFP file, proposals/) and artifacts (parsed RFP, RFP summary,
+evaluation log), so concurrent runs in any number of threads or gunicorn
+workers never share a file. A janitor thread removes workspaces (and their
+run record, checkpoints and job rows) once they are older than WORKSPACE_TTL_HOURS.
+"""
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+from config import WORKSPACE_ROOT, WORKSPACE_TTL_HOURS, WORKSPACE_JANITOR_INTERVAL_MINUTES
+
+try:
+    import fcntl  # POSIX only; on other platforms run locks are per-process
+except ImportError:
+    fcntl = None
+
+# Artifact file names inside a workspace
+PARSED_RFP_FILE = "parsed_rfp.json"
+RFP_SUMMARY_FILE = "rfp_summary.json"
+EVALUATION_LOG_FILE = "evaluation_comparisons.json"
+PROPOSALS_DIR = "proposals"
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+_janitor: Optional[threading.Thread] = None
+
+
+def validate_run_id(run_id: str) -> str:
+    # run ids are uuid hex strings; refuse anything that could escape WORKSPACE_ROOT
+    if not run_id or not run_id.isalnum():
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    return run_id
+
+
+def workspace_dir(run_id: str) -> str:
+    return os.path.join(WORKSPACE_ROOT, validate_run_id(run_id))
+
+
+def create_workspace(run_id: str) -> str:
+    """Create (if needed) and return the run's workspace directory, with its proposals/ folder."""
+    path = workspace_dir(run_id)
+    os.makedirs(os.path.join(path, PROPOSALS_DIR), exist_ok=True)
+    return path
+
+
+def artifact_path(workspace: Optional[str], filename: str) -> str:
+    """Path of an artifact inside a workspace; without a workspace, the legacy ./<filename>."""
+    return os.path.join(workspace or ".", filename)
+
+
+@contextmanager
+def run_lock(run_id: str):
+    """
+    Exclusive lock on one run across threads and (on POSIX) across worker processes,
+    for read-modify-write updates of the run record.
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(run_id, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+        with open(os.path.join(WORKSPACE_ROOT, f".{validate_run_id(run_id)}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _last_activity(run_id: str) -> float:
+    paths = [workspace_dir(run_id), os.path.join(WORKSPACE_ROOT, f"{run_id}.json")]
+    return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+
+def remove_run(run_id: str) -> None:
+    """Delete everything stored for a run: workspace, run record, checkpoints and job rows."""
+    from workflow.checkpointing import delete_checkpoints
+    from workflow.comparison_jobs import delete_job
+
+    shutil.rmtree(workspace_dir(run_id), ignore_errors=True)
+    for name in (f"{run_id}.json", f".{run_id}.lock"):
+        try:
+            os.remove(os.path.join(WORKSPACE_ROOT, name))
+        except FileNotFoundError:
+            pass
+    delete_checkpoints(run_id)
+    delete_job(run_id)
+    with _thread_locks_guard:
+        _thread_locks.pop(run_id, None)
+
+
+def cleanup_expired(ttl_seconds: float = None, now: float = None) -> List[str]:
+    """Remove runs idle for longer than the TTL (queued or running jobs are kept). Returns the removed run ids."""
+    from workflow.comparison_jobs import get_job
+
+    ttl_seconds = WORKSPACE_TTL_HOURS * 3600 if ttl_seconds is None else ttl_seconds
+    now = time.time() if now is None else now
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return []
+
+    run_ids = set()
+    for entry in os.listdir(WORKSPACE_ROOT):
+        run_id = entry[:-5] if entry.endswith(".json") else entry
+        if run_id.isalnum() and (entry.endswith(".json") or os.path.isdir(os.path.join(WORKSPACE_ROOT, entry))):
+            run_ids.add(run_id)
+
+    removed = []
+    for run_id in sorted(run_ids):
+        if now - _last_activity(run_id) < ttl_seconds:
+            continue
+        job = get_job(run_id)
+        if job is not None and job["status"] in ("queued", "running"):
+            continue
+        try:
+            remove_run(run_id)
+            removed.append(run_id)
+        except Exception as e:
+            print(f"⚠️ تعذر حذف مساحة العمل {run_id}: {e}")
+    if removed:
+        print(f"🧹 تم حذف {len(removed)} مساحة عمل منتهية الصلاحية")
+    return removed
+
+
+def start_janitor(interval_minutes: float = None) -> threading.Thread:
+    """Start the background cleanup thread once per process."""
+    global _janitor
+    if _janitor is not None and _janitor.is_alive():
+        return _janitor
+    interval = (WORKSPACE_JANITOR_INTERVAL_MINUTES if interval_minutes is None else interval_minutes) * 60
+
+    def loop():
+        while True:
+            try:
+                cleanup_expired()
+            except Exception as e:
+                print(f"⚠️ خطأ في تنظيف مساحات العمل: {e}")
+            time.sleep(interval)
+
+    _janitor = threading.Thread(target=loop, name="workspace-janitor", daemon=True)
+    _janitor.start()
+    return _janitor